@@ -1,9 +1,12 @@
 from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import LoginManager
+from flask_migrate import Migrate
+from sqlalchemy import event
 
 db = SQLAlchemy()
 login_manager = LoginManager()
+migrate = Migrate()
 
 def create_app():
 
@@ -15,14 +18,48 @@ def create_app():
     # Инициализация базы данных
     db.init_app(app)
 
+    # Миграции схемы базы данных (flask db upgrade)
+    migrate.init_app(app, db)
+
     # Инициализация LoginManager
     login_manager.init_app(app)
     login_manager.login_view = 'auth.login'  # Путь для перенаправления при неавторизованном доступе
     login_manager.login_message = "Пожалуйста, войдите, чтобы получить доступ к этой странице."
     login_manager.login_message_category = "warning"  # Категория флеш-сообщения
 
+    # Инициализация кэша пользователей для загрузки текущего пользователя
+    from app.services.auth_services import user_cache
+    user_cache.init_app(app)
+
+    # Инициализация политики хэширования паролей
+    from app.services.auth_services import password_hasher
+    password_hasher.init_app(app)
+
+    # Инициализация журнала действий пользователей
+    from app.services.log_services import audit_log
+    audit_log.init_app(app)
+
+    # Инициализация кэша справочников
+    from app.services.cache_services import reference_cache
+    reference_cache.init_app(app)
+
+    # Инициализация поиска по наименованиям
+    from app.services.search_services import search_index
+    search_index.init_app(app)
+
+    # Инициализация хранения журнала по месяцам и команды "flask logs maintain"
+    from app.services.log_retention_services import log_retention
+    log_retention.init_app(app)
+
+    # Инициализация пула фоновых заданий импорта и экспорта
+    from app.services.job_services import job_runner
+    job_runner.init_app(app)
+
     # Создание таблиц, если они не существуют
     with app.app_context():
+        if db.engine.dialect.name == 'sqlite':
+            # SQLite проверяет внешние ключи (и выполняет ON DELETE CASCADE / SET NULL) только с PRAGMA foreign_keys
+            event.listen(db.engine, 'connect', _enable_sqlite_foreign_keys)
         db.create_all()
     
     # Регистрация маршрутов
@@ -37,8 +74,13 @@ def create_app():
     
     return app
 
-# Функция загрузки пользователя
+def _enable_sqlite_foreign_keys(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA foreign_keys=ON")
+    cursor.close()
+
+# Функция загрузки пользователя: из кэша пользователей, вместе с ролью
 @login_manager.user_loader
 def load_user(user_id):
-    from app.models.auth_models import User  # Импортируем модель внутри функции, чтобы избежать циклического импорта
-    return User.query.get(int(user_id))
+    from app.services.auth_services import user_cache  # Импортируем внутри функции, чтобы избежать циклического импорта
+    return user_cache.get(int(user_id))
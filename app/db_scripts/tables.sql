@@ -2,6 +2,10 @@ CREATE SCHEMA `arm-gs` ;
 
 USE `arm-gs`;
 
+-- Полнотекстовые индексы ngram для поиска по наименованиям создаются без стоп-слов,
+-- иначе n-граммы, совпадающие со стоп-словами, не попадают в индекс и поиск теряет строки
+SET SESSION innodb_ft_enable_stopword = OFF;
+
 -- Создание таблицы ролей (roles)
 CREATE TABLE roles (
     id INT AUTO_INCREMENT PRIMARY KEY,
@@ -34,17 +38,43 @@ CREATE TABLE users (
 DROP TABLE IF EXISTS Log;
 
 CREATE TABLE Log (
-    id INT AUTO_INCREMENT PRIMARY KEY,
+    id INT AUTO_INCREMENT,
     timestamp DATETIME DEFAULT CURRENT_TIMESTAMP NOT NULL,
     username VARCHAR(100) NOT NULL,
     action VARCHAR(255) NOT NULL,
-    details TEXT
+    details TEXT,
+    PRIMARY KEY (id, timestamp),
+    INDEX ix_log_timestamp (timestamp),
+    INDEX ix_log_username (username)
+)
+-- Партиции по месяцам выделяются из pmax командой "flask logs maintain"
+PARTITION BY RANGE COLUMNS(timestamp) (
+    PARTITION pmax VALUES LESS THAN (MAXVALUE)
+);
+
+-- Создание таблицы фоновых заданий импорта и экспорта (job)
+CREATE TABLE IF NOT EXISTS job (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    kind VARCHAR(20) NOT NULL,
+    target VARCHAR(20) NOT NULL,
+    status VARCHAR(20) NOT NULL DEFAULT 'pending',
+    username VARCHAR(100) NOT NULL,
+    params TEXT,
+    progress INT NOT NULL DEFAULT 0,
+    total INT,
+    result TEXT,
+    file_path VARCHAR(500),
+    filename VARCHAR(255),
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP NOT NULL,
+    started_at DATETIME,
+    finished_at DATETIME
 );
 
 -- Создание таблицы федеральных округов (fo)
 CREATE TABLE IF NOT EXISTS fo (
     id INT AUTO_INCREMENT PRIMARY KEY,
-    name VARCHAR(80) NOT NULL UNIQUE
+    name VARCHAR(80) NOT NULL UNIQUE,
+    FULLTEXT KEY ft_fo_name (name) WITH PARSER ngram
 );
 
 -- Создание таблицы субъектов РФ (region)
@@ -52,6 +82,8 @@ CREATE TABLE IF NOT EXISTS region (
     id INT AUTO_INCREMENT PRIMARY KEY,
     name VARCHAR(80) NOT NULL UNIQUE,
     id_fo INT,
+    INDEX ix_region_id_fo (id_fo),
+    FULLTEXT KEY ft_region_name (name) WITH PARSER ngram,
     CONSTRAINT fk_id_fo FOREIGN KEY (id_fo) REFERENCES fo(id) 
         ON DELETE SET NULL ON UPDATE CASCADE
 );
@@ -73,6 +105,7 @@ CREATE TABLE IF NOT EXISTS oes (
     id INT AUTO_INCREMENT PRIMARY KEY,
     name VARCHAR(80) NOT NULL UNIQUE,
     id_oes_type INT,
+    FULLTEXT KEY ft_oes_name (name) WITH PARSER ngram,
     CONSTRAINT fk_oes_type FOREIGN KEY (id_oes_type) REFERENCES oes_type(id) 
         ON DELETE SET NULL ON UPDATE CASCADE
 );
@@ -82,6 +115,8 @@ CREATE TABLE IF NOT EXISTS res (
     id INT AUTO_INCREMENT PRIMARY KEY,
     name VARCHAR(80) NOT NULL UNIQUE,
     id_oes INT,
+    INDEX ix_res_id_oes (id_oes),
+    FULLTEXT KEY ft_res_name (name) WITH PARSER ngram,
     CONSTRAINT fk_oes FOREIGN KEY (id_oes) REFERENCES oes(id) 
         ON DELETE SET NULL ON UPDATE CASCADE
 );
@@ -91,9 +126,13 @@ CREATE TABLE res_region (
     id INT AUTO_INCREMENT PRIMARY KEY,
     id_res INT NOT NULL,
     id_region INT NOT NULL,
-    FOREIGN KEY (id_res) REFERENCES res(id),
+    INDEX ix_res_region_id_res (id_res),
+    INDEX ix_res_region_id_region (id_region),
+    FOREIGN KEY (id_res) REFERENCES res(id)
+    ON DELETE CASCADE,
     FOREIGN KEY (id_region) REFERENCES region(id)
-    ON DELETE CASCADE
+    ON DELETE CASCADE,
+    UNIQUE KEY uq_res_region (id_res, id_region)
 );
 
 -- Добавляем записи в таблицу
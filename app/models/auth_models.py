@@ -1,6 +1,5 @@
 from app import db
 from flask_login import UserMixin
-from werkzeug.security import generate_password_hash, check_password_hash
 
 # Модель для ролей пользователей
 class Role(db.Model):
@@ -14,12 +13,19 @@ class User(db.Model, UserMixin):
     id = db.Column(db.Integer, primary_key=True)
     username = db.Column(db.String(150), unique=True, nullable=False)
     email = db.Column(db.String(150), unique=True, nullable=False)
-    password_hash = db.Column(db.String(128), nullable=False)
+    password_hash = db.Column(db.String(250), nullable=False)
     role_id = db.Column(db.Integer, db.ForeignKey('roles.id'))
     role = db.relationship('Role', backref='users')
 
+    # Хэширование выполняется по политике PASSWORD_* из конфигурации (см. auth_services.PasswordHasher)
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
+        from app.services.auth_services import password_hasher  # Импортируем внутри метода, чтобы избежать циклического импорта
+        self.password_hash = password_hasher.hash(password)
 
     def check_password(self, password):
-        return check_password_hash(self.password_hash, password)
\ No newline at end of file
+        from app.services.auth_services import password_hasher
+        return password_hasher.verify(self.password_hash, password)
+
+    def password_needs_rehash(self):
+        from app.services.auth_services import password_hasher
+        return password_hasher.needs_rehash(self.password_hash)
@@ -3,5 +3,7 @@ from app import db
 # Модель для федеральных округов
 class Fo(db.Model):
     __tablename__ = 'fo'
+    # Полнотекстовый индекс для поиска по наименованию (только MySQL, см. search_services)
+    __table_args__ = (db.Index('ft_fo_name', 'name', mysql_prefix='FULLTEXT', mysql_with_parser='ngram').ddl_if(dialect='mysql'),)
     id = db.Column(db.Integer, primary_key=True, autoincrement=True)
     name = db.Column(db.String(80), unique=True, nullable=False)
\ No newline at end of file
@@ -0,0 +1,20 @@
+from app import db
+from datetime import datetime
+
+# Модель фонового задания импорта или экспорта
+class Job(db.Model):
+    __tablename__ = 'job'
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    kind = db.Column(db.String(20), nullable=False)  # import или export
+    target = db.Column(db.String(20), nullable=False)  # Таблица: fo, oes, region, res, res_region
+    status = db.Column(db.String(20), default='pending', nullable=False)  # pending, running, done, failed
+    username = db.Column(db.String(100), nullable=False)
+    params = db.Column(db.Text, nullable=True)  # Параметры задания в JSON
+    progress = db.Column(db.Integer, default=0, nullable=False)  # Обработано строк
+    total = db.Column(db.Integer, nullable=True)  # Всего строк, если известно
+    result = db.Column(db.Text, nullable=True)  # Итог или текст ошибки
+    file_path = db.Column(db.String(500), nullable=True)  # Загруженный файл импорта или файл результата экспорта
+    filename = db.Column(db.String(255), nullable=True)  # Имя файла для скачивания
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    started_at = db.Column(db.DateTime, nullable=True)
+    finished_at = db.Column(db.DateTime, nullable=True)
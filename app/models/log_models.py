@@ -3,8 +3,10 @@ from datetime import datetime
 
 # Модель хранения логов
 class Log(db.Model):
+    # На MySQL таблица секционирована по месяцам (см. log_retention_services), первичный ключ в ней — (id, timestamp);
+    # FULLTEXT-индексы в секционированных таблицах не поддерживаются, поэтому поиск по действию выполняется по ILIKE
     id = db.Column(db.Integer, primary_key=True)
-    timestamp = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
-    username = db.Column(db.String(100), nullable=False)
+    timestamp = db.Column(db.DateTime, default=datetime.utcnow, nullable=False, index=True)
+    username = db.Column(db.String(100), nullable=False, index=True)
     action = db.Column(db.String(500), nullable=False)
     details = db.Column(db.Text, nullable=True)
\ No newline at end of file
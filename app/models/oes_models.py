@@ -9,6 +9,8 @@ class OesType(db.Model):
 # Модель для ОЭС
 class Oes(db.Model):
     __tablename__ = 'oes'
+    # Полнотекстовый индекс для поиска по наименованию (только MySQL, см. search_services)
+    __table_args__ = (db.Index('ft_oes_name', 'name', mysql_prefix='FULLTEXT', mysql_with_parser='ngram').ddl_if(dialect='mysql'),)
     id = db.Column(db.Integer, primary_key=True, autoincrement=True)
     name = db.Column(db.String(80), unique=True, nullable=False)
     id_oes_type = db.Column(db.Integer, db.ForeignKey('oes_type.id'), nullable=True)
@@ -3,7 +3,9 @@ from app import db
 # Модель для субъекта РФ
 class Region(db.Model):
     __tablename__ = 'region'
+    # Полнотекстовый индекс для поиска по наименованию (только MySQL, см. search_services)
+    __table_args__ = (db.Index('ft_region_name', 'name', mysql_prefix='FULLTEXT', mysql_with_parser='ngram').ddl_if(dialect='mysql'),)
     id = db.Column(db.Integer, primary_key=True, autoincrement=True)
     name = db.Column(db.String(80), unique=True, nullable=False)
-    id_fo = db.Column(db.Integer, db.ForeignKey('fo.id'), nullable=True)
+    id_fo = db.Column(db.Integer, db.ForeignKey('fo.id', ondelete='SET NULL'), nullable=True, index=True)
     fo = db.relationship('Fo', backref='region')
\ No newline at end of file
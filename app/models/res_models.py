@@ -3,12 +3,15 @@ from app import db
 # Модель для региональной ЭС
 class Res(db.Model):
     __tablename__ = 'res'
+    # Полнотекстовый индекс для поиска по наименованию (только MySQL, см. search_services)
+    __table_args__ = (db.Index('ft_res_name', 'name', mysql_prefix='FULLTEXT', mysql_with_parser='ngram').ddl_if(dialect='mysql'),)
     id = db.Column(db.Integer, primary_key=True, autoincrement=True)
     name = db.Column(db.String(255), nullable=False)
-    id_oes = db.Column(db.Integer, db.ForeignKey('oes.id'), nullable=True)
+    id_oes = db.Column(db.Integer, db.ForeignKey('oes.id', ondelete='SET NULL'), nullable=True, index=True)
 
     oes = db.relationship('Oes', backref='related_res')
-    regions = db.relationship('ResRegion', back_populates='res', cascade='all, delete-orphan', lazy='dynamic')
+    regions = db.relationship('ResRegion', back_populates='res', cascade='all, delete-orphan', lazy='dynamic',
+                              passive_deletes=True)
 
     def __init__(self, name, id_oes=None):
         self.name = name
@@ -16,9 +19,10 @@ class Res(db.Model):
 
 class ResRegion(db.Model):
     __tablename__ = 'res_region'
+    __table_args__ = (db.UniqueConstraint('id_res', 'id_region', name='uq_res_region'),)
     id = db.Column(db.Integer, primary_key=True, autoincrement=True)
-    id_res = db.Column(db.Integer, db.ForeignKey('res.id'), nullable=False)
-    id_region = db.Column(db.Integer, db.ForeignKey('region.id'), nullable=False)
+    id_res = db.Column(db.Integer, db.ForeignKey('res.id', ondelete='CASCADE'), nullable=False, index=True)
+    id_region = db.Column(db.Integer, db.ForeignKey('region.id', ondelete='CASCADE'), nullable=False, index=True)
 
     res = db.relationship('Res', back_populates='regions')
     region = db.relationship('Region')
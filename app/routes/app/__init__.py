@@ -2,10 +2,15 @@ from flask import Blueprint
 
 app_bp = Blueprint('app_bp', __name__)
 
+# Токен версии строк таблиц редактирования для шаблонов
+from app.services.grid_services import row_version
+app_bp.add_app_template_global(row_version, 'row_version')
+
 # Импортируем модули с маршрутами
 from .reference_routes import *
 from .fo_routes import *
 from .region_routes import *
 from .oes_routes import *
 from .res_routes import *
+from .job_routes import *
 
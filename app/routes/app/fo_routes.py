@@ -1,26 +1,14 @@
 from flask import (
-    render_template, request, redirect, url_for, flash, session, current_app, send_file
+    render_template, request, redirect, url_for, flash, session, current_app
 )
 from . import app_bp
 from app.forms.fo_forms import FoFilterForm, AddFoForm
 from app.services.fo_services import (
     get_fo_list, update_fo, add_fo, delete_fo_list,
-    import_fo_from_excel, export_fo_to_excel, log_to_db, get_total_fo_records
+    import_fo_from_excel, export_fo_to_excel, get_total_fo_records
 )
-
-
-from app import db
-from app.models.log_models import Log
-
-def log_to_db(username, action, details=None):
-    """Записывает лог действия пользователя в базу данных."""
-    try:
-        log_entry = Log(username=username, action=action, details=details)
-        db.session.add(log_entry)
-        db.session.commit()
-    except Exception as e:
-        print(f"Ошибка записи лога: {e}")
-
+from app.services.log_services import log_to_db
+from app.services.pagination_services import keyset_requested
 
 from collections import Counter
 
@@ -56,8 +44,8 @@ def fo_list():
   
             # Удаление записей
             if fo_delete:
-                delete_fo_list(fo_delete, user)
-                flash("Записи ФО успешно удалены.", "success")
+                deleted = delete_fo_list(fo_delete, user)
+                flash(f"Удалено записей ФО: {deleted}.", "success")
 
            # Формирование данных для обновления
             fo_data = []
@@ -68,6 +56,7 @@ def fo_list():
                 fo_data.append({
                     "id": int(fo_id) if fo_id else None,
                     "name": fo_name.strip(),
+                    "version": request.form.get(f"fo_version_{fo_id}")  # Токен исходной версии строки
                 })
             
             # Проверка на дублирующиеся IDs
@@ -98,7 +87,9 @@ def fo_list():
                               per_page, 
                               fo_filter, 
                               sort_by, 
-                              sort_dir)
+                              sort_dir,
+                              keyset=keyset_requested(request.args),
+                              cursor=request.args.get("cursor"))
 
     return render_template(
         "fo/fo.html",
@@ -206,8 +197,9 @@ def import_fo_to_sql_routes():
         return redirect(url_for("app_bp.fo_list"))
 
     try:
-        imported_count = import_fo_from_excel(file, user)
-        flash(f"Импортировано записей: {imported_count}.", "success")
+        delete_missing = request.form.get("delete_missing") == "1"
+        inserted, updated, deleted = import_fo_from_excel(file, user, delete_missing)
+        flash(f"Импорт завершён: добавлено {inserted}, обновлено {updated}, удалено {deleted}.", "success")
     except ValueError as e:
         flash(str(e), "danger")
     except Exception as e:
@@ -217,39 +209,38 @@ def import_fo_to_sql_routes():
     return redirect(url_for("app_bp.fo_list"))
 
 
-from flask import send_file
 from datetime import datetime
+from app.services.export_services import export_response
 
 @app_bp.route("/export_fo_to_excel", methods=["GET"])
 def export_fo_to_excel_routes():
-    """Маршрут для экспорта данных в Excel."""
+    """Маршрут для экспорта данных в Excel, CSV или Parquet (параметр format)."""
     user = session.get('username', 'Неизвестный пользователь')
     
     fo_filter = request.args.get("fo_filter", "").strip()
     sort_by = request.args.get("sort_by", "id")
     sort_dir = request.args.get("sort_dir", "asc")
+    export_format = request.args.get("format", "xlsx")
 
     try:
         # Получение данных для экспорта
-        excel_data = export_fo_to_excel(user, fo_filter, sort_by, sort_dir)
+        export_data = export_fo_to_excel(user, fo_filter, sort_by, sort_dir, export_format)
         log_to_db(user, "Экспорт завершён", f"Фильтр: {fo_filter}, Сортировка: {sort_by}, Направление: {sort_dir}")
 
         # Проверка наличия данных
-        if excel_data is None or excel_data.getbuffer().nbytes == 0:
+        if export_data is None:
             flash("Нет данных для экспорта.", "warning")
             return redirect(url_for("app_bp.fo_list"))
         
         # Формирование имени файла
-        filename = f"region_data_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
-
-        # Возврат файла через send_file
-        return send_file(
-            excel_data,
-            mimetype="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-            as_attachment=True,
-            download_name=filename
-        )
+        filename = f"fo_data_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+
+        # Потоковая отправка файла в выбранном формате
+        return export_response(export_data, filename, export_format)
     
+    except ValueError as e:
+        flash(str(e), "danger")
+        return redirect(url_for("app_bp.fo_list"))
     except Exception as e:
         current_app.logger.error(f"Ошибка экспорта: {e}")
         flash("Ошибка экспорта данных. Пожалуйста, попробуйте снова.", "danger")
@@ -0,0 +1,92 @@
+import os
+
+from flask import (
+    render_template, request, redirect, url_for, flash, session, current_app, jsonify, send_file, abort
+)
+from . import app_bp
+from app.services.job_services import (
+    submit_import, submit_export, get_user_jobs, get_user_job, job_to_dict, EXPORT_TASKS
+)
+from app.services.export_services import EXPORT_FORMATS
+from app.services.log_services import log_to_db
+
+
+@app_bp.route("/jobs", methods=["GET"])
+def jobs_list():
+    """Маршрут для просмотра фоновых заданий пользователя."""
+    user = session.get('username', 'Неизвестный пользователь')
+    jobs = get_user_jobs(user)
+    has_active = any(job.status in ("pending", "running") for job in jobs)
+    return render_template("jobs/jobs.html", jobs=jobs, has_active=has_active)
+
+
+@app_bp.route("/jobs/import/<target>", methods=["POST"])
+def submit_import_job_routes(target):
+    """Маршрут для постановки импорта из Excel в очередь фоновых заданий."""
+    user = session.get('username', 'Неизвестный пользователь')
+
+    try:
+        job_id = submit_import(target, request.files.get('file'), user, request.form.get("delete_missing") == "1")
+        log_to_db(user, "Импорт поставлен в очередь", f"Задание №{job_id}, таблица: {target}")
+        flash(f"Импорт поставлен в очередь (задание №{job_id}).", "success")
+    except ValueError as e:
+        flash(str(e), "danger")
+    except Exception as e:
+        current_app.logger.error(f"Ошибка постановки импорта в очередь: {e}")
+        flash("Ошибка постановки импорта в очередь.", "danger")
+
+    return redirect(url_for("app_bp.jobs_list"))
+
+
+@app_bp.route("/jobs/export/<target>", methods=["POST"])
+def submit_export_job_routes(target):
+    """Маршрут для постановки экспорта в очередь фоновых заданий (параметры как у маршрутов экспорта)."""
+    user = session.get('username', 'Неизвестный пользователь')
+    filter_names = EXPORT_TASKS[target][1] if target in EXPORT_TASKS else []
+
+    try:
+        job_id = submit_export(
+            target, user,
+            {name: request.form.get(name, "").strip() for name in filter_names},
+            request.form.get("sort_by", "id"),
+            request.form.get("sort_dir", "asc"),
+            request.form.get("format", "xlsx")
+        )
+        log_to_db(user, "Экспорт поставлен в очередь", f"Задание №{job_id}, таблица: {target}")
+        flash(f"Экспорт поставлен в очередь (задание №{job_id}).", "success")
+    except ValueError as e:
+        flash(str(e), "danger")
+    except Exception as e:
+        current_app.logger.error(f"Ошибка постановки экспорта в очередь: {e}")
+        flash("Ошибка постановки экспорта в очередь.", "danger")
+
+    return redirect(url_for("app_bp.jobs_list"))
+
+
+@app_bp.route("/jobs/<int:job_id>", methods=["GET"])
+def job_status_routes(job_id):
+    """Маршрут для получения состояния задания в JSON."""
+    user = session.get('username', 'Неизвестный пользователь')
+    try:
+        return jsonify(job_to_dict(get_user_job(job_id, user)))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 404
+
+
+@app_bp.route("/jobs/<int:job_id>/download", methods=["GET"])
+def job_download_routes(job_id):
+    """Маршрут для скачивания результата задания экспорта."""
+    user = session.get('username', 'Неизвестный пользователь')
+    try:
+        job = get_user_job(job_id, user)
+    except ValueError:
+        abort(404)
+
+    if job.kind != "export" or job.status != "done" or not job.file_path or not os.path.exists(job.file_path):
+        flash("Файл задания недоступен.", "warning")
+        return redirect(url_for("app_bp.jobs_list"))
+
+    log_to_db(user, "Скачивание результата задания", f"Задание №{job.id}, файл: {job.filename}")
+    extension = os.path.splitext(job.filename)[1].lstrip(".")
+    mimetype = next((mime for mime, ext in EXPORT_FORMATS.values() if ext == extension), None)
+    return send_file(job.file_path, mimetype=mimetype, as_attachment=True, download_name=job.filename)
@@ -1,26 +1,14 @@
 from flask import (
-    render_template, request, redirect, url_for, flash, session, current_app, send_file
+    render_template, request, redirect, url_for, flash, session, current_app
 )
 from . import app_bp
 from app.forms.oes_forms import OesFilterForm, AddOesForm
 from app.services.oes_services import (
     get_oes_list, get_oes_types, update_oes, add_oes, delete_oes_list,
-    import_oes_from_excel, export_oes_to_excel, log_to_db, get_total_oes_records
+    import_oes_from_excel, export_oes_to_excel, get_total_oes_records
 )
-
-
-from app import db
-from app.models.log_models import Log
-
-def log_to_db(username, action, details=None):
-    """Записывает лог действия пользователя в базу данных."""
-    try:
-        log_entry = Log(username=username, action=action, details=details)
-        db.session.add(log_entry)
-        db.session.commit()
-    except Exception as e:
-        print(f"Ошибка записи лога: {e}")
-
+from app.services.log_services import log_to_db
+from app.services.pagination_services import keyset_requested
 
 from collections import Counter
 
@@ -57,8 +45,8 @@ def oes_list():
   
             # Удаление записей
             if oes_delete:
-                delete_oes_list(oes_delete, user)
-                flash("Записи ОЭС успешно удалены.", "success")
+                deleted = delete_oes_list(oes_delete, user)
+                flash(f"Удалено записей ОЭС: {deleted}.", "success")
 
            # Формирование данных для обновления
             oes_data = []
@@ -66,7 +54,8 @@ def oes_list():
                 oes_data.append({
                     "id": int(oes_id) if oes_id else None,
                     "name": oes_name.strip(),
-                    "oes_type_id": int(oes_type) if oes_type else None
+                    "oes_type_id": int(oes_type) if oes_type else None,
+                    "version": request.form.get(f"oes_version_{oes_id}")  # Токен исходной версии строки
                 })
             
             # Проверка на дублирующиеся IDs
@@ -97,7 +86,9 @@ def oes_list():
                               per_page, 
                               oes_filter, 
                               sort_by, 
-                              sort_dir)
+                              sort_dir,
+                              keyset=keyset_requested(request.args),
+                              cursor=request.args.get("cursor"))
 
     # Подготовка данных для формы
     oes_types = get_oes_types()
@@ -226,8 +217,9 @@ def import_oes_to_sql_routes():
         return redirect(url_for("app_bp.oes_list"))
 
     try:
-        imported_count = import_oes_from_excel(file, user)
-        flash(f"Импортировано записей: {imported_count}.", "success")
+        delete_missing = request.form.get("delete_missing") == "1"
+        inserted, updated, deleted = import_oes_from_excel(file, user, delete_missing)
+        flash(f"Импорт завершён: добавлено {inserted}, обновлено {updated}, удалено {deleted}.", "success")
     except ValueError as e:
         flash(str(e), "danger")
     except Exception as e:
@@ -237,39 +229,38 @@ def import_oes_to_sql_routes():
     return redirect(url_for("app_bp.oes_list"))
 
 
-from flask import send_file
 from datetime import datetime
+from app.services.export_services import export_response
 
 @app_bp.route("/export_oes_to_excel", methods=["GET"])
 def export_oes_to_excel_routes():
-    """Маршрут для экспорта данных в Excel."""
+    """Маршрут для экспорта данных в Excel, CSV или Parquet (параметр format)."""
     user = session.get('username', 'Неизвестный пользователь')
     
     oes_filter = request.args.get("oes_filter", "").strip()
     sort_by = request.args.get("sort_by", "id")
     sort_dir = request.args.get("sort_dir", "asc")
+    export_format = request.args.get("format", "xlsx")
 
     try:
         # Получение данных для экспорта
-        excel_data = export_oes_to_excel(user, oes_filter, sort_by, sort_dir)
+        export_data = export_oes_to_excel(user, oes_filter, sort_by, sort_dir, export_format)
         log_to_db(user, "Экспорт завершён", f"Фильтр: {oes_filter}, Сортировка: {sort_by}, Направление: {sort_dir}")
 
         # Проверка наличия данных
-        if excel_data is None or excel_data.getbuffer().nbytes == 0:
+        if export_data is None:
             flash("Нет данных для экспорта.", "warning")
             return redirect(url_for("app_bp.oes_list"))
         
         # Формирование имени файла
-        filename = f"region_data_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
-
-        # Возврат файла через send_file
-        return send_file(
-            excel_data,
-            mimetype="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-            as_attachment=True,
-            download_name=filename
-        )
+        filename = f"oes_data_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+
+        # Потоковая отправка файла в выбранном формате
+        return export_response(export_data, filename, export_format)
     
+    except ValueError as e:
+        flash(str(e), "danger")
+        return redirect(url_for("app_bp.oes_list"))
     except Exception as e:
         current_app.logger.error(f"Ошибка экспорта: {e}")
         flash("Ошибка экспорта данных. Пожалуйста, попробуйте снова.", "danger")
@@ -1,26 +1,14 @@
 from flask import (
-    render_template, request, redirect, url_for, flash, Response, session, current_app
+    render_template, request, redirect, url_for, flash, session, current_app
 )
 from . import app_bp
 from app.forms.region_forms import RegionFilterForm, AddRegionForm
 from app.services.region_services import (
     get_region_list, get_fos, update_region, add_region, delete_region_list,
-    import_region_from_excel, export_region_to_excel, log_to_db, get_total_region_records
+    import_region_from_excel, export_region_to_excel, get_total_region_records
 )
-
-
-from app import db
-from app.models.log_models import Log
-
-def log_to_db(username, action, details=None):
-    """Записывает лог действия пользователя в базу данных."""
-    try:
-        log_entry = Log(username=username, action=action, details=details)
-        db.session.add(log_entry)
-        db.session.commit()
-    except Exception as e:
-        print(f"Ошибка записи лога: {e}")
-
+from app.services.log_services import log_to_db
+from app.services.pagination_services import keyset_requested
 
 from collections import Counter
 
@@ -57,8 +45,8 @@ def region_list():
    
             # Удаление записей
             if region_delete:
-                delete_region_list(region_delete, user)
-                flash("Записи успешно удалены.", "success")
+                deleted = delete_region_list(region_delete, user)
+                flash(f"Удалено записей субъектов РФ: {deleted}.", "success")
 
             # Обновление записей
             region_data = []
@@ -67,7 +55,8 @@ def region_list():
                     region_data.append({
                         "id": int(region_id) if region_id else None,
                         "name": region_name.strip(),
-                        "fo_id": int(fo) if fo else None
+                        "fo_id": int(fo) if fo else None,
+                        "version": request.form.get(f"region_version_{region_id}")  # Токен исходной версии строки
                     })
                 except ValueError as e:
                     raise ValueError(f"Ошибка обработки данных: id={region_id}, name={region_name}, type={fo}. Ошибка: {str(e)}")
@@ -98,7 +87,9 @@ def region_list():
                               per_page, 
                               name_filter, 
                               sort_by, 
-                              sort_dir)
+                              sort_dir,
+                              keyset=keyset_requested(request.args),
+                              cursor=request.args.get("cursor"))
 
     # Подготовка данных для формы
     fo = get_fos()
@@ -215,8 +206,9 @@ def import_region_to_sql_routes():
         return redirect(url_for("app_bp.region_list"))
 
     try:
-        imported_count = import_region_from_excel(file, user)
-        flash(f"Импортировано записей: {imported_count}.", "success")
+        delete_missing = request.form.get("delete_missing") == "1"
+        inserted, updated, deleted = import_region_from_excel(file, user, delete_missing)
+        flash(f"Импорт завершён: добавлено {inserted}, обновлено {updated}, удалено {deleted}.", "success")
     except ValueError as e:
         flash(str(e), "danger")
     except Exception as e:
@@ -227,27 +219,32 @@ def import_region_to_sql_routes():
 
 
 from datetime import datetime
+from app.services.export_services import export_response
 
 @app_bp.route("/export_region_to_excel", methods=["GET"])
 def export_region_to_excel_routes():
-    """Маршрут для экспорта данных в Excel."""
+    """Маршрут для экспорта данных в Excel, CSV или Parquet (параметр format)."""
     user = session.get('username', 'Неизвестный пользователь')
     
     name_filter = request.args.get("name_filter", "").strip()
     sort_by = request.args.get("sort_by", "id")
     sort_dir = request.args.get("sort_dir", "asc")
+    export_format = request.args.get("format", "xlsx")
 
     try:
-        excel_data = export_region_to_excel(user, name_filter, sort_by, sort_dir)
+        export_data = export_region_to_excel(user, name_filter, sort_by, sort_dir, export_format)
         log_to_db(user, "Экспорт завершён", f"Фильтр: {name_filter}, Сортировка: {sort_by}, Направление: {sort_dir}")
 
-        filename = f"region_data_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
-        return Response(
-            excel_data,
-            mimetype="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-            headers={"Content-Disposition": f"attachment; filename={filename}"}
-        )
+        if export_data is None:
+            flash("Нет данных для экспорта.", "warning")
+            return redirect(url_for("app_bp.region_list"))
+
+        filename = f"region_data_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+        return export_response(export_data, filename, export_format)
 
+    except ValueError as e:
+        flash(str(e), "danger")
+        return redirect(url_for("app_bp.region_list"))
     except Exception as e:
         current_app.logger.error(f"Ошибка экспорта: {e}")
         flash("Ошибка экспорта данных.", "danger")
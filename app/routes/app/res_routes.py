@@ -1,26 +1,14 @@
 from flask import (
-    render_template, request, redirect, url_for, flash, session, current_app, send_file
+    render_template, request, redirect, url_for, flash, session, current_app, jsonify
 )
 from . import app_bp
 from app.forms.res_forms import ResFilterForm, AddResForm
 from app.services.res_services import (
-    get_res_list, get_oes, update_res, add_res, delete_res_list, get_regions,
-    import_res_from_excel, export_res_to_excel, log_to_db, get_total_with_filter
+    get_res_list, get_oes, update_res, add_res, delete_res_list, get_regions, get_region_options,
+    import_res_from_excel, import_res_region_from_excel, export_res_to_excel, get_total_with_filter
 )
-
-
-from app import db
-from app.models.log_models import Log
-
-def log_to_db(username, action, details=None):
-    """Записывает лог действия пользователя в базу данных."""
-    try:
-        log_entry = Log(username=username, action=action, details=details)
-        db.session.add(log_entry)
-        db.session.commit()
-    except Exception as e:
-        print(f"Ошибка записи лога: {e}")
-
+from app.services.log_services import log_to_db
+from app.services.pagination_services import keyset_requested
 
 from collections import Counter
 
@@ -62,8 +50,8 @@ def res_list():
 
             # Удаление записей
             if res_delete:
-                delete_res_list(res_delete, user)
-                flash("Записи региональных энергосистем успешно удалены.", "success")
+                deleted = delete_res_list(res_delete, user)
+                flash(f"Удалено записей региональных энергосистем: {deleted}.", "success")
 
             # Формирование данных для обновления
             res_data = []
@@ -72,7 +60,8 @@ def res_list():
                     "id": int(res_id) if res_id else None,
                     "name": res_name.strip(),
                     "oes_id": int(oes_id) if oes_id else None,
-                    "regions": [int(region_id) for region_id in res_regions[int(res_id)]]
+                    "regions": [int(region_id) for region_id in res_regions[int(res_id)]],
+                    "version": request.form.get(f"res_version_{res_id}")  # Токен исходной версии строки
                 })
 
             # Проверка на дублирующиеся IDs
@@ -84,9 +73,12 @@ def res_list():
             log_to_db(user, "Полученные данные для обновления региональных энергосистем", str(res_data))
 
             # Обновление данных в базе
-            update_res(res_data, user)
+            _, _, stale = update_res(res_data, user)
 
             flash("Изменения успешно сохранены.", "success")
+            if stale:
+                flash(f"Записи с ID {', '.join(map(str, stale))} удалены другим пользователем, изменения в них не сохранены.",
+                      "warning")
         except ValueError as e:
             flash(str(e), "danger")
         except Exception as e:
@@ -108,16 +100,18 @@ def res_list():
                               res_filter, 
                               oes_filter, 
                               sort_by, 
-                              sort_dir)
+                              sort_dir,
+                              with_regions=True,  # ID регионов загружаются одним запросом на страницу
+                              keyset=keyset_requested(request.args),
+                              cursor=request.args.get("cursor"))
     
     # Подготовка данных для формы
     oes_list = get_oes()
     form.oes.choices = [(0, "Не указан")] + [(o.id, o.name) for o in oes_list]
     
-    regions = get_regions()  # Получаем все регионы
-    for item in pagination.items:
-        # Получаем список ID регионов, связанных с конкретным Res
-        item.region_ids = [region.id_region for region in item.regions]
+    # Наименования выбранных субъектов выводятся по словарю ID -> наименование из кэша справочников;
+    # полный список субъектов загружается окном выбора по запросу (region_options_routes)
+    region_names = dict(get_regions())
 
     return render_template(
         "res/res.html",
@@ -125,7 +119,7 @@ def res_list():
         res_list=pagination.items,
         pagination=pagination,
         oes_list=form.oes.choices,
-        regions_list=regions,
+        region_names=region_names,
         res_filter=res_filter,
         oes_filter=oes_filter,
         sort_by=sort_by,
@@ -134,6 +128,22 @@ def res_list():
     )
 
 
+@app_bp.route("/res/region_options", methods=["GET"])
+def region_options_routes():
+    """
+    Маршрут окна выбора субъектов РФ: варианты в JSON с поиском по началу наименования (параметр q).
+    Без q возвращается полный список; при поиске — не более limit вариантов, а признак truncated
+    сообщает, что подходящих субъектов больше и поиск нужно уточнить.
+    """
+    query = request.args.get("q", "").strip()
+    if not query:
+        return jsonify({"regions": get_region_options(), "truncated": False})
+
+    limit = min(request.args.get("limit", 50, type=int), 200)
+    regions = get_region_options(query, limit + 1)
+    return jsonify({"regions": regions[:limit], "truncated": len(regions) > limit})
+
+
 @app_bp.route("/add_res", methods=["GET", "POST"])
 def add_res_routes():
     """
@@ -264,8 +274,36 @@ def import_res_to_sql_routes():
         return redirect(url_for("app_bp.res_list"))
 
     try:
-        imported_count = import_res_from_excel(file, user)
-        flash(f"Импортировано записей: {imported_count}.", "success")
+        inserted, updated = import_res_from_excel(file, user)
+        flash(f"Импорт завершён: добавлено {inserted}, обновлено {updated}.", "success")
+    except ValueError as e:
+        flash(str(e), "danger")
+    except Exception as e:
+        current_app.logger.error(f"Ошибка импорта: {e}")
+        flash("Ошибка импорта данных.", "danger")
+
+    return redirect(url_for("app_bp.res_list"))
+
+
+@app_bp.route("/import_res_region_to_sql", methods=["POST"])
+def import_res_region_to_sql_routes():
+    """Маршрут для импорта связей РЭС и субъектов РФ из Excel."""
+    user = session.get('username', 'Неизвестный пользователь')
+    log_to_db(user, "Начат импорт связей РЭС и субъектов РФ из Excel")
+
+    if 'file' not in request.files:
+        flash("Файл не найден.", "danger")
+        return redirect(url_for("app_bp.res_list"))
+
+    file = request.files['file']
+    if not file.filename.endswith((".xlsx", ".xls")):
+        flash("Неверный формат файла.", "danger")
+        return redirect(url_for("app_bp.res_list"))
+
+    try:
+        delete_missing = request.form.get("delete_missing") == "1"
+        inserted, deleted = import_res_region_from_excel(file, user, delete_missing)
+        flash(f"Связи обновлены: добавлено {inserted}, удалено {deleted}.", "success")
     except ValueError as e:
         flash(str(e), "danger")
     except Exception as e:
@@ -275,40 +313,39 @@ def import_res_to_sql_routes():
     return redirect(url_for("app_bp.res_list"))
 
 
-from flask import send_file
 from datetime import datetime
+from app.services.export_services import export_response
 
 @app_bp.route("/export_res_to_excel", methods=["GET"])
 def export_res_to_excel_routes():
-    """Маршрут для экспорта данных в Excel."""
+    """Маршрут для экспорта данных в Excel, CSV или Parquet (параметр format)."""
     user = session.get('username', 'Неизвестный пользователь')
     
     res_filter = request.args.get("res_filter", "").strip()
     oes_filter = request.args.get("oes_filter", "").strip()
     sort_by = request.args.get("sort_by", "id")
     sort_dir = request.args.get("sort_dir", "asc")
+    export_format = request.args.get("format", "xlsx")
 
     try:
         # Получение данных для экспорта
-        excel_data = export_res_to_excel(user, res_filter, oes_filter, sort_by, sort_dir)
+        export_data = export_res_to_excel(user, res_filter, oes_filter, sort_by, sort_dir, export_format)
         log_to_db(user, "Экспорт завершён", f"Фильтр: {res_filter, oes_filter}, Сортировка: {sort_by}, Направление: {sort_dir}")
         
         # Проверка наличия данных
-        if excel_data is None or excel_data.getbuffer().nbytes == 0:
+        if export_data is None:
             flash("Нет данных для экспорта.", "warning")
             return redirect(url_for("app_bp.res_list"))
         
         # Формирование имени файла
-        filename = f"res_data_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
+        filename = f"res_data_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
 
-        # Возврат файла через send_file
-        return send_file(
-            excel_data,
-            mimetype="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-            as_attachment=True,
-            download_name=filename
-        )
+        # Потоковая отправка файла в выбранном формате
+        return export_response(export_data, filename, export_format)
 
+    except ValueError as e:
+        flash(str(e), "danger")
+        return redirect(url_for("app_bp.res_list"))
     except Exception as e:
         current_app.logger.error(f"Ошибка экспорта: {e}")
         flash("Ошибка экспорта данных. Пожалуйста, попробуйте снова.", "danger")
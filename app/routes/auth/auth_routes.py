@@ -2,18 +2,7 @@ from datetime import datetime
 from flask import Blueprint, render_template, redirect, url_for, flash, request, session
 from flask_login import login_user, logout_user, login_required, current_user
 from app.models.auth_models import User, db, Role
-from app.models.log_models import Log
-
-# Функция логирования действий
-
-def log_to_db(username, action, details=None):
-    """Записывает лог действия пользователя в базу данных."""
-    try:
-        log_entry = Log(username=username, action=action, details=details)
-        db.session.add(log_entry)
-        db.session.commit()
-    except Exception as e:
-        print(f"Ошибка записи лога: {e}")
+from app.services.log_services import log_to_db
 
 # Создание Blueprint для маршрутов авторизации
 
@@ -32,6 +21,11 @@ def login():
 
             user = User.query.filter_by(email=email).first()
             if user and user.check_password(password):
+                # Хэш, созданный по прежней схеме или стоимости, пересчитывается по текущей политике
+                if user.password_needs_rehash():
+                    user.set_password(password)
+                    db.session.commit()
+                    log_to_db(user.username, 'Хэш пароля обновлён по текущей политике')
                 login_user(user)
                 session['username'] = user.username
                 log_to_db(user.username, 'Успешный вход в систему')
@@ -40,6 +34,10 @@ def login():
             else:
                 log_to_db('Система', f'Неудачная попытка входа с email: {email}')
                 flash('Неправильный email или пароль.', 'danger')
+    except ValueError as e:
+        # Превышен лимит одновременных проверок паролей
+        log_to_db('Система', f'Вход отклонён: {e}')
+        flash(str(e), 'warning')
     except Exception as e:
         log_to_db('Система', f'Ошибка во время входа: {e}')
         flash('Произошла ошибка. Попробуйте снова.', 'danger')
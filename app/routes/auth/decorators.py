@@ -6,9 +6,12 @@ def role_required(role_name):
     def decorator(f):
         @wraps(f)
         def decorated_function(*args, **kwargs):
+            # Роль загружена вместе с пользователем (см. UserCache), дополнительных запросов нет
+            if not current_user.is_authenticated:
+                abort(403)  # Доступ запрещен
             if not current_user.role:
                 return "Роль пользователя не назначена"
-            if not current_user.is_authenticated or current_user.role.name != role_name:
+            if current_user.role.name != role_name:
                 abort(403)  # Доступ запрещен
             return f(*args, **kwargs)
         return decorated_function
@@ -1,6 +1,10 @@
-from flask import Blueprint, render_template, request
+from datetime import datetime, timedelta
+from flask import Blueprint, render_template, request, flash, current_app
 from app.models.log_models import Log
 from app import db
+from app.services.log_retention_services import log_retention
+from app.services.pagination_services import paginate, keyset_requested
+from app.services.search_services import contains_filter
 
 logs_bp = Blueprint('logs', __name__)
 
@@ -12,23 +16,51 @@ def view_logs():
     sort_by = request.args.get('sort_by', 'timestamp')  # Поле для сортировки
     sort_dir = request.args.get('sort_dir', 'desc')  # Направление сортировки
 
-    # Запрос с фильтрацией
-    query = Log.query
+    # Период просмотра: по умолчанию последние LOG_VIEW_DAYS дней, чтобы запрос читал только партиции этих месяцев;
+    # пустое значение в форме снимает ограничение
+    default_from = (datetime.utcnow() - timedelta(days=current_app.config.get('LOG_VIEW_DAYS', 31))).strftime('%Y-%m-%d')
+    date_from_filter = request.args.get('date_from', default_from).strip()
+    date_to_filter = request.args.get('date_to', '').strip()
+    date_from = _parse_date(date_from_filter)
+    date_to = _parse_date(date_to_filter)
+    if date_from_filter and date_from is None:
+        flash(f"Некорректная дата начала периода: {date_from_filter}.", 'warning')
+        date_from_filter, date_from = default_from, _parse_date(default_from)
+    if date_to_filter and date_to is None:
+        flash(f"Некорректная дата окончания периода: {date_to_filter}.", 'warning')
+        date_to_filter = ''
+    if date_to is not None:
+        date_to += timedelta(days=1)  # Дата окончания включается в период
+
+    # Запрос с фильтрацией; записи перенесённых месяцев (без секционирования MySQL) читаются из их таблиц
+    entity = log_retention.source(date_from, date_to)
+    query = db.session.query(entity)
+    if date_from is not None:
+        query = query.filter(entity.timestamp >= date_from)
+    if date_to is not None:
+        query = query.filter(entity.timestamp < date_to)
     if username_filter:
-        query = query.filter(Log.username.ilike(f"%{username_filter}%"))
+        query = query.filter(entity.username.ilike(f"%{username_filter}%"))
     if action_filter:
-        query = query.filter(Log.action.ilike(f"%{action_filter}%"))
+        query = query.filter(contains_filter(entity.action, action_filter, append_only=True))
 
     # Сортировка
-    if sort_by in ['timestamp', 'username', 'action']:
-        if sort_dir == 'desc':
-            query = query.order_by(db.desc(getattr(Log, sort_by)))
-        else:
-            query = query.order_by(db.asc(getattr(Log, sort_by)))
+    sort_column = getattr(entity, sort_by) if sort_by in ['timestamp', 'username', 'action'] else entity.id
 
-    # Пагинация
+    # Пагинация; в режиме keyset глубокие страницы журнала выбираются без OFFSET
     page = request.args.get('page', 1, type=int)
     per_page = 10
-    logs = query.paginate(page=page, per_page=per_page, error_out=False)
+    logs = paginate(query, page, per_page, sort_column, entity.id, sort_dir,
+                    keyset=keyset_requested(request.args), cursor=request.args.get('cursor'))
+
+    return render_template('logs/logs.html', logs=logs, username_filter=username_filter, action_filter=action_filter,
+                           date_from_filter=date_from_filter, date_to_filter=date_to_filter,
+                           sort_by=sort_by, sort_dir=sort_dir)
+
 
-    return render_template('logs/logs.html', logs=logs, username_filter=username_filter, action_filter=action_filter, sort_by=sort_by, sort_dir=sort_dir)
+def _parse_date(value):
+    """Разбирает дату из поля формы (ГГГГ-ММ-ДД); пустое или некорректное значение — None."""
+    try:
+        return datetime.strptime(value, '%Y-%m-%d') if value else None
+    except ValueError:
+        return None
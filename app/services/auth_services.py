@@ -0,0 +1,189 @@
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy import event
+from sqlalchemy.orm import joinedload
+from werkzeug.security import generate_password_hash, check_password_hash
+
+from app import db
+from app.models.auth_models import User, Role
+
+
+class UserCache:
+    """
+    LRU-кэш пользователей для загрузки текущего пользователя (login_manager.user_loader).
+    Пользователь загружается одним запросом вместе с ролью и отсоединяется от сессии,
+    поэтому обычная загрузка страницы не выполняет запросов к users и roles.
+    Запись действительна USER_CACHE_TTL секунд и сбрасывается при изменении пользователя (в том числе пароля
+    и роли) или любой роли через ORM; изменения в других процессах становятся видны по истечении TTL.
+    """
+
+    def __init__(self, max_size=1024, ttl=60):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        """Читает настройки кэша из конфигурации приложения."""
+        self.max_size = app.config.get('USER_CACHE_SIZE', self.max_size)
+        self.ttl = app.config.get('USER_CACHE_TTL', self.ttl)
+        app.extensions['user_cache'] = self
+
+    def get(self, user_id):
+        """Возвращает отсоединённого от сессии пользователя с загруженной ролью или None."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(user_id)
+                return entry[1]
+
+        user = db.session.get(User, user_id, options=[joinedload(User.role)])
+        if user is None:
+            return None
+
+        # Отсоединяем пользователя и роль: объекты переживают сессию запроса и не истекают при её коммитах
+        db.session.expunge(user)
+        if user.role is not None and user.role in db.session:
+            db.session.expunge(user.role)
+
+        with self._lock:
+            self._entries[user_id] = (now + self.ttl, user)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+        return user
+
+    def invalidate(self, user_id=None):
+        """Сбрасывает запись пользователя или, если user_id не указан, весь кэш."""
+        with self._lock:
+            if user_id is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(user_id, None)
+
+
+user_cache = UserCache()
+
+
+@event.listens_for(User, 'after_update')
+@event.listens_for(User, 'after_delete')
+def _invalidate_user(mapper, connection, target):
+    user_cache.invalidate(target.id)
+
+
+@event.listens_for(Role, 'after_update')
+@event.listens_for(Role, 'after_delete')
+def _invalidate_role(mapper, connection, target):
+    # Роль может быть у многих пользователей, поэтому сбрасывается весь кэш
+    user_cache.invalidate()
+
+
+class PasswordHasher:
+    """
+    Хэширование и проверка паролей по настраиваемой схеме:
+    - bcrypt (PASSWORD_BCRYPT_ROUNDS — логарифм числа раундов);
+    - werkzeug (PASSWORD_WERKZEUG_METHOD, например "scrypt" или "pbkdf2:sha256:600000").
+    Схема существующего хэша определяется по его префиксу, поэтому старые хэши продолжают проверяться,
+    а needs_rehash сообщает, что хэш нужно пересчитать по текущей политике.
+    Вычисления выполняются в пуле из PASSWORD_WORKERS потоков: одновременно считается не больше хэшей,
+    чем потоков в пуле, а ожидающих вычисления запросов — не больше PASSWORD_MAX_PENDING.
+    """
+
+    BCRYPT_PREFIXES = ("$2a$", "$2b$", "$2y$")
+
+    def __init__(self, scheme="werkzeug", bcrypt_rounds=12, werkzeug_method="scrypt", workers=4, max_pending=32,
+                 timeout=10):
+        self.scheme = scheme
+        self.bcrypt_rounds = bcrypt_rounds
+        self.werkzeug_method = werkzeug_method
+        self.workers = workers
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self._werkzeug_prefix = None
+        self._executor = None
+        self._slots = None
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        """Читает политику хэширования из конфигурации приложения."""
+        self.scheme = app.config.get('PASSWORD_HASH_SCHEME', self.scheme)
+        self.bcrypt_rounds = app.config.get('PASSWORD_BCRYPT_ROUNDS', self.bcrypt_rounds)
+        self.werkzeug_method = app.config.get('PASSWORD_WERKZEUG_METHOD', self.werkzeug_method)
+        self.workers = app.config.get('PASSWORD_WORKERS', self.workers)
+        self.max_pending = app.config.get('PASSWORD_MAX_PENDING', self.max_pending)
+        self.timeout = app.config.get('PASSWORD_TIMEOUT', self.timeout)
+        if self.scheme not in ("bcrypt", "werkzeug"):
+            raise ValueError(f"Неизвестная схема хэширования паролей: {self.scheme}.")
+        app.extensions['password_hasher'] = self
+
+    def hash(self, password):
+        """Возвращает хэш пароля по текущей политике (в пуле потоков)."""
+        return self._submit(self._hash, password)
+
+    def verify(self, password_hash, password):
+        """Проверяет пароль по хэшу любой поддерживаемой схемы (в пуле потоков)."""
+        if not password_hash:
+            return False
+        return self._submit(self._verify, password_hash, password)
+
+    def needs_rehash(self, password_hash):
+        """Определяет, отличается ли схема или стоимость хэша от текущей политики."""
+        if self.scheme == "bcrypt":
+            # Формат bcrypt: $2b$<раунды>$<соль и хэш>
+            return not password_hash.startswith(self.BCRYPT_PREFIXES) or password_hash[4:6] != f"{self.bcrypt_rounds:02d}"
+        if password_hash.startswith(self.BCRYPT_PREFIXES):
+            return True
+        return password_hash.split("$", 1)[0] != self._werkzeug_method_prefix()
+
+    def shutdown(self, wait=True):
+        """Останавливает пул потоков."""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait)
+
+    def _hash(self, password):
+        if self.scheme == "bcrypt":
+            import bcrypt
+            return bcrypt.hashpw(self._bcrypt_bytes(password), bcrypt.gensalt(self.bcrypt_rounds)).decode("ascii")
+        return generate_password_hash(password, method=self.werkzeug_method)
+
+    def _verify(self, password_hash, password):
+        if password_hash.startswith(self.BCRYPT_PREFIXES):
+            import bcrypt
+            return bcrypt.checkpw(self._bcrypt_bytes(password), password_hash.encode("ascii"))
+        return check_password_hash(password_hash, password)
+
+    @staticmethod
+    def _bcrypt_bytes(password):
+        # bcrypt учитывает только первые 72 байта пароля; обрезаем явно, как это делали прежние версии библиотеки
+        return password.encode("utf-8")[:72]
+
+    def _werkzeug_method_prefix(self):
+        # Полное обозначение метода с параметрами по умолчанию (например, "scrypt:32768:8:1")
+        if self._werkzeug_prefix is None:
+            self._werkzeug_prefix = generate_password_hash("", method=self.werkzeug_method).split("$", 1)[0]
+        return self._werkzeug_prefix
+
+    def _submit(self, function, *args):
+        executor, slots = self._ensure_started()
+        if not slots.acquire(timeout=self.timeout):
+            raise ValueError("Сервер перегружен попытками входа. Повторите попытку позже.")
+        try:
+            return executor.submit(function, *args).result()
+        finally:
+            slots.release()
+
+    def _ensure_started(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="password-hasher")
+                self._slots = threading.BoundedSemaphore(self.workers + self.max_pending)
+            return self._executor, self._slots
+
+
+password_hasher = PasswordHasher()
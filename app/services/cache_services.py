@@ -0,0 +1,67 @@
+import threading
+import time
+
+
+class ReferenceCache:
+    """
+    Кэш справочников (ФО, субъекты РФ, ОЭС, типы ОЭС) в памяти процесса.
+    Каждая таблица имеет версию, которая увеличивается при изменении данных;
+    запись кэша действительна, пока совпадает версия и не истёк TTL.
+    """
+
+    def __init__(self, ttl=300):
+        self.ttl = ttl
+        self._versions = {}
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        """Читает настройки кэша из конфигурации приложения."""
+        self.ttl = app.config.get('REFERENCE_CACHE_TTL', self.ttl)
+        app.extensions['reference_cache'] = self
+
+    def version(self, table):
+        """Возвращает текущую версию таблицы."""
+        with self._lock:
+            return self._versions.get(table, 0)
+
+    def get(self, table, loader, key=None):
+        """
+        Возвращает данные таблицы из кэша или загружает их через loader.
+        :param table: Имя таблицы справочника.
+        :param loader: Функция без аргументов, возвращающая данные из базы.
+        :param key: Дополнительный ключ для нескольких значений одной таблицы (например, числа строк по фильтрам);
+                    все значения таблицы становятся недействительными вместе с её версией.
+        """
+        now = time.monotonic()
+        with self._lock:
+            version = self._versions.get(table, 0)
+            entry = self._entries.get((table, key))
+        if entry is not None and entry[0] == version and entry[1] > now:
+            return entry[2]
+
+        value = loader()
+
+        with self._lock:
+            # Не сохраняем результат, если таблицу изменили во время загрузки
+            if self._versions.get(table, 0) == version:
+                self._entries[(table, key)] = (version, now + self.ttl, value)
+        return value
+
+    def invalidate(self, *tables):
+        """Увеличивает версии таблиц, делая их кэшированные данные недействительными."""
+        with self._lock:
+            for table in tables:
+                self._versions[table] = self._versions.get(table, 0) + 1
+            for entry_key in [entry_key for entry_key in self._entries if entry_key[0] in tables]:
+                del self._entries[entry_key]
+
+    def clear(self):
+        """Сбрасывает весь кэш."""
+        with self._lock:
+            for table in {table for table, _ in self._entries}:
+                self._versions[table] = self._versions.get(table, 0) + 1
+            self._entries.clear()
+
+
+reference_cache = ReferenceCache()
@@ -0,0 +1,210 @@
+import csv
+import tempfile
+from io import StringIO
+from itertools import chain, islice
+
+from flask import Response, current_app, send_file, stream_with_context
+
+EXCEL_MIMETYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+# Поддерживаемые форматы выгрузки: формат -> (MIME-тип, расширение файла)
+EXPORT_FORMATS = {
+    "xlsx": (EXCEL_MIMETYPE, "xlsx"),
+    "csv": ("text/csv", "csv"),
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+}
+
+
+def validate_export_format(export_format):
+    """Проверяет формат выгрузки и возвращает его в нормализованном виде."""
+    export_format = (export_format or "xlsx").strip().lower()
+    if export_format not in EXPORT_FORMATS:
+        raise ValueError(f"Неподдерживаемый формат экспорта: {export_format}.")
+    return export_format
+
+
+def stream_query(query):
+    """
+    Итерирует запрос порциями через серверный курсор,
+    не загружая весь результат в память.
+    """
+    return query.yield_per(current_app.config.get('EXPORT_YIELD_PER', 1000))
+
+
+def export_rows(rows, headers, sheet_name, export_format="xlsx", on_complete=None, progress=None):
+    """
+    Выгружает строки в выбранном формате.
+    :param rows: Итерируемый набор строк (кортежей), например результат stream_query.
+    :param headers: Заголовки столбцов.
+    :param sheet_name: Имя листа (для xlsx).
+    :param export_format: Формат выгрузки: xlsx, csv или parquet.
+    :param on_complete: Функция, вызываемая с количеством выгруженных строк после завершения записи.
+    :param progress: Функция progress(выгружено строк, всего строк), вызываемая после каждых EXPORT_YIELD_PER строк
+                     и по завершении выгрузки (тогда всего строк равно выгруженным).
+    :return: Временный файл (xlsx, parquet), генератор частей файла (csv) или None, если строк нет.
+    """
+    export_format = validate_export_format(export_format)
+
+    # Проверяем наличие данных до начала выгрузки, не теряя первую строку
+    rows = iter(rows)
+    first = next(rows, None)
+    if first is None:
+        return None
+    rows = chain([first], rows)
+    if progress:
+        rows = _track_progress(rows, progress, current_app.config.get('EXPORT_YIELD_PER', 1000))
+
+    if export_format == "csv":
+        return export_rows_to_csv(rows, headers, on_complete)
+
+    if export_format == "parquet":
+        output, count = export_rows_to_parquet(rows, headers)
+    else:
+        output, count = export_rows_to_excel(rows, headers, sheet_name)
+
+    if on_complete:
+        on_complete(count)
+    return output
+
+
+def _track_progress(rows, progress, step):
+    """Передаёт строки дальше, сообщая о числе выгруженных строк после каждых step строк и в конце."""
+    count = 0
+    for count, row in enumerate(rows, start=1):
+        yield row
+        if count % step == 0:
+            progress(count)
+    progress(count, count)
+
+
+def export_rows_to_excel(rows, headers, sheet_name):
+    """
+    Записывает строки в Excel-файл в режиме constant_memory.
+    Книга собирается во временном файле, который остаётся в памяти только до EXPORT_SPOOL_MAX_SIZE байт.
+    :return: Кортеж (файл, количество записанных строк). Файл спозиционирован на начало.
+    """
+    import xlsxwriter
+
+    output = _spooled_file()
+    count = 0
+
+    try:
+        workbook = xlsxwriter.Workbook(output, {"constant_memory": True})
+        worksheet = workbook.add_worksheet(sheet_name)
+        worksheet.write_row(0, 0, headers, workbook.add_format({"bold": True, "border": 1}))
+
+        # В режиме constant_memory строки должны записываться строго по порядку
+        for count, row in enumerate(rows, start=1):
+            worksheet.write_row(count, 0, row)
+
+        workbook.close()
+    except Exception:
+        output.close()
+        raise
+
+    output.seek(0)
+    return output, count
+
+
+def export_rows_to_csv(rows, headers, on_complete=None):
+    """
+    Возвращает генератор частей CSV-файла в кодировке UTF-8.
+    Строки форматируются по мере чтения, без промежуточных структур.
+    """
+    chunk_size = current_app.config.get('EXPORT_YIELD_PER', 1000)
+
+    def generate():
+        buffer = StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(headers)
+        count = 0
+
+        while True:
+            chunk = list(islice(rows, chunk_size))
+            if not chunk:
+                break
+            writer.writerows(chunk)
+            count += len(chunk)
+            yield buffer.getvalue().encode("utf-8")
+            buffer.seek(0)
+            buffer.truncate()
+
+        if buffer.tell():
+            yield buffer.getvalue().encode("utf-8")
+        if on_complete:
+            on_complete(count)
+
+    return generate()
+
+
+def export_rows_to_parquet(rows, headers):
+    """
+    Записывает строки в Parquet-файл пакетами по EXPORT_YIELD_PER строк.
+    Требует установленного пакета pyarrow.
+    :return: Кортеж (файл, количество записанных строк). Файл спозиционирован на начало.
+    """
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ValueError("Экспорт в Parquet недоступен: не установлен пакет pyarrow.")
+
+    chunk_size = current_app.config.get('EXPORT_YIELD_PER', 1000)
+    output = _spooled_file()
+    writer = None
+    count = 0
+
+    try:
+        while True:
+            chunk = list(islice(rows, chunk_size))
+            if not chunk:
+                break
+            columns = list(zip(*chunk))
+
+            if writer is None:
+                # Схема определяется по первому пакету; столбцы без значений считаются строковыми
+                arrays = [pa.array(column) for column in columns]
+                schema = pa.schema([
+                    (header, pa.string() if pa.types.is_null(array.type) else array.type)
+                    for header, array in zip(headers, arrays)
+                ])
+                arrays = [array.cast(field.type) for array, field in zip(arrays, schema)]
+                writer = pq.ParquetWriter(output, schema)
+            else:
+                arrays = [pa.array(column, type=field.type) for column, field in zip(columns, schema)]
+
+            writer.write_batch(pa.RecordBatch.from_arrays(arrays, schema=schema))
+            count += len(chunk)
+
+        if writer is not None:
+            writer.close()
+    except Exception:
+        output.close()
+        raise
+
+    output.seek(0)
+    return output, count
+
+
+def export_response(data, basename, export_format="xlsx"):
+    """
+    Возвращает результат export_rows потоковым ответом.
+    :param data: Временный файл или генератор частей файла.
+    :param basename: Имя файла без расширения.
+    """
+    mimetype, extension = EXPORT_FORMATS[validate_export_format(export_format)]
+    filename = f"{basename}.{extension}"
+
+    if hasattr(data, "read"):
+        # Временный файл закрывается после отправки
+        return send_file(data, mimetype=mimetype, as_attachment=True, download_name=filename)
+
+    return Response(
+        stream_with_context(data),
+        mimetype=mimetype,
+        headers={"Content-Disposition": f"attachment; filename={filename}"}
+    )
+
+
+def _spooled_file():
+    return tempfile.SpooledTemporaryFile(max_size=current_app.config.get('EXPORT_SPOOL_MAX_SIZE', 8 * 1024 * 1024))
@@ -1,38 +1,30 @@
 from app import db
-from app.models.log_models import Log
 from app.models.fo_models import Fo
-from sqlalchemy import text
 from sqlalchemy.exc import IntegrityError
-
-def log_to_db(username, action, details=None):
-    """Записывает лог действия пользователя в базу данных."""
-    try:
-        log_entry = Log(username=username, action=action, details=details)
-        db.session.add(log_entry)
-        db.session.commit()
-    except Exception as e:
-        print(f"Ошибка записи лога: {e}")
-
-
-def get_fo_list(page, per_page, fo_filter=None, sort_by="id", sort_dir="asc"):
-    """Получает список ФО с пагинацией, фильтрацией и сортировкой."""
+from app.services.log_services import log_to_db, deferred_log
+from app.services.cache_services import reference_cache
+from app.services.grid_services import save_grid_rows, delete_grid_rows
+from app.services.import_services import read_import_rows, upsert_by_name, use_streaming, stream_upsert_by_name
+from app.services.pagination_services import paginate
+from app.services.search_services import contains_filter
+
+def get_fo_list(page, per_page, fo_filter=None, sort_by="id", sort_dir="asc", keyset=False, cursor=None):
+    """
+    Получает список ФО с пагинацией, фильтрацией и сортировкой.
+    :param keyset: Режим keyset-пагинации (по курсору) вместо постраничной с OFFSET.
+    :param cursor: Курсор страницы в режиме keyset.
+    """
     query = Fo.query
 
     if fo_filter:
-        query = query.filter(Fo.name.ilike(f"%{fo_filter}%"))
+        query = query.filter(contains_filter(Fo.name, fo_filter))
 
-    # Сортировка
-    if sort_by == "name":
-        query = query.order_by(Fo.name.desc() if sort_dir == "desc" else Fo.name.asc())
-    else:
-        query = query.order_by(Fo.id.desc() if sort_dir == "desc" else Fo.id.asc())
-
-    # Пагинация
-    pagination = query.paginate(page=page, per_page=per_page, error_out=False)
-
-    return pagination
+    # Сортировка и пагинация
+    sort_column = Fo.name if sort_by == "name" else Fo.id
+    return paginate(query, page, per_page, sort_column, Fo.id, sort_dir, keyset, cursor)
 
 
+@deferred_log()
 def update_fo(data, user):
     """
     Обновляет записи ФО в базе данных.
@@ -47,33 +39,33 @@ def update_fo(data, user):
     log_to_db(user, "Получены данные для обновления", f"{data}")
 
     for record in data:
-        fo_id = record.get("id")
         name = record.get("name")
 
         # Проверки на валидность данных
         if not name:
             raise ValueError("Каждая запись должна содержать 'name'.")
 
-        if fo_id:
-            fo = Fo.query.get(fo_id)
-
-            duplicate = Fo.query.filter(Fo.name == name, Fo.id != fo_id).first()
-            if duplicate:
-                raise ValueError(f"Запись с именем '{name}' уже существует.")
-            
-            fo.name = name
-        else:
-            duplicate = Fo.query.filter(Fo.name == name, Fo.id != fo_id).first()
-            if duplicate:
-                raise ValueError(f"Запись с именем '{name}' уже существует.")
-
-            new_fo = Fo(name=name)
-            db.session.add(new_fo)
-
-    # Сохранение изменений в базе данных
+    # Сохранение изменений: две выборки на всю страницу и пакетная запись только изменённых строк
     try:
+        inserted, updated = save_grid_rows(
+            Fo,
+            [
+                {
+                    "id": record.get("id"),
+                    "name": record.get("name"),
+                    "version": record.get("version")
+                }
+                for record in data
+            ],
+            ["name"]
+        )
         db.session.commit()
-        log_to_db(user, "Обновление записей ФО", f"Обновлено записей: {len(data)}")
+        if inserted or updated:
+            reference_cache.invalidate(Fo.__tablename__)
+        log_to_db(user, "Обновление записей ФО", f"Добавлено записей: {inserted}, обновлено записей: {updated}")
+    except ValueError:
+        db.session.rollback()
+        raise
     except IntegrityError as e:
         db.session.rollback()
         log_to_db(user, "Ошибка обновления ФО", str(e))
@@ -84,9 +76,11 @@ def update_fo(data, user):
         raise ValueError(f"Произошла ошибка при обновлении данных: {e}")
 
 
+@deferred_log()
 def add_fo(data, user):
     """
     Добавляет или обновляет записи ФО в базе данных.
+    Все записи сохраняются одной транзакцией.
     :param data: Список словарей с данными ФО. Пример:
                  [{"id": 1, "name": "Центральный ФО"}, ...]
     :param user: Имя пользователя для логирования.
@@ -95,57 +89,58 @@ def add_fo(data, user):
     if not isinstance(data, list):
         raise ValueError("Данные должны быть предоставлены в виде списка словарей.")
 
-    for record in data:
-        fo_id = record.get("id")
-        name = record.get("name")
+    messages = []  # Сообщения журнала, записываемые после успешного сохранения
 
-        # Проверка на наличие необходимых данных
-        if not name:
-            log_to_db(user, "Ошибка валидации", f"Запись: {record}")
-            raise ValueError("Каждая запись должна содержать 'name'.")
+    try:
+        for record in data:
+            fo_id = record.get("id")
+            name = record.get("name")
+
+            # Проверка на наличие необходимых данных
+            if not name:
+                log_to_db(user, "Ошибка валидации", f"Запись: {record}")
+                raise ValueError("Каждая запись должна содержать 'name'.")
+
+            if fo_id:
+                # Обновление существующей записи
+                fo = Fo.query.get(fo_id)
+                if not fo:
+                    log_to_db(user, "Ошибка обновления", f"ФО с ID {fo_id} не существует.")
+                    raise ValueError(f"Запись с ID {fo_id} не найдена.")
 
-        if fo_id:
-            # Обновление существующей записи
-            fo = Fo.query.get(fo_id)
-            if fo:
                 # Проверка на дублирование имени
                 duplicate = Fo.query.filter(Fo.name == name, Fo.id != fo_id).first()
                 if duplicate:
                     log_to_db(user, "Ошибка дублирования", f"Имя: {name}, ID: {fo_id}")
                     raise ValueError(f"Запись с именем '{name}' уже существует.")
-                
+
                 # Обновление полей записи
                 fo.name = name
-                
-                try:
-                    # Сохранение изменений в базе данных
-                    db.session.commit()
-                    log_to_db(user, "Успешное обновление", f"Обновлено ФО с ID: {fo_id}")
-                except Exception as e:
-                    db.session.rollback()  # Откат транзакции в случае ошибки
-                    log_to_db(user, "Ошибка сохранения", f"Ошибка при обновлении ФО с ID: {fo_id}, ошибка: {str(e)}")
-                    raise ValueError(f"Ошибка при обновлении записи с ID {fo_id}: {str(e)}")
+                messages.append(("Успешное обновление", f"Обновлено ФО с ID: {fo_id}"))
             else:
-                log_to_db(user, "Ошибка обновления", f"ФО с ID {fo_id} не существует.")
-                raise ValueError(f"Запись с ID {fo_id} не найдена.")
-        else:
-            # Добавление новой записи
-            duplicate = Fo.query.filter(Fo.name == name).first()
-            if duplicate:
-                log_to_db(user, "Ошибка дублирования", f"Имя: {name}")
-                raise ValueError(f"Запись с именем '{name}' уже существует.")
-
-            new_fo = Fo(name=name)
-            db.session.add(new_fo)
-
-            try:
-                # Сохранение новой записи в базе данных
-                db.session.commit()
-                log_to_db(user, "Успешное добавление", f"Добавлено новое ФО: {name}")
-            except Exception as e:
-                db.session.rollback()  # Откат транзакции в случае ошибки
-                log_to_db(user, "Ошибка сохранения", f"Ошибка при добавлении ФО: {name}, ошибка: {str(e)}")
-                raise ValueError(f"Ошибка при добавлении новой записи: {str(e)}")
+                # Добавление новой записи
+                duplicate = Fo.query.filter(Fo.name == name).first()
+                if duplicate:
+                    log_to_db(user, "Ошибка дублирования", f"Имя: {name}")
+                    raise ValueError(f"Запись с именем '{name}' уже существует.")
+
+                db.session.add(Fo(name=name))
+                messages.append(("Успешное добавление", f"Добавлено новое ФО: {name}"))
+    except ValueError:
+        db.session.rollback()
+        raise
+
+    try:
+        # Сохранение всех записей в базе данных
+        db.session.commit()
+        reference_cache.invalidate(Fo.__tablename__)
+    except Exception as e:
+        db.session.rollback()  # Откат транзакции в случае ошибки
+        log_to_db(user, "Ошибка сохранения", f"Ошибка при сохранении ФО: {data}, ошибка: {str(e)}")
+        raise ValueError(f"Ошибка при сохранении записей: {str(e)}")
+
+    for action, details in messages:
+        log_to_db(user, action, details)
 
 def get_total_fo_records(fo_filter):
     """
@@ -155,75 +150,74 @@ def get_total_fo_records(fo_filter):
     """
     query = Fo.query
     if fo_filter:
-        query = query.filter(Fo.name.ilike(f"%{fo_filter}%"))
+        query = query.filter(contains_filter(Fo.name, fo_filter))
     return query.count()
 
+@deferred_log()
 def delete_fo_list(ids, user):
-    """Удаляет записи ФО по переданным ID."""
-    log_to_db(user, "Удаление записей", f"Переданы ID для удаления: {ids}")
-    
-    successful_deletes = 0  # Для подсчета успешных удалений
-
-    for fo_id in ids:
-        try:
-            fo_id = int(fo_id)  # Приведение к целому числу
-            fo = Fo.query.get(fo_id)
-            if fo:
-                db.session.delete(fo)
-                successful_deletes += 1
-                log_to_db(user, "Удаление записи", f"Удален ФО ID: {fo_id}")
-            else:
-                log_to_db(user, "Ошибка удаления", f"Запись с ID {fo_id} не найдена.")
-        except ValueError:
-            log_to_db(user, "Ошибка удаления", f"Некорректный ID: {fo_id}")
-
+    """
+    Удаляет записи ФО по переданным ID одним запросом.
+    :return: Количество удалённых записей.
+    :raises ValueError: Если ID некорректны или удаление не выполнено.
+    """
     try:
+        deleted = delete_grid_rows(Fo, ids)
         db.session.commit()
-        log_to_db(user, "Удаление завершено", f"Успешно удалено записей: {successful_deletes}")
+    except ValueError:
+        db.session.rollback()
+        raise
     except Exception as e:
         db.session.rollback()
         log_to_db(user, "Ошибка удаления", str(e))
         raise ValueError("Ошибка при удалении данных.")
 
+    if deleted:
+        reference_cache.invalidate(Fo.__tablename__)
+    log_to_db(user, "Удаление записей", f"Удалено записей ФО: {deleted} из {len(ids)}, ID: {', '.join(map(str, ids))}")
+    return deleted
 
-def import_fo_from_excel(file, user):
-    """Импортирует данные ФО из Excel-файла в базу данных."""
-    import pandas as pd
 
+@deferred_log()
+def import_fo_from_excel(file, user, delete_missing=False, progress=None):
+    """
+    Импортирует данные ФО из Excel-файла в базу данных.
+    Записи сопоставляются по наименованию: новые добавляются, изменённые обновляются,
+    неизменённые не затрагиваются и сохраняют свои ID (и ссылки на них). Всё выполняется одной транзакцией;
+    xlsx-файлы больше IMPORT_STREAMING_THRESHOLD читаются и записываются потоково по частям в той же транзакции.
+    :param delete_missing: Удалять ли записи, отсутствующие в файле.
+    :param progress: Функция progress(обработано строк, всего строк) для отчёта о ходе импорта:
+                     при потоковом чтении — после каждой части, иначе — по завершении.
+    :return: Кортеж (количество добавленных, обновлённых, удалённых записей).
+    """
     try:
-        data = pd.read_excel(file)
-
-        if 'name' not in data.columns not in data.columns:
-            raise ValueError("Неверный формат файла. Отсутствуют необходимые столбцы.")
-
-        db.session.query(Fo).delete()
-        db.session.commit()
-
-        db.session.execute(text("ALTER TABLE fo AUTO_INCREMENT = 1"))
-        db.session.commit()
-
-        records = [Fo(name=row['name']) for _, row in data.iterrows()]
-        db.session.bulk_save_objects(records)
-        db.session.commit()
-
-        log_to_db(user, "Импорт завершён", f"Импортировано записей: {len(records)}")
-        return len(records)
+        if use_streaming(file):
+            # Большой файл: потоковое чтение и запись по частям, коммит — после всех частей
+            inserted, updated, deleted = stream_upsert_by_name(Fo, file, {"name": str}, delete_missing, progress)
+            db.session.commit()
+        else:
+            # Читаем и проверяем только нужные столбцы; повторы имён схлопываются
+            rows = read_import_rows(file, {"name": str}, required=["name"], unique=["name"])
+            inserted, updated, deleted = upsert_by_name(Fo, rows, [], delete_missing)
+            db.session.commit()
+            if progress:
+                progress(len(rows), len(rows))
+        if inserted or updated or deleted:
+            reference_cache.invalidate(Fo.__tablename__)
+
+        log_to_db(user, "Импорт завершён", f"Добавлено: {inserted}, обновлено: {updated}, удалено: {deleted}")
+        return inserted, updated, deleted
     except Exception as e:
+        db.session.rollback()
         log_to_db(user, "Ошибка импорта", str(e))
         raise ValueError(f"Ошибка при импорте данных: {e}")
 
-import pandas as pd
-from io import BytesIO
+from app.services.export_services import stream_query, export_rows
 
-def export_fo_to_excel(user, fo_filter=None, sort_by="id", sort_dir="asc"):
-    """Экспортирует данные ФО в Excel и возвращает бинарный поток."""
-
-    log_to_db(user, "Начата выгрузка таблицы ФО из базы данных")
-    log_to_db(user, "Параметры экспорта", f"fo_filter={fo_filter}, sort_by={sort_by}, sort_dir={sort_dir}")
-    
-    query = Fo.query
+def get_fo_export_rows(fo_filter=None, sort_by="id", sort_dir="asc"):
+    """Возвращает запрос строк экспорта ФО: (ID, наименование)."""
+    query = db.session.query(Fo.id, Fo.name)
     if fo_filter:
-        query = query.filter(Fo.name.ilike(f"%{fo_filter}%"))
+        query = query.filter(contains_filter(Fo.name, fo_filter))
 
     # Сортировка
     if sort_by == "id":
@@ -231,23 +225,30 @@ def export_fo_to_excel(user, fo_filter=None, sort_by="id", sort_dir="asc"):
     elif sort_by == "name":
         query = query.order_by(Fo.name.desc() if sort_dir == "desc" else Fo.name.asc())
 
-    fo_items = query.all()
-    data = [{
-        "ID": o.id,
-        "Наименование": o.name
-    } for o in fo_items]
-
-    log_to_db(user, "Подготовка данных для экспорта таблицы субъектов РФ в Excel", f"Записей для экспорта: {len(data)}")
-
-    # Подготовка данных к записи в Excel
-    df = pd.DataFrame(data)
-    
-    # Создание Excel-файла
-    output = BytesIO()
-    with pd.ExcelWriter(output, engine="xlsxwriter") as writer:
-        df.to_excel(writer, index=False, sheet_name="ФО")
-
-    # Возврат файла в ответе
-    output.seek(0)
-    log_to_db(user, "Экспорт таблицы субъектов РФ в Excel завершён", f"Экспортировано записей: {len(data)}")
+    return query
+
+
+def export_fo_to_excel(user, fo_filter=None, sort_by="id", sort_dir="asc", export_format="xlsx", progress=None):
+    """
+    Экспортирует данные ФО в Excel, CSV или Parquet.
+    :param export_format: Формат выгрузки: xlsx, csv или parquet.
+    :param progress: Функция progress(выгружено строк, всего строк) для отчёта о ходе выгрузки.
+    :return: Временный файл, генератор частей файла (csv) или None, если данных для экспорта нет.
+    """
+
+    log_to_db(user, "Начата выгрузка таблицы ФО из базы данных")
+    log_to_db(user, "Параметры экспорта", f"fo_filter={fo_filter}, sort_by={sort_by}, sort_dir={sort_dir}, format={export_format}")
+
+    # Выгрузка потоково, порциями из серверного курсора
+    output = export_rows(
+        stream_query(get_fo_export_rows(fo_filter, sort_by, sort_dir)),
+        ["ID", "Наименование"],
+        "ФО",
+        export_format,
+        on_complete=lambda count: log_to_db(user, "Экспорт таблицы ФО завершён", f"Экспортировано записей: {count}"),
+        progress=progress
+    )
+
+    if output is None:
+        log_to_db(user, "Экспорт завершён", "Нет данных для экспорта.")
     return output
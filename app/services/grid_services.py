@@ -0,0 +1,120 @@
+import hashlib
+
+from sqlalchemy import delete, insert, select, update
+
+from app import db
+
+
+def row_version(*values):
+    """
+    Токен версии строки таблицы редактирования: хэш значений строки на момент вывода страницы.
+    Списки значений (например, ID связанных субъектов РФ) сравниваются без учёта порядка.
+    """
+    normalized = tuple(tuple(sorted(value)) if isinstance(value, (list, tuple, set)) else value for value in values)
+    return hashlib.md5(repr(normalized).encode("utf-8")).hexdigest()[:16]
+
+
+def save_grid_rows(model, records, columns):
+    """
+    Сохраняет строки таблицы редактирования справочника с уникальным наименованием (name).
+    Изменяемые записи и записи с теми же наименованиями загружаются двумя запросами, уникальность
+    проверяется в памяти; новые строки добавляются одним пакетным INSERT, а из существующих одним пакетным
+    UPDATE по первичному ключу записываются только изменённые. Строки с ID удалённых записей пропускаются.
+    Если строка содержит токен версии ("version"), он сверяется с текущими значениями записи,
+    чтобы не затереть изменения другого пользователя. Коммит выполняет вызывающая сторона.
+    :param model: Модель справочника с полями id и name.
+    :param records: Список словарей {"id": ID или None, <столбец>: значение, ..., "version": токен или None}
+                    с именами столбцов модели.
+    :param columns: Имена сохраняемых столбцов, включая name; порядок совпадает с аргументами row_version в шаблоне.
+    :return: Кортеж (количество добавленных, количество обновлённых записей).
+    :raises ValueError: Если наименование уже занято другой записью, повторяется среди строк
+                        или запись изменена после вывода страницы.
+    """
+    ids = {record["id"] for record in records if record.get("id")}
+    names = {record["name"] for record in records}
+    fields = [getattr(model, column) for column in columns]
+
+    # Текущие значения изменяемых записей
+    current = {}
+    if ids:
+        current = {row[0]: tuple(row[1:]) for row in db.session.query(model.id, *fields).filter(model.id.in_(ids))}
+
+    # Владельцы наименований среди существующих записей
+    owners = dict(db.session.query(model.name, model.id).filter(model.name.in_(names))) if names else {}
+
+    inserts = []
+    updates = []
+    seen = set()
+    for record in records:
+        record_id = record.get("id")
+        name = record["name"]
+        if record.get("version") and record_id in current and row_version(*current[record_id]) != record["version"]:
+            raise ValueError(f"Запись '{name}' была изменена другим пользователем. Обновите страницу и повторите изменения.")
+
+        owner = owners.get(name)
+        if (owner is not None and owner != record_id) or name in seen:
+            raise ValueError(f"Запись с именем '{name}' уже существует.")
+        seen.add(name)
+
+        values = {column: record[column] for column in columns}
+        if not record_id:
+            inserts.append(values)
+        elif record_id in current and current[record_id] != tuple(values.values()):
+            updates.append({"id": record_id, **values})
+
+    if inserts:
+        db.session.execute(insert(model), inserts)
+    if updates:
+        db.session.execute(update(model), updates)
+
+    return len(inserts), len(updates)
+
+
+def delete_grid_rows(model, ids):
+    """
+    Удаляет записи справочника по списку ID из таблицы редактирования одним запросом DELETE ... WHERE id IN (...).
+    Зависимые записи предварительно обрабатываются в той же транзакции по правилам ondelete внешних ключей моделей
+    (см. _delete_dependents), поэтому удаление не зависит от ограничений в схеме базы данных,
+    созданной до их объявления. Коммит выполняет вызывающая сторона.
+    :param ids: ID записей (строки из формы или числа); повторы игнорируются.
+    :return: Количество удалённых записей; ID уже удалённых записей не учитываются.
+    :raises ValueError: Если среди ID есть нечисловые значения.
+    """
+    try:
+        ids = {int(record_id) for record_id in ids}
+    except (TypeError, ValueError):
+        raise ValueError(f"Некорректные ID для удаления: {', '.join(map(str, ids))}.")
+    if not ids:
+        return 0
+    _delete_dependents(model.__table__, ids)
+    return db.session.execute(delete(model).where(model.id.in_(ids))).rowcount
+
+
+def _delete_dependents(table, ids):
+    """
+    Обрабатывает записи, ссылающиеся на удаляемые записи таблицы, по правилу ondelete внешнего ключа в модели:
+    CASCADE — удаление (с рекурсивной обработкой их зависимых записей), SET NULL — обнуление ссылки.
+    Каждое правило выполняется одним запросом по всему списку ID.
+    """
+    for child in db.metadata.sorted_tables:
+        for foreign_key in child.foreign_keys:
+            if foreign_key.column.table is not table or foreign_key.column.name != "id":
+                continue
+            column = foreign_key.parent
+            ondelete = (foreign_key.ondelete or "").upper()
+            if ondelete == "CASCADE":
+                if _is_referenced(child):
+                    child_ids = db.session.execute(select(child.c.id).where(column.in_(ids))).scalars().all()
+                    if child_ids:
+                        _delete_dependents(child, child_ids)
+                db.session.execute(delete(child).where(column.in_(ids)))
+            elif ondelete == "SET NULL":
+                db.session.execute(update(child).where(column.in_(ids)).values({column.name: None}))
+
+
+def _is_referenced(table):
+    return any(
+        foreign_key.column.table is table
+        for other in db.metadata.sorted_tables
+        for foreign_key in other.foreign_keys
+    )
@@ -0,0 +1,261 @@
+from itertools import islice
+
+from flask import current_app
+from sqlalchemy import delete, insert, update
+
+from app import db
+from app.services.grid_services import delete_grid_rows
+
+
+def read_import_rows(file, columns, required=(), unique=None):
+    """
+    Читает из Excel-файла только нужные столбцы и возвращает нормализованные строки в виде кортежей.
+    :param file: Файл или путь к Excel-файлу.
+    :param columns: Словарь {столбец: тип} в порядке элементов кортежа; тип — str или int.
+    :param required: Столбцы, которые не могут быть пустыми.
+    :param unique: Столбцы ключа для удаления повторов (остаётся последняя строка); None — все столбцы.
+    :raises ValueError: Если в файле нет нужных столбцов или данные некорректны.
+    """
+    import pandas as pd
+
+    # Читаем только нужные столбцы без определения типов; имена столбцов сравниваются без пробелов
+    data = pd.read_excel(file, usecols=lambda name: str(name).strip() in columns, dtype=object)
+    data.columns = [str(name).strip() for name in data.columns]
+    return normalize_import_frame(data, columns, required, unique)
+
+
+def normalize_import_frame(data, columns, required=(), unique=None):
+    """
+    Проверяет и нормализует DataFrame импорта векторными операциями:
+    обрезка пробелов, приведение типов, проверка пустых значений и удаление повторов.
+    Номера строк в сообщениях об ошибках соответствуют строкам листа Excel (с учётом заголовка).
+    :return: Список кортежей в порядке столбцов columns; пустые значения заменяются на None.
+    """
+    import pandas as pd
+
+    missing = [column for column in columns if column not in data.columns]
+    if missing:
+        raise ValueError(f"Неверный формат файла. Отсутствуют необходимые столбцы: {', '.join(missing)}.")
+
+    data = data[list(columns)].copy()
+    for column, column_type in columns.items():
+        if column_type is int:
+            values = pd.to_numeric(data[column], errors="coerce")
+            invalid = (values.isna() & data[column].notna()) | (values.fillna(0) % 1 != 0)
+            if invalid.any():
+                raise ValueError(f"Столбец '{column}' содержит нецелые значения в строках: {_excel_rows(invalid)}.")
+            data[column] = values.astype("Int64")
+        else:
+            values = data[column].astype("string").str.strip()
+            data[column] = values.mask(values == "")
+
+    for column in required:
+        empty = data[column].isna()
+        if empty.any():
+            raise ValueError(f"Столбец '{column}' содержит пустые значения в строках: {_excel_rows(empty)}.")
+
+    data = data.drop_duplicates(subset=list(unique) if unique else None, keep="last")
+
+    # Приводим к объектам Python: pd.NA -> None, Int64 -> int
+    data = data.astype(object).where(data.notna(), None)
+    return list(data.itertuples(index=False, name=None))
+
+
+def _excel_rows(mask, limit=10):
+    rows = [int(index) + 2 for index in mask[mask].index[:limit]]
+    return ", ".join(map(str, rows)) + (" и др." if mask.sum() > limit else "")
+
+
+def use_streaming(file):
+    """
+    Определяет, нужно ли импортировать файл потоково: для xlsx-файлов больше IMPORT_STREAMING_THRESHOLD байт.
+    Формат xls читается только целиком.
+    """
+    filename = getattr(file, "filename", None) or str(file)
+    if not filename.lower().endswith(".xlsx"):
+        return False
+
+    stream = getattr(file, "stream", file)
+    if hasattr(stream, "seek"):
+        position = stream.tell()
+        size = stream.seek(0, 2)
+        stream.seek(position)
+    else:
+        import os
+        size = os.path.getsize(file)
+    return size > current_app.config.get('IMPORT_STREAMING_THRESHOLD', 10 * 1024 * 1024)
+
+
+def iter_import_chunks(file, columns, required=(), unique=None):
+    """
+    Читает первый лист xlsx-файла потоково (openpyxl в режиме read_only) частями по IMPORT_CHUNK_SIZE строк.
+    Память ограничена размером одной части; каждая часть нормализуется так же, как в read_import_rows.
+    Повторы удаляются только внутри части.
+    :return: Генератор кортежей (строки части, обработано строк, всего строк на листе или None).
+    :raises ValueError: Если в файле нет нужных столбцов или данные некорректны.
+    """
+    import pandas as pd
+    from openpyxl import load_workbook
+
+    chunk_size = current_app.config.get('IMPORT_CHUNK_SIZE', 5000)
+    workbook = load_workbook(file, read_only=True, data_only=True)
+    try:
+        worksheet = workbook.worksheets[0]
+        total = worksheet.max_row - 1 if worksheet.max_row else None
+        rows = worksheet.iter_rows(values_only=True)
+
+        header = [str(name).strip() if name is not None else "" for name in next(rows, ())]
+        missing = [column for column in columns if column not in header]
+        if missing:
+            raise ValueError(f"Неверный формат файла. Отсутствуют необходимые столбцы: {', '.join(missing)}.")
+        positions = [header.index(column) for column in columns]
+
+        processed = 0
+        while True:
+            chunk = list(islice(rows, chunk_size))
+            if not chunk:
+                break
+            values = [
+                tuple(row[position] if position < len(row) else None for position in positions)
+                for row in chunk
+            ]
+            # Номера строк продолжаются от предыдущей части, чтобы ошибки указывали на строки листа
+            data = pd.DataFrame(values, columns=list(columns), index=range(processed, processed + len(values)), dtype=object)
+            data = data[data.notna().any(axis=1)]
+            processed += len(chunk)
+            yield normalize_import_frame(data, columns, required, unique), processed, total
+    finally:
+        workbook.close()
+
+
+def stream_upsert_by_name(model, file, columns, delete_missing=False, progress=None):
+    """
+    Потоковый вариант upsert_by_name для больших файлов: файл читается и записывается в базу по частям,
+    поэтому в памяти находится только одна часть. Все части и удаление отсутствующих записей выполняются
+    в одной транзакции: коммит выполняет вызывающая сторона, при ошибке откат отменяет весь импорт.
+    :param columns: Словарь {столбец: тип} для read_import_rows; первым должен идти name.
+    :param delete_missing: Удалить после загрузки записи, имена которых не встретились в файле.
+    :param progress: Функция progress(обработано строк, всего строк), вызываемая после каждой части.
+    :return: Кортеж (количество добавленных, обновлённых, удалённых записей).
+    """
+    update_columns = list(columns)[1:]
+    inserted = updated = deleted = 0
+    names = set()
+
+    for rows, processed, total in iter_import_chunks(file, columns, required=["name"], unique=["name"]):
+        chunk_inserted, chunk_updated, _ = upsert_by_name(model, rows, update_columns, listed_only=True)
+        inserted += chunk_inserted
+        updated += chunk_updated
+        if delete_missing:
+            names.update(row[0] for row in rows)
+
+        current_app.logger.info(f"Импорт {model.__tablename__}: обработано строк {processed} из {total}")
+        if progress:
+            progress(processed, total)
+
+    if delete_missing:
+        missing = [row.id for row in db.session.query(model.id, model.name) if row.name not in names]
+        for chunk in _chunks(missing):
+            delete_grid_rows(model, chunk)
+        deleted = len(missing)
+
+    return inserted, updated, deleted
+
+
+def upsert_by_name(model, rows, columns, delete_missing=False, listed_only=False):
+    """
+    Добавляет и обновляет записи справочника, сопоставляя их по наименованию (name).
+    Существующие записи загружаются одним запросом, новые добавляются одним пакетным INSERT,
+    изменённые обновляются одним пакетным UPDATE по первичному ключу. Неизменённые записи не затрагиваются,
+    их ID сохраняются. Коммит выполняет вызывающая сторона.
+    :param model: Модель справочника с полями id и name.
+    :param rows: Кортежи (name, <значения столбцов columns>); при повторе имени используется последняя строка.
+    :param columns: Имена обновляемых столбцов, кроме name, в порядке значений кортежа.
+    :param delete_missing: Удалять ли записи, отсутствующие в rows; ссылки на них обрабатываются delete_grid_rows.
+    :param listed_only: Загружать только записи с именами из rows (для обработки файла по частям).
+    :return: Кортеж (количество добавленных, обновлённых, удалённых записей).
+    """
+    fields = [getattr(model, column) for column in columns]
+
+    # Текущее состояние таблицы одним запросом: name -> строка
+    query = db.session.query(model.id, model.name, *fields)
+    if listed_only:
+        query = query.filter(model.name.in_({row[0] for row in rows}))
+    existing = {}
+    for row in query:
+        existing.setdefault(row.name, row)
+
+    inserts = {}
+    updates = {}
+    for name, *values in rows:
+        row = existing.get(name)
+        if row is None:
+            inserts[name] = {"name": name, **dict(zip(columns, values))}
+        elif tuple(row[2:]) != tuple(values):
+            updates[row.id] = {"id": row.id, **dict(zip(columns, values))}
+
+    deletes = []
+    if delete_missing:
+        names = {row[0] for row in rows}
+        deletes = [row.id for name, row in existing.items() if name not in names]
+
+    # Зависимые записи обрабатываются так же, как при удалении из таблицы редактирования (по ondelete в моделях)
+    for chunk in _chunks(deletes):
+        delete_grid_rows(model, chunk)
+    if inserts:
+        db.session.execute(insert(model), list(inserts.values()))
+    if updates:
+        db.session.execute(update(model), list(updates.values()))
+
+    return len(inserts), len(updates), len(deletes)
+
+
+def sync_links(model, left, right, pairs, scope=None):
+    """
+    Приводит таблицу связей к переданному набору пар, изменяя только различающиеся строки.
+    Текущие связи загружаются одним запросом, лишние удаляются пакетными DELETE ... WHERE id IN (...),
+    недостающие добавляются пакетными INSERT по IMPORT_BATCH_SIZE строк. Коммит выполняет вызывающая сторона.
+    :param model: Модель таблицы связей с полем id.
+    :param left: Имя столбца первой стороны связи (например, "id_res").
+    :param right: Имя столбца второй стороны связи (например, "id_region").
+    :param pairs: Итерируемый набор пар (left, right); повторы игнорируются.
+    :param scope: Значения left, связи которых синхронизируются; None — вся таблица.
+    :return: Кортеж (количество добавленных, количество удалённых связей).
+    """
+    left_column, right_column = getattr(model, left), getattr(model, right)
+    wanted = set(pairs)
+
+    query = db.session.query(model.id, left_column, right_column)
+    if scope is not None:
+        scope = set(scope)
+        if not scope:
+            return 0, 0
+        query = query.filter(left_column.in_(scope))
+        wanted = {pair for pair in wanted if pair[0] in scope}
+
+    # Текущие связи: пара -> id; дубликаты пар тоже попадают в удаляемые
+    existing = {}
+    to_delete = []
+    for row_id, left_value, right_value in query:
+        if (left_value, right_value) in existing:
+            to_delete.append(row_id)
+        else:
+            existing[(left_value, right_value)] = row_id
+
+    to_delete.extend(row_id for pair, row_id in existing.items() if pair not in wanted)
+    to_insert = [{left: left_value, right: right_value} for left_value, right_value in wanted - existing.keys()]
+
+    for chunk in _chunks(to_delete):
+        db.session.execute(delete(model).where(model.id.in_(chunk)))
+    for chunk in _chunks(to_insert):
+        db.session.execute(insert(model), chunk)
+
+    return len(to_insert), len(to_delete)
+
+
+def _chunks(items):
+    """Делит список на пакеты по IMPORT_BATCH_SIZE элементов."""
+    size = current_app.config.get('IMPORT_BATCH_SIZE', 1000)
+    iterator = iter(items)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
@@ -0,0 +1,315 @@
+import json
+import os
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+import click
+from flask.cli import AppGroup
+from sqlalchemy import select, update
+from werkzeug.utils import secure_filename
+
+from app import db
+from app.models.job_models import Job
+from app.services.export_services import validate_export_format, EXPORT_FORMATS
+from app.services.fo_services import import_fo_from_excel, export_fo_to_excel
+from app.services.oes_services import import_oes_from_excel, export_oes_to_excel
+from app.services.region_services import import_region_from_excel, export_region_to_excel
+from app.services.res_services import import_res_from_excel, import_res_region_from_excel, export_res_to_excel
+
+
+class JobRunner:
+    """
+    Выполняет задания импорта и экспорта в фоновом пуле потоков.
+    Состояние заданий хранится в таблице job, поэтому доступно из любого процесса приложения;
+    загруженные и выгруженные файлы хранятся в каталоге JOB_FOLDER.
+    Файлы результатов экспорта удаляются через JOB_RETENTION_HOURS после завершения задания.
+    """
+
+    def __init__(self, max_workers=2, retention_hours=24):
+        self.max_workers = max_workers
+        self.retention_hours = retention_hours
+        self.folder = None
+        self._app = None
+        self._executor = None
+
+    def init_app(self, app):
+        """Привязывает пул к приложению и читает настройки из конфигурации."""
+        self._app = app
+        self.max_workers = app.config.get('JOB_WORKERS', self.max_workers)
+        self.folder = os.path.abspath(app.config.get('JOB_FOLDER', os.path.join('uploads', 'jobs')))
+        self.retention_hours = app.config.get('JOB_RETENTION_HOURS', self.retention_hours)
+        if self.retention_hours < 1:
+            raise ValueError("JOB_RETENTION_HOURS должно быть не меньше 1.")
+        app.extensions['job_runner'] = self
+        app.cli.add_command(jobs_cli)
+
+    def submit(self, kind, target, user, task, params=None, upload=None):
+        """
+        Создаёт задание и ставит его в очередь.
+        :param task: Функция task(job, progress), возвращающая кортеж (итог, путь к файлу результата или None).
+        :param params: Параметры задания, сохраняемые в JSON.
+        :param upload: Загруженный файл (FileStorage), который сохраняется в JOB_FOLDER до выполнения задания.
+        :return: ID задания.
+        """
+        self.cleanup()
+        job = Job(kind=kind, target=target, username=user, params=json.dumps(params or {}, ensure_ascii=False))
+        db.session.add(job)
+        db.session.flush()
+
+        if upload is not None:
+            os.makedirs(self.folder, exist_ok=True)
+            job.filename = secure_filename(upload.filename) or f"{target}.xlsx"
+            job.file_path = os.path.join(self.folder, f"job_{job.id}_{job.filename}")
+            upload.save(job.file_path)
+
+        db.session.commit()
+        self._ensure_started().submit(self._run, job.id, task)
+        return job.id
+
+    def progress(self, job_id, processed, total=None):
+        """
+        Обновляет ход выполнения задания отдельным соединением, не затрагивая транзакцию задания.
+        Ошибка записи хода выполнения (например, блокировка строки) только логируется и не прерывает задание.
+        """
+        try:
+            with db.engine.begin() as connection:
+                connection.execute(update(Job).where(Job.id == job_id).values(progress=processed, total=total))
+        except Exception as e:
+            self._app.logger.warning(f"Не удалось обновить ход выполнения задания {job_id}: {e}")
+
+    def cleanup(self, now=None):
+        """
+        Удаляет файлы результатов экспорта, завершённых раньше JOB_RETENTION_HOURS назад, и файлы в JOB_FOLDER,
+        на которые не ссылается ни одно задание (остались после сбоя процесса).
+        Записи заданий сохраняются, у них очищается путь к файлу. Изменения выполняются отдельным соединением,
+        не затрагивая транзакцию вызывающего кода.
+        :return: Количество удалённых файлов.
+        """
+        cutoff = (now or datetime.utcnow()) - timedelta(hours=self.retention_hours)
+        removed = 0
+        with db.engine.begin() as connection:
+            expired = connection.execute(
+                select(Job.id, Job.file_path)
+                .where(Job.kind == 'export', Job.file_path.is_not(None), Job.finished_at < cutoff)
+            ).all()
+            for _, path in expired:
+                removed += self._remove_file(path)
+            if expired:
+                connection.execute(
+                    update(Job).where(Job.id.in_([job_id for job_id, _ in expired])).values(file_path=None)
+                )
+            referenced = {
+                os.path.abspath(path)
+                for path, in connection.execute(select(Job.file_path).where(Job.file_path.is_not(None)))
+            }
+
+        if os.path.isdir(self.folder):
+            for name in os.listdir(self.folder):
+                path = os.path.join(self.folder, name)
+                # Файл задания ещё может записываться: удаляются только файлы старше срока хранения
+                if (path not in referenced and os.path.isfile(path)
+                        and datetime.utcfromtimestamp(os.path.getmtime(path)) < cutoff):
+                    removed += self._remove_file(path)
+        return removed
+
+    def shutdown(self, wait=True):
+        """Останавливает пул потоков."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait)
+            self._executor = None
+
+    def _ensure_started(self):
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="job-runner")
+        return self._executor
+
+    def _run(self, job_id, task):
+        with self._app.app_context():
+            job = None
+            try:
+                job = db.session.get(Job, job_id)
+                job.status = 'running'
+                job.started_at = datetime.utcnow()
+                db.session.commit()
+
+                result, output_path = task(job, lambda processed, total=None: self.progress(job_id, processed, total))
+
+                job = db.session.get(Job, job_id)
+                job.status = 'done'
+                job.result = result
+                if job.kind == 'export':
+                    job.file_path = output_path
+            except Exception as e:
+                db.session.rollback()
+                self._app.logger.error(f"Ошибка выполнения задания {job_id}: {e}")
+                job = db.session.get(Job, job_id)
+                if job is not None:
+                    job.status = 'failed'
+                    job.result = str(e)
+            finally:
+                if job is not None:
+                    if job.kind == 'import':
+                        # Загруженный файл больше не нужен
+                        self._remove_file(job.file_path)
+                        job.file_path = None
+                    job.finished_at = datetime.utcnow()
+                    db.session.commit()
+                db.session.remove()
+
+    @staticmethod
+    def _remove_file(path):
+        if path and os.path.exists(path):
+            os.remove(path)
+            return True
+        return False
+
+
+job_runner = JobRunner()
+
+jobs_cli = AppGroup('jobs', help="Обслуживание фоновых заданий импорта и экспорта.")
+
+
+@jobs_cli.command('cleanup')
+def cleanup_command():
+    """Удаляет файлы результатов экспорта старше JOB_RETENTION_HOURS."""
+    click.echo(f"Удалено файлов: {job_runner.cleanup()}")
+
+
+# Задания импорта: таблица -> функция (путь к файлу, пользователь, параметры, progress) -> итог
+def _import_fo(path, user, params, progress):
+    inserted, updated, deleted = import_fo_from_excel(path, user, params.get("delete_missing", False), progress)
+    return f"Добавлено: {inserted}, обновлено: {updated}, удалено: {deleted}"
+
+
+def _import_oes(path, user, params, progress):
+    inserted, updated, deleted = import_oes_from_excel(path, user, params.get("delete_missing", False), progress)
+    return f"Добавлено: {inserted}, обновлено: {updated}, удалено: {deleted}"
+
+
+def _import_region(path, user, params, progress):
+    inserted, updated, deleted = import_region_from_excel(path, user, params.get("delete_missing", False), progress)
+    return f"Добавлено: {inserted}, обновлено: {updated}, удалено: {deleted}"
+
+
+def _import_res(path, user, params, progress):
+    inserted, updated = import_res_from_excel(path, user, progress)
+    return f"Добавлено: {inserted}, обновлено: {updated}"
+
+
+def _import_res_region(path, user, params, progress):
+    inserted, deleted = import_res_region_from_excel(path, user, params.get("delete_missing", False), progress)
+    return f"Связей добавлено: {inserted}, удалено: {deleted}"
+
+
+IMPORT_TASKS = {
+    "fo": _import_fo,
+    "oes": _import_oes,
+    "region": _import_region,
+    "res": _import_res,
+    "res_region": _import_res_region,
+}
+
+# Задания экспорта: таблица -> (функция экспорта, параметры фильтра в порядке аргументов)
+EXPORT_TASKS = {
+    "fo": (export_fo_to_excel, ["fo_filter"]),
+    "oes": (export_oes_to_excel, ["oes_filter"]),
+    "region": (export_region_to_excel, ["name_filter"]),
+    "res": (export_res_to_excel, ["res_filter", "oes_filter"]),
+}
+
+
+def submit_import(target, upload, user, delete_missing=False):
+    """
+    Ставит в очередь импорт Excel-файла в таблицу target.
+    :raises ValueError: Если таблица не поддерживает импорт или файл не xlsx/xls.
+    """
+    if target not in IMPORT_TASKS:
+        raise ValueError(f"Импорт таблицы '{target}' не поддерживается.")
+    if not upload or not upload.filename.endswith((".xlsx", ".xls")):
+        raise ValueError("Неверный формат файла.")
+
+    def task(job, progress):
+        return IMPORT_TASKS[job.target](job.file_path, job.username, json.loads(job.params), progress), None
+
+    return job_runner.submit("import", target, user, task, {"delete_missing": delete_missing}, upload=upload)
+
+
+def submit_export(target, user, filters, sort_by="id", sort_dir="asc", export_format="xlsx"):
+    """
+    Ставит в очередь экспорт таблицы target; результат сохраняется в файл задания.
+    :param filters: Словарь параметров фильтра (например, {"res_filter": ..., "oes_filter": ...}).
+    :raises ValueError: Если таблица не поддерживает экспорт или формат неизвестен.
+    """
+    if target not in EXPORT_TASKS:
+        raise ValueError(f"Экспорт таблицы '{target}' не поддерживается.")
+    export_format = validate_export_format(export_format)
+    filter_names = EXPORT_TASKS[target][1]
+    params = {
+        "filters": {name: filters.get(name) for name in filter_names},
+        "sort_by": sort_by,
+        "sort_dir": sort_dir,
+        "format": export_format,
+    }
+
+    def task(job, progress):
+        params = json.loads(job.params)
+        export, names = EXPORT_TASKS[job.target]
+        data = export(
+            job.username,
+            *[params["filters"].get(name) for name in names],
+            params["sort_by"], params["sort_dir"], params["format"],
+            progress=progress
+        )
+        if data is None:
+            return "Нет данных для экспорта.", None
+
+        extension = EXPORT_FORMATS[params["format"]][1]
+        job.filename = f"{job.target}_data_{job.created_at.strftime('%Y%m%d_%H%M%S')}.{extension}"
+        os.makedirs(job_runner.folder, exist_ok=True)
+        path = os.path.join(job_runner.folder, f"job_{job.id}_{job.filename}")
+
+        with open(path, "wb") as output:
+            if hasattr(data, "read"):
+                with data:
+                    shutil.copyfileobj(data, output)
+            else:
+                # CSV выгружается генератором частей файла
+                for part in data:
+                    output.write(part)
+        return "Экспорт завершён.", path
+
+    return job_runner.submit("export", target, user, task, params)
+
+
+def get_user_jobs(user, limit=50):
+    """Возвращает последние задания пользователя."""
+    return Job.query.filter_by(username=user).order_by(Job.id.desc()).limit(limit).all()
+
+
+def get_user_job(job_id, user):
+    """
+    Возвращает задание пользователя по ID.
+    :raises ValueError: Если задание не найдено или принадлежит другому пользователю.
+    """
+    job = db.session.get(Job, job_id)
+    if job is None or job.username != user:
+        raise ValueError(f"Задание №{job_id} не найдено.")
+    return job
+
+
+def job_to_dict(job):
+    """Представление задания для JSON-ответа о его состоянии."""
+    return {
+        "id": job.id,
+        "kind": job.kind,
+        "target": job.target,
+        "status": job.status,
+        "progress": job.progress,
+        "total": job.total,
+        "result": job.result,
+        "filename": job.filename if job.kind == "export" else None,
+        "created_at": job.created_at.isoformat() if job.created_at else None,
+        "started_at": job.started_at.isoformat() if job.started_at else None,
+        "finished_at": job.finished_at.isoformat() if job.finished_at else None,
+    }
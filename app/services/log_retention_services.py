@@ -0,0 +1,296 @@
+import csv
+import gzip
+import os
+import re
+from datetime import datetime
+
+import click
+from flask.cli import AppGroup
+from sqlalchemy import column, inspect, select, table, text, union_all
+from sqlalchemy.orm import aliased
+
+from app import db
+from app.models.log_models import Log
+from app.services.cache_services import reference_cache
+from app.services.search_services import search_index
+
+
+def month_start(value):
+    """Начало месяца, к которому относится момент времени."""
+    return value.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def add_months(month, months):
+    """Сдвигает начало месяца на указанное число месяцев."""
+    index = month.year * 12 + month.month - 1 + months
+    return month.replace(year=index // 12, month=index % 12 + 1)
+
+
+class LogRetention:
+    """
+    Хранение журнала действий по месяцам с архивированием устаревших месяцев.
+    - MySQL: таблица log секционирована RANGE COLUMNS(timestamp); партиция p<ГГГГММ> содержит записи
+      до начала следующего месяца (первая партиция — и все более ранние), pmax — записи за месяцы без партиции.
+      Запросы с условием по timestamp читают только партиции нужных месяцев.
+    - Остальные СУБД (SQLite): в таблице log остаётся текущий месяц, записи закрытых месяцев переносятся
+      в таблицы log_<ГГГГММ>; просмотр журнала за период объединяет log с таблицами нужных месяцев.
+    Месяцы старше LOG_RETENTION_MONTHS (включая текущий) выгружаются в LOG_ARCHIVE_FOLDER/log_<ГГГГММ>.csv.gz
+    и удаляются; обслуживание выполняет команда "flask logs maintain".
+    """
+
+    PERIOD_TABLE = re.compile(r"^log_(\d{6})$")
+    PARTITION = re.compile(r"^p(\d{6})$")
+
+    def __init__(self, retention_months=12, months_ahead=2, archive_folder=None, batch_size=10000):
+        self.retention_months = retention_months
+        self.months_ahead = months_ahead
+        self.archive_folder = archive_folder
+        self.batch_size = batch_size
+
+    def init_app(self, app):
+        """Читает настройки хранения журнала и регистрирует команды обслуживания."""
+        self.retention_months = app.config.get('LOG_RETENTION_MONTHS', self.retention_months)
+        self.months_ahead = app.config.get('LOG_PARTITIONS_AHEAD', self.months_ahead)
+        self.archive_folder = os.path.abspath(
+            app.config.get('LOG_ARCHIVE_FOLDER', os.path.join('uploads', 'log_archive'))
+        )
+        if self.retention_months < 1:
+            raise ValueError("LOG_RETENTION_MONTHS должно быть не меньше 1.")
+        app.extensions['log_retention'] = self
+        app.cli.add_command(logs_cli)
+
+    def source(self, date_from=None, date_to=None):
+        """
+        Возвращает сущность для запроса журнала за период [date_from, date_to):
+        Log или, если период захватывает перенесённые месяцы (не MySQL), объединение log с их таблицами.
+        """
+        if self._partitioned_natively():
+            return Log
+
+        periods = [
+            name for name, month in self.period_tables()
+            if (date_to is None or month < date_to) and (date_from is None or add_months(month, 1) > date_from)
+        ]
+        if not periods:
+            return Log
+
+        names = [log_column.name for log_column in Log.__table__.columns]
+        selects = [select(*[Log.__table__.c[name] for name in names])]
+        for period in periods:
+            period_table = self._period_table(period)
+            selects.append(select(*[period_table.c[name] for name in names]))
+        return aliased(Log, union_all(*selects).subquery("log_periods"))
+
+    def period_tables(self):
+        """Список (имя таблицы, начало месяца) таблиц перенесённых месяцев по возрастанию."""
+        tables = []
+        for name in inspect(db.engine).get_table_names():
+            match = self.PERIOD_TABLE.match(name)
+            if match:
+                tables.append((name, datetime.strptime(match.group(1), "%Y%m")))
+        return sorted(tables, key=lambda item: item[1])
+
+    def maintain(self, now=None, dry_run=False):
+        """
+        Создаёт партиции (или переносит закрытые месяцы) и архивирует устаревшие месяцы.
+        :param dry_run: Только перечислить действия, не выполняя их.
+        :return: Генератор описаний выполненных (или запланированных) действий.
+        """
+        current = month_start(now or datetime.utcnow())
+        cutoff = add_months(current, -(self.retention_months - 1))
+
+        if self._partitioned_natively():
+            actions = self._plan_partitions(current, cutoff)
+        else:
+            actions = self._plan_period_tables(current, cutoff)
+
+        for description, action in actions:
+            if not dry_run:
+                result = action()
+                if result:
+                    description = f"{description}: {result}"
+            yield description
+
+        if not dry_run:
+            reference_cache.invalidate(Log.__tablename__)
+            search_index.invalidate(Log.__tablename__)
+
+    def _partitioned_natively(self):
+        return db.engine.dialect.name == "mysql"
+
+    def _plan_partitions(self, current, cutoff):
+        """Действия обслуживания секционированной таблицы MySQL."""
+        partitions = self._partitions()
+        months = [datetime.strptime(match.group(1), "%Y%m") for match in map(self.PARTITION.match, partitions) if match]
+
+        if not partitions:
+            yield "Секционирование таблицы log по месяцам", lambda: self._partition_table(current)
+            return
+
+        # Партиции на months_ahead месяцев вперёд выделяются из pmax
+        first = add_months(months[-1], 1) if months else current
+        wanted = []
+        month = first
+        while month <= add_months(current, self.months_ahead):
+            wanted.append(month)
+            month = add_months(month, 1)
+        if wanted:
+            names = ", ".join(f"p{month:%Y%m}" for month in wanted)
+            yield f"Создание партиций {names}", lambda: self._add_partitions(wanted)
+
+        for month in months:
+            if month < cutoff:
+                name = f"p{month:%Y%m}"
+                yield f"Архивирование и удаление партиции {name}", lambda name=name, month=month: self._drop_partition(name, month)
+
+    def _partitions(self):
+        return db.session.execute(
+            text("SELECT PARTITION_NAME FROM information_schema.PARTITIONS "
+                 "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = :table AND PARTITION_NAME IS NOT NULL "
+                 "ORDER BY PARTITION_ORDINAL_POSITION"),
+            {"table": Log.__tablename__}
+        ).scalars().all()
+
+    def _partition_table(self, current):
+        """Секционирует таблицу, созданную без партиций (db.create_all), начиная с месяца первой записи."""
+        first = db.session.execute(select(db.func.min(Log.timestamp))).scalar()
+        month = month_start(first) if first else current
+        months = []
+        while month <= add_months(current, self.months_ahead):
+            months.append(month)
+            month = add_months(month, 1)
+
+        with db.engine.begin() as connection:
+            primary_key = inspect(connection).get_pk_constraint(Log.__tablename__)["constrained_columns"]
+            if "timestamp" not in primary_key:
+                # Столбец секционирования должен входить во все уникальные ключи таблицы
+                connection.execute(text("ALTER TABLE log DROP PRIMARY KEY, ADD PRIMARY KEY (id, timestamp)"))
+            for index in inspect(connection).get_indexes(Log.__tablename__):
+                if index.get("dialect_options", {}).get("mysql_prefix") == "FULLTEXT":
+                    # Секционированные таблицы InnoDB не поддерживают FULLTEXT-индексы
+                    connection.execute(text(f"ALTER TABLE log DROP INDEX {index['name']}"))
+            connection.execute(text(
+                f"ALTER TABLE log PARTITION BY RANGE COLUMNS(timestamp) ({self._partition_definitions(months)})"
+            ))
+        return f"партиций: {len(months) + 1}"
+
+    def _add_partitions(self, months):
+        with db.engine.begin() as connection:
+            connection.execute(text(
+                f"ALTER TABLE log REORGANIZE PARTITION pmax INTO ({self._partition_definitions(months)})"
+            ))
+
+    @staticmethod
+    def _partition_definitions(months):
+        definitions = [
+            f"PARTITION p{month:%Y%m} VALUES LESS THAN ('{add_months(month, 1):%Y-%m-%d}')" for month in months
+        ]
+        definitions.append("PARTITION pmax VALUES LESS THAN (MAXVALUE)")
+        return ", ".join(definitions)
+
+    def _drop_partition(self, name, month):
+        path, count = self._archive(text(f"SELECT * FROM log PARTITION ({name}) ORDER BY id"), month)
+        with db.engine.begin() as connection:
+            connection.execute(text(f"ALTER TABLE log DROP PARTITION {name}"))
+        return f"записей: {count}, архив: {path}"
+
+    def _plan_period_tables(self, current, cutoff):
+        """Действия обслуживания таблиц месяцев (SQLite и другие СУБД без секционирования)."""
+        month = self._next_log_month(None, current)
+        while month is not None:
+            if month < cutoff:
+                yield (f"Архивирование и удаление записей log за {month:%Y-%m}",
+                       lambda month=month: self._archive_log_month(month))
+            else:
+                yield (f"Перенос записей log за {month:%Y-%m} в таблицу log_{month:%Y%m}",
+                       lambda month=month: self._move_log_month(month))
+            month = self._next_log_month(add_months(month, 1), current)
+
+        for name, month in self.period_tables():
+            if month < cutoff:
+                yield f"Архивирование и удаление таблицы {name}", lambda name=name, month=month: self._drop_period_table(name, month)
+
+    @staticmethod
+    def _next_log_month(after, current):
+        """Начало ближайшего закрытого месяца с записями в log начиная с after (месяцы без записей пропускаются)."""
+        query = select(db.func.min(Log.timestamp)).where(Log.timestamp < current)
+        if after is not None:
+            query = query.where(Log.timestamp >= after)
+        first = db.session.execute(query).scalar()
+        return month_start(first) if first else None
+
+    def _month_condition(self, month):
+        return (Log.timestamp >= month) & (Log.timestamp < add_months(month, 1))
+
+    def _move_log_month(self, month):
+        name = f"log_{month:%Y%m}"
+        columns = [log_column.name for log_column in Log.__table__.columns]
+        with db.engine.begin() as connection:
+            if not inspect(connection).has_table(name):
+                connection.execute(text(f"CREATE TABLE {name} AS SELECT * FROM log WHERE 0"))
+                connection.execute(text(f"CREATE INDEX ix_{name}_timestamp ON {name} (timestamp)"))
+            moved = connection.execute(
+                self._period_table(name).insert().from_select(
+                    columns, select(*[Log.__table__.c[column_name] for column_name in columns])
+                    .where(self._month_condition(month))
+                )
+            ).rowcount
+            connection.execute(Log.__table__.delete().where(self._month_condition(month)))
+        return f"записей: {moved}"
+
+    def _archive_log_month(self, month):
+        path, count = self._archive(select(Log.__table__).where(self._month_condition(month)).order_by(Log.id), month)
+        with db.engine.begin() as connection:
+            connection.execute(Log.__table__.delete().where(self._month_condition(month)))
+        return f"записей: {count}, архив: {path}"
+
+    def _drop_period_table(self, name, month):
+        period_table = self._period_table(name)
+        path, count = self._archive(select(period_table).order_by(period_table.c.id), month)
+        with db.engine.begin() as connection:
+            connection.execute(text(f"DROP TABLE {name}"))
+        return f"записей: {count}, архив: {path}"
+
+    @staticmethod
+    def _period_table(name):
+        return table(name, *[column(log_column.name, log_column.type) for log_column in Log.__table__.columns])
+
+    def _archive(self, statement, month):
+        """
+        Выгружает записи запроса в сжатый CSV-файл архива месяца.
+        Файл записывается под временным именем и переименовывается после успешной выгрузки,
+        поэтому записи удаляются из базы только при наличии полного архива.
+        :return: Путь к архиву и число записей.
+        """
+        os.makedirs(self.archive_folder, exist_ok=True)
+        path = os.path.join(self.archive_folder, f"log_{month:%Y%m}.csv.gz")
+        number = 1
+        while os.path.exists(path):
+            number += 1
+            path = os.path.join(self.archive_folder, f"log_{month:%Y%m}_{number}.csv.gz")
+
+        temporary_path = f"{path}.part"
+        count = 0
+        with gzip.open(temporary_path, "wt", encoding="utf-8", newline="") as file:
+            writer = csv.writer(file)
+            writer.writerow([log_column.name for log_column in Log.__table__.columns])
+            with db.engine.connect() as connection:
+                result = connection.execution_options(yield_per=self.batch_size).execute(statement)
+                for row in result:
+                    writer.writerow(row)
+                    count += 1
+        os.replace(temporary_path, path)
+        return path, count
+
+
+log_retention = LogRetention()
+
+logs_cli = AppGroup('logs', help="Обслуживание журнала действий пользователей.")
+
+
+@logs_cli.command('maintain')
+@click.option('--dry-run', is_flag=True, help="Только показать действия, не выполняя их.")
+def maintain_command(dry_run):
+    """Создаёт партиции журнала и архивирует месяцы старше LOG_RETENTION_MONTHS."""
+    for description in log_retention.maintain(dry_run=dry_run):
+        click.echo(description)
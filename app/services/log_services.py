@@ -0,0 +1,290 @@
+import atexit
+import queue
+import random
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+from sqlalchemy import insert
+
+from app import db
+from app.models.log_models import Log
+
+
+class _FlushRequest:
+    """Маркер принудительного сброса очереди журнала."""
+
+    def __init__(self):
+        self.done = threading.Event()
+
+
+_STOP = object()
+
+ALWAYS = "always"
+SAMPLE = "sample"
+COALESCE = "coalesce"
+
+
+def parse_audit_policies(value):
+    """
+    Разбирает политики журнала из строки вида "префикс действия=политика;...".
+    Политики: always — каждое событие; sample:<доля> — случайная выборка событий (доля от 0 до 1);
+    coalesce — счётчик событий за минуту по пользователю и действию, записываемый одной строкой.
+    :return: Словарь {префикс действия: (политика, доля выборки)}.
+    """
+    policies = {}
+    for rule in (value or "").split(";"):
+        if not rule.strip():
+            continue
+        prefix, separator, policy = rule.rpartition("=")
+        prefix, policy = prefix.strip(), policy.strip().lower()
+        if not separator or not prefix:
+            raise ValueError(f"Некорректная политика журнала: {rule.strip()}.")
+        if policy in (ALWAYS, COALESCE):
+            policies[prefix] = (policy, 1.0)
+        elif policy.startswith(SAMPLE + ":"):
+            try:
+                rate = float(policy.split(":", 1)[1])
+            except ValueError:
+                rate = -1
+            if not 0 <= rate <= 1:
+                raise ValueError(f"Некорректная доля выборки в политике журнала: {rule.strip()}.")
+            policies[prefix] = (SAMPLE, rate)
+        else:
+            raise ValueError(f"Неизвестная политика журнала: {rule.strip()}.")
+    return policies
+
+
+class AuditLogWriter:
+    """
+    Журнал действий пользователей с пакетной записью в фоне.
+    Записи накапливаются в очереди и сбрасываются в таблицу Log одним
+    многострочным INSERT каждые batch_size записей или flush_interval_ms миллисекунд.
+    Частые малозначимые события (открытие страниц) отбираются по политикам AUDIT_LOG_POLICIES,
+    сопоставляемым по самому длинному совпадающему префиксу действия (см. parse_audit_policies):
+    события с политикой coalesce записываются одной строкой на пользователя, действие и минуту
+    с числом событий в details после окончания минуты или при сбросе журнала.
+    """
+
+    # Период проверки завершившихся минут счётчиков фоновым потоком, секунды
+    COUNTER_CHECK_INTERVAL = 5
+
+    def __init__(self, batch_size=100, flush_interval_ms=500):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval_ms / 1000
+        self.asynchronous = True
+        self._policies = []
+        self._counters = {}
+        self._counters_lock = threading.Lock()
+        self._app = None
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._atexit_registered = False
+
+    def init_app(self, app):
+        """Привязывает журнал к приложению и читает настройки из конфигурации."""
+        self._app = app
+        self.batch_size = app.config.get('AUDIT_LOG_BATCH_SIZE', self.batch_size)
+        self.flush_interval = app.config.get('AUDIT_LOG_FLUSH_INTERVAL_MS', self.flush_interval * 1000) / 1000
+        self.asynchronous = app.config.get('AUDIT_LOG_ASYNC', self.asynchronous)
+        self.set_policies(parse_audit_policies(app.config.get('AUDIT_LOG_POLICIES', '')))
+        app.extensions['audit_log'] = self
+        # init_app вызывается при каждом create_app (тесты, команды flask); обработчик завершения нужен один
+        if not self._atexit_registered:
+            atexit.register(self.shutdown)
+            self._atexit_registered = True
+
+    def set_policies(self, policies):
+        """Задаёт политики журнала: словарь {префикс действия: (политика, доля выборки)}."""
+        # Длинные префиксы проверяются первыми, чтобы частное правило перекрывало общее
+        self._policies = sorted(policies.items(), key=lambda item: len(item[0]), reverse=True)
+
+    def policy(self, action):
+        """Возвращает (политика, доля выборки) для действия; по умолчанию событие записывается всегда."""
+        for prefix, policy in self._policies:
+            if action.startswith(prefix):
+                return policy
+        return ALWAYS, 1.0
+
+    def log(self, username, action, details=None):
+        """Ставит запись в очередь на запись в базу данных с учётом политики действия."""
+        policy, rate = self.policy(action)
+        now = datetime.utcnow()
+        if policy == COALESCE:
+            self._count(now, username, action)
+            return
+        if policy == SAMPLE:
+            if random.random() >= rate:
+                return
+            sampling = f"Выборочная запись: доля {rate:g}"
+            details = f"{details}; {sampling}" if details else sampling
+
+        entry = {
+            "timestamp": now,
+            "username": username,
+            "action": action,
+            "details": details,
+        }
+        buffer = getattr(self._local, 'buffer', None)
+        if buffer is not None:
+            buffer.append(entry)
+            return
+        self._submit([entry])
+
+    @contextmanager
+    def deferred(self):
+        """
+        Откладывает запись журнала до завершения бизнес-операции.
+        Все записи, сделанные внутри блока, передаются на запись одним пакетом после его выхода,
+        поэтому журнал не вмешивается в транзакцию db.session.
+        """
+        if getattr(self._local, 'buffer', None) is not None:
+            # Вложенный блок: записи уходят во внешний буфер
+            yield
+            return
+        self._local.buffer = []
+        try:
+            yield
+        finally:
+            entries, self._local.buffer = self._local.buffer, None
+            self._submit(entries)
+
+    def flush(self, timeout=None):
+        """Синхронно сбрасывает накопленные записи, включая счётчики текущей минуты, в базу данных."""
+        self._submit(self._take_counters())
+        if self._thread is None or not self._thread.is_alive():
+            self._write(self._drain_nowait())
+            return
+        request = _FlushRequest()
+        self._queue.put(request)
+        request.done.wait(timeout)
+
+    def shutdown(self, timeout=5):
+        """Останавливает фоновый поток, гарантируя запись всех накопленных записей."""
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None and thread.is_alive():
+            self._queue.put(_STOP)
+            thread.join(timeout)
+        self._write(self._drain_nowait() + self._take_counters())
+
+    def _count(self, now, username, action):
+        """Увеличивает счётчик события за минуту и отправляет на запись счётчики завершившихся минут."""
+        minute = now.replace(second=0, microsecond=0)
+        with self._counters_lock:
+            counters = self._counters.setdefault(minute, {})
+            counters[(username, action)] = counters.get((username, action), 0) + 1
+            closed = len(self._counters) > 1
+        if closed:
+            self._submit(self._take_counters(before=minute))
+        elif self.asynchronous:
+            # Фоновый поток запишет счётчик по окончании минуты, даже если событий больше не будет
+            self._ensure_started()
+
+    def _take_counters(self, before=None):
+        """Забирает счётчики минут раньше before (всех минут, если before не указан) в виде записей журнала."""
+        with self._counters_lock:
+            minutes = [minute for minute in self._counters if before is None or minute < before]
+            taken = [(minute, self._counters.pop(minute)) for minute in sorted(minutes)]
+        return [
+            {
+                "timestamp": minute,
+                "username": username,
+                "action": action,
+                "details": f"Событий за минуту: {count}",
+            }
+            for minute, counters in taken
+            for (username, action), count in counters.items()
+        ]
+
+    def _submit(self, entries):
+        if not entries:
+            return
+        if not self.asynchronous:
+            self._write(entries)
+            return
+        self._ensure_started()
+        for entry in entries:
+            self._queue.put(entry)
+
+    def _ensure_started(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="audit-log-writer", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            try:
+                batch = [self._queue.get(timeout=self.COUNTER_CHECK_INTERVAL)]
+            except queue.Empty:
+                current_minute = datetime.utcnow().replace(second=0, microsecond=0)
+                self._write(self._take_counters(before=current_minute))
+                continue
+            deadline = time.monotonic() + self.flush_interval
+
+            # Добираем пакет до batch_size или до истечения интервала
+            while len(batch) < self.batch_size and not self._is_marker(batch[-1]):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            marker = batch.pop() if self._is_marker(batch[-1]) else None
+            self._write(batch)
+
+            if isinstance(marker, _FlushRequest):
+                marker.done.set()
+            elif marker is _STOP:
+                return
+
+    def _drain_nowait(self):
+        batch = []
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                return batch
+            if isinstance(item, _FlushRequest):
+                item.done.set()
+            elif item is not _STOP:
+                batch.append(item)
+
+    @staticmethod
+    def _is_marker(item):
+        return item is _STOP or isinstance(item, _FlushRequest)
+
+    def _write(self, batch):
+        """Записывает пакет одним INSERT в собственном соединении, не затрагивая db.session."""
+        if not batch:
+            return
+        if self._app is None:
+            print(f"Ошибка записи лога: журнал не инициализирован, потеряно записей: {len(batch)}")
+            return
+        try:
+            with self._app.app_context():
+                with db.engine.begin() as connection:
+                    connection.execute(insert(Log), batch)
+        except Exception as e:
+            print(f"Ошибка записи лога: {e}")
+
+
+audit_log = AuditLogWriter()
+
+
+def log_to_db(username, action, details=None):
+    """Записывает лог действия пользователя в базу данных."""
+    audit_log.log(username, action, details)
+
+
+def deferred_log():
+    """Откладывает запись журнала до конца бизнес-операции. Используется как контекстный менеджер или декоратор."""
+    return audit_log.deferred()
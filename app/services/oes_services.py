@@ -1,47 +1,46 @@
 from app import db
-from app.models.log_models import Log
 from app.models.oes_models import Oes, OesType
-from sqlalchemy import text
+from sqlalchemy import func
 from sqlalchemy.exc import IntegrityError
-
-def log_to_db(username, action, details=None):
-    """Записывает лог действия пользователя в базу данных."""
-    try:
-        log_entry = Log(username=username, action=action, details=details)
-        db.session.add(log_entry)
-        db.session.commit()
-    except Exception as e:
-        print(f"Ошибка записи лога: {e}")
-
-
-def get_oes_list(page, per_page, oes_filter=None, sort_by="id", sort_dir="asc"):
-    """Получает список ОЭС с пагинацией, фильтрацией и сортировкой."""
+from app.services.log_services import log_to_db, deferred_log
+from app.services.cache_services import reference_cache
+from app.services.grid_services import save_grid_rows, delete_grid_rows
+from app.services.import_services import read_import_rows, upsert_by_name, use_streaming, stream_upsert_by_name
+from app.services.pagination_services import paginate
+from app.services.search_services import contains_filter
+
+def get_oes_list(page, per_page, oes_filter=None, sort_by="id", sort_dir="asc", keyset=False, cursor=None):
+    """
+    Получает список ОЭС с пагинацией, фильтрацией и сортировкой.
+    :param keyset: Режим keyset-пагинации (по курсору) вместо постраничной с OFFSET.
+    :param cursor: Курсор страницы в режиме keyset.
+    """
     query = Oes.query
 
     if oes_filter:
-        query = query.filter(Oes.name.ilike(f"%{oes_filter}%"))
+        query = query.filter(contains_filter(Oes.name, oes_filter))
 
     # Сортировка
     if sort_by == "name":
-        query = query.order_by(Oes.name.desc() if sort_dir == "desc" else Oes.name.asc())
+        sort_column = Oes.name
     elif sort_by == "oes_type":
-        query = query.join(OesType).order_by(
-            OesType.name.desc() if sort_dir == "desc" else OesType.name.asc()
-        )
+        query = query.join(OesType)
+        sort_column = OesType.name
     else:
-        query = query.order_by(Oes.id.desc() if sort_dir == "desc" else Oes.id.asc())
+        sort_column = Oes.id
 
     # Пагинация
-    pagination = query.paginate(page=page, per_page=per_page, error_out=False)
-
-    return pagination
+    return paginate(query, page, per_page, sort_column, Oes.id, sort_dir, keyset, cursor)
 
 
 def get_oes_types():
-    """Получает список типов энергосистем."""
-    return OesType.query.all()
+    """Получает список типов энергосистем (id, name) из кэша справочников."""
+    return reference_cache.get(
+        OesType.__tablename__, lambda: db.session.query(OesType.id, OesType.name).order_by(OesType.id).all()
+    )
 
 
+@deferred_log()
 def update_oes(data, user):
     """
     Обновляет записи ОЭС в базе данных.
@@ -56,7 +55,6 @@ def update_oes(data, user):
     log_to_db(user, "Получены данные для обновления", f"{data}")
 
     for record in data:
-        oes_id = record.get("id")
         name = record.get("name")
         oes_type_id = record.get("oes_type_id")
 
@@ -64,27 +62,28 @@ def update_oes(data, user):
         if not name or not oes_type_id:
             raise ValueError("Каждая запись должна содержать 'name' и 'oes_type_id'.")
 
-        if oes_id:
-            oes = Oes.query.get(oes_id)
-
-            duplicate = Oes.query.filter(Oes.name == name, Oes.id != oes_id).first()
-            if duplicate:
-                raise ValueError(f"Запись с именем '{name}' уже существует.")
-            
-            oes.name = name
-            oes.id_oes_type = oes_type_id
-        else:
-            duplicate = Oes.query.filter(Oes.name == name, Oes.id != oes_id).first()
-            if duplicate:
-                raise ValueError(f"Запись с именем '{name}' уже существует.")
-
-            new_oes = Oes(name=name, id_oes_type=oes_type_id)
-            db.session.add(new_oes)
-
-    # Сохранение изменений в базе данных
+    # Сохранение изменений: две выборки на всю страницу и пакетная запись только изменённых строк
     try:
+        inserted, updated = save_grid_rows(
+            Oes,
+            [
+                {
+                    "id": record.get("id"),
+                    "name": record.get("name"),
+                    "id_oes_type": record.get("oes_type_id"),
+                    "version": record.get("version")
+                }
+                for record in data
+            ],
+            ["name", "id_oes_type"]
+        )
         db.session.commit()
-        log_to_db(user, "Обновление записей ОЭС", f"Обновлено записей: {len(data)}")
+        if inserted or updated:
+            reference_cache.invalidate(Oes.__tablename__)
+        log_to_db(user, "Обновление записей ОЭС", f"Добавлено записей: {inserted}, обновлено записей: {updated}")
+    except ValueError:
+        db.session.rollback()
+        raise
     except IntegrityError as e:
         db.session.rollback()
         log_to_db(user, "Ошибка обновления ОЭС", str(e))
@@ -95,9 +94,11 @@ def update_oes(data, user):
         raise ValueError(f"Произошла ошибка при обновлении данных: {e}")
 
 
+@deferred_log()
 def add_oes(data, user):
     """
     Добавляет или обновляет записи ОЭС в базе данных.
+    Все записи сохраняются одной транзакцией.
     :param data: Список словарей с данными ОЭС. Пример:
                  [{"id": 1, "name": "ОЭС Центр", "oes_type_id": 2}, ...]
     :param user: Имя пользователя для логирования.
@@ -106,59 +107,60 @@ def add_oes(data, user):
     if not isinstance(data, list):
         raise ValueError("Данные должны быть предоставлены в виде списка словарей.")
 
-    for record in data:
-        oes_id = record.get("id")
-        name = record.get("name")
-        oes_type_id = record.get("oes_type_id")
+    messages = []  # Сообщения журнала, записываемые после успешного сохранения
 
-        # Проверка на наличие необходимых данных
-        if not name or not oes_type_id:
-            log_to_db(user, "Ошибка валидации", f"Запись: {record}")
-            raise ValueError("Каждая запись должна содержать 'name' и 'oes_type_id'.")
+    try:
+        for record in data:
+            oes_id = record.get("id")
+            name = record.get("name")
+            oes_type_id = record.get("oes_type_id")
+
+            # Проверка на наличие необходимых данных
+            if not name or not oes_type_id:
+                log_to_db(user, "Ошибка валидации", f"Запись: {record}")
+                raise ValueError("Каждая запись должна содержать 'name' и 'oes_type_id'.")
+
+            if oes_id:
+                # Обновление существующей записи
+                oes = Oes.query.get(oes_id)
+                if not oes:
+                    log_to_db(user, "Ошибка обновления", f"ОЭС с ID {oes_id} не существует.")
+                    raise ValueError(f"Запись с ID {oes_id} не найдена.")
 
-        if oes_id:
-            # Обновление существующей записи
-            oes = Oes.query.get(oes_id)
-            if oes:
                 # Проверка на дублирование имени
                 duplicate = Oes.query.filter(Oes.name == name, Oes.id != oes_id).first()
                 if duplicate:
                     log_to_db(user, "Ошибка дублирования", f"Имя: {name}, ID: {oes_id}")
                     raise ValueError(f"Запись с именем '{name}' уже существует.")
-                
+
                 # Обновление полей записи
                 oes.name = name
                 oes.id_oes_type = oes_type_id
-                
-                try:
-                    # Сохранение изменений в базе данных
-                    db.session.commit()
-                    log_to_db(user, "Успешное обновление", f"Обновлено ОЭС с ID: {oes_id}")
-                except Exception as e:
-                    db.session.rollback()  # Откат транзакции в случае ошибки
-                    log_to_db(user, "Ошибка сохранения", f"Ошибка при обновлении ОЭС с ID: {oes_id}, ошибка: {str(e)}")
-                    raise ValueError(f"Ошибка при обновлении записи с ID {oes_id}: {str(e)}")
+                messages.append(("Успешное обновление", f"Обновлено ОЭС с ID: {oes_id}"))
             else:
-                log_to_db(user, "Ошибка обновления", f"ОЭС с ID {oes_id} не существует.")
-                raise ValueError(f"Запись с ID {oes_id} не найдена.")
-        else:
-            # Добавление новой записи
-            duplicate = Oes.query.filter(Oes.name == name).first()
-            if duplicate:
-                log_to_db(user, "Ошибка дублирования", f"Имя: {name}")
-                raise ValueError(f"Запись с именем '{name}' уже существует.")
-
-            new_oes = Oes(name=name, id_oes_type=oes_type_id)
-            db.session.add(new_oes)
-
-            try:
-                # Сохранение новой записи в базе данных
-                db.session.commit()
-                log_to_db(user, "Успешное добавление", f"Добавлено новое ОЭС: {name}")
-            except Exception as e:
-                db.session.rollback()  # Откат транзакции в случае ошибки
-                log_to_db(user, "Ошибка сохранения", f"Ошибка при добавлении ОЭС: {name}, ошибка: {str(e)}")
-                raise ValueError(f"Ошибка при добавлении новой записи: {str(e)}")
+                # Добавление новой записи
+                duplicate = Oes.query.filter(Oes.name == name).first()
+                if duplicate:
+                    log_to_db(user, "Ошибка дублирования", f"Имя: {name}")
+                    raise ValueError(f"Запись с именем '{name}' уже существует.")
+
+                db.session.add(Oes(name=name, id_oes_type=oes_type_id))
+                messages.append(("Успешное добавление", f"Добавлено новое ОЭС: {name}"))
+    except ValueError:
+        db.session.rollback()
+        raise
+
+    try:
+        # Сохранение всех записей в базе данных
+        db.session.commit()
+        reference_cache.invalidate(Oes.__tablename__)
+    except Exception as e:
+        db.session.rollback()  # Откат транзакции в случае ошибки
+        log_to_db(user, "Ошибка сохранения", f"Ошибка при сохранении ОЭС: {data}, ошибка: {str(e)}")
+        raise ValueError(f"Ошибка при сохранении записей: {str(e)}")
+
+    for action, details in messages:
+        log_to_db(user, action, details)
 
 def get_total_oes_records(oes_filter):
     """
@@ -168,75 +170,77 @@ def get_total_oes_records(oes_filter):
     """
     query = Oes.query
     if oes_filter:
-        query = query.filter(Oes.name.ilike(f"%{oes_filter}%"))
+        query = query.filter(contains_filter(Oes.name, oes_filter))
     return query.count()
 
+@deferred_log()
 def delete_oes_list(ids, user):
-    """Удаляет записи ОЭС по переданным ID."""
-    log_to_db(user, "Удаление записей", f"Переданы ID для удаления: {ids}")
-    
-    successful_deletes = 0  # Для подсчета успешных удалений
-
-    for oes_id in ids:
-        try:
-            oes_id = int(oes_id)  # Приведение к целому числу
-            oes = Oes.query.get(oes_id)
-            if oes:
-                db.session.delete(oes)
-                successful_deletes += 1
-                log_to_db(user, "Удаление записи", f"Удален ОЭС ID: {oes_id}")
-            else:
-                log_to_db(user, "Ошибка удаления", f"Запись с ID {oes_id} не найдена.")
-        except ValueError:
-            log_to_db(user, "Ошибка удаления", f"Некорректный ID: {oes_id}")
-
+    """
+    Удаляет записи ОЭС по переданным ID одним запросом.
+    :return: Количество удалённых записей.
+    :raises ValueError: Если ID некорректны или удаление не выполнено.
+    """
     try:
+        deleted = delete_grid_rows(Oes, ids)
         db.session.commit()
-        log_to_db(user, "Удаление завершено", f"Успешно удалено записей: {successful_deletes}")
+    except ValueError:
+        db.session.rollback()
+        raise
     except Exception as e:
         db.session.rollback()
         log_to_db(user, "Ошибка удаления", str(e))
         raise ValueError("Ошибка при удалении данных.")
 
+    if deleted:
+        reference_cache.invalidate(Oes.__tablename__)
+    log_to_db(user, "Удаление записей", f"Удалено записей ОЭС: {deleted} из {len(ids)}, ID: {', '.join(map(str, ids))}")
+    return deleted
 
-def import_oes_from_excel(file, user):
-    """Импортирует данные ОЭС из Excel-файла в базу данных."""
-    import pandas as pd
 
+@deferred_log()
+def import_oes_from_excel(file, user, delete_missing=False, progress=None):
+    """
+    Импортирует данные ОЭС из Excel-файла в базу данных.
+    Записи сопоставляются по наименованию: новые добавляются, изменённые обновляются,
+    неизменённые не затрагиваются и сохраняют свои ID (и ссылки на них). Всё выполняется одной транзакцией;
+    xlsx-файлы больше IMPORT_STREAMING_THRESHOLD читаются и записываются потоково по частям в той же транзакции.
+    :param delete_missing: Удалять ли записи, отсутствующие в файле.
+    :param progress: Функция progress(обработано строк, всего строк) для отчёта о ходе импорта:
+                     при потоковом чтении — после каждой части, иначе — по завершении.
+    :return: Кортеж (количество добавленных, обновлённых, удалённых записей).
+    """
     try:
-        data = pd.read_excel(file)
-
-        if 'name' not in data.columns or 'id_oes_type' not in data.columns:
-            raise ValueError("Неверный формат файла. Отсутствуют необходимые столбцы.")
-
-        db.session.query(Oes).delete()
-        db.session.commit()
-
-        db.session.execute(text("ALTER TABLE oes AUTO_INCREMENT = 1"))
-        db.session.commit()
-
-        records = [Oes(name=row['name'], id_oes_type=row['id_oes_type']) for _, row in data.iterrows()]
-        db.session.bulk_save_objects(records)
-        db.session.commit()
-
-        log_to_db(user, "Импорт завершён", f"Импортировано записей: {len(records)}")
-        return len(records)
+        if use_streaming(file):
+            # Большой файл: потоковое чтение и запись по частям, коммит — после всех частей
+            inserted, updated, deleted = stream_upsert_by_name(Oes, file, {"name": str, "id_oes_type": int}, delete_missing, progress)
+            db.session.commit()
+        else:
+            # Читаем и проверяем только нужные столбцы; повторы имён схлопываются
+            rows = read_import_rows(file, {"name": str, "id_oes_type": int}, required=["name"], unique=["name"])
+            inserted, updated, deleted = upsert_by_name(Oes, rows, ["id_oes_type"], delete_missing)
+            db.session.commit()
+            if progress:
+                progress(len(rows), len(rows))
+        if inserted or updated or deleted:
+            reference_cache.invalidate(Oes.__tablename__)
+
+        log_to_db(user, "Импорт завершён", f"Добавлено: {inserted}, обновлено: {updated}, удалено: {deleted}")
+        return inserted, updated, deleted
     except Exception as e:
+        db.session.rollback()
         log_to_db(user, "Ошибка импорта", str(e))
         raise ValueError(f"Ошибка при импорте данных: {e}")
 
-import pandas as pd
-from io import BytesIO
-
-def export_oes_to_excel(user, oes_filter=None, sort_by="id", sort_dir="asc"):
-    """Экспортирует данные ОЭС в Excel и возвращает бинарный поток."""
+from app.services.export_services import stream_query, export_rows
 
-    log_to_db(user, "Начата выгрузка таблицы ОЭС из базы данных")
-    log_to_db(user, "Параметры экспорта", f"oes_filter={oes_filter}, sort_by={sort_by}, sort_dir={sort_dir}")
-    
-    query = Oes.query
+def get_oes_export_rows(oes_filter=None, sort_by="id", sort_dir="asc"):
+    """Возвращает запрос строк экспорта ОЭС: (ID, наименование, тип энергосистемы)."""
+    query = (
+        db.session.query(Oes.id, Oes.name, func.coalesce(OesType.name, "Не указан"))
+        .outerjoin(OesType, Oes.id_oes_type == OesType.id)
+    )
     if oes_filter:
-        query = query.filter(Oes.name.ilike(f"%{oes_filter}%"))
+        query = query.filter(contains_filter(Oes.name, oes_filter))
 
     # Сортировка
     if sort_by == "id":
@@ -244,28 +248,32 @@ def export_oes_to_excel(user, oes_filter=None, sort_by="id", sort_dir="asc"):
     elif sort_by == "name":
         query = query.order_by(Oes.name.desc() if sort_dir == "desc" else Oes.name.asc())
     elif sort_by == "oes_type":
-        query = query.join(OesType).order_by(
-            OesType.name.desc() if sort_dir == "desc" else OesType.name.asc()
-        )
+        query = query.order_by(OesType.name.desc() if sort_dir == "desc" else OesType.name.asc())
+
+    return query
 
-    oes_items = query.all()
-    data = [{
-        "ID": o.id,
-        "Наименование": o.name,
-        "Тип энергосистемы": o.oes_type.name if o.oes_type else "Не указан"
-    } for o in oes_items]
-
-    log_to_db(user, "Подготовка данных для экспорта таблицы субъектов РФ в Excel", f"Записей для экспорта: {len(data)}")
-
-    # Подготовка данных к записи в Excel
-    df = pd.DataFrame(data)
-    
-    # Создание Excel-файла
-    output = BytesIO()
-    with pd.ExcelWriter(output, engine="xlsxwriter") as writer:
-        df.to_excel(writer, index=False, sheet_name="ОЭС")
-
-    # Возврат файла в ответе
-    output.seek(0)
-    log_to_db(user, "Экспорт таблицы субъектов РФ в Excel завершён", f"Экспортировано записей: {len(data)}")
+
+def export_oes_to_excel(user, oes_filter=None, sort_by="id", sort_dir="asc", export_format="xlsx", progress=None):
+    """
+    Экспортирует данные ОЭС в Excel, CSV или Parquet.
+    :param export_format: Формат выгрузки: xlsx, csv или parquet.
+    :param progress: Функция progress(выгружено строк, всего строк) для отчёта о ходе выгрузки.
+    :return: Временный файл, генератор частей файла (csv) или None, если данных для экспорта нет.
+    """
+
+    log_to_db(user, "Начата выгрузка таблицы ОЭС из базы данных")
+    log_to_db(user, "Параметры экспорта", f"oes_filter={oes_filter}, sort_by={sort_by}, sort_dir={sort_dir}, format={export_format}")
+
+    # Выгрузка потоково, порциями из серверного курсора
+    output = export_rows(
+        stream_query(get_oes_export_rows(oes_filter, sort_by, sort_dir)),
+        ["ID", "Наименование", "Тип энергосистемы"],
+        "ОЭС",
+        export_format,
+        on_complete=lambda count: log_to_db(user, "Экспорт таблицы ОЭС завершён", f"Экспортировано записей: {count}"),
+        progress=progress
+    )
+
+    if output is None:
+        log_to_db(user, "Экспорт завершён", "Нет данных для экспорта.")
     return output
@@ -0,0 +1,155 @@
+import base64
+import json
+import math
+from datetime import datetime
+
+from flask import current_app
+from sqlalchemy import and_, or_, text
+
+from app import db
+from app.services.cache_services import reference_cache
+
+
+class KeysetPagination:
+    """
+    Страница списка в режиме keyset-пагинации (по курсору).
+    Повторяет атрибуты flask_sqlalchemy.Pagination, используемые в шаблонах (items, page, per_page,
+    has_prev/has_next, prev_num/next_num, total, pages); total и pages приблизительные.
+    """
+    keyset = True
+
+    def __init__(self, items, page, per_page, total, prev_cursor=None, next_cursor=None):
+        self.items = items
+        self.page = page
+        self.per_page = per_page
+        self.total = total
+        self.prev_cursor = prev_cursor
+        self.next_cursor = next_cursor
+
+    @property
+    def has_prev(self):
+        return self.prev_cursor is not None
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def prev_num(self):
+        return max(self.page - 1, 1)
+
+    @property
+    def next_num(self):
+        return self.page + 1
+
+    @property
+    def pages(self):
+        return max(math.ceil((self.total or 0) / self.per_page), self.page) if self.per_page else self.page
+
+
+def keyset_requested(args):
+    """
+    Определяет режим пагинации по параметру mode запроса ("keyset" или "offset");
+    по умолчанию используется PAGINATION_MODE из конфигурации.
+    """
+    return args.get("mode", current_app.config.get('PAGINATION_MODE', 'offset')) == "keyset"
+
+
+def paginate(query, page, per_page, sort_column, id_column, sort_dir="asc", keyset=False, cursor=None):
+    """
+    Сортирует запрос по sort_column (и id_column для однозначного порядка) и возвращает страницу.
+    В обычном режиме используется query.paginate() с COUNT(*) и OFFSET.
+    В режиме keyset страница выбирается условием по курсору (значение sort_column и ID последней строки)
+    с LIMIT per_page + 1, поэтому время выборки не зависит от номера страницы;
+    общее число строк берётся из кэша справочников (см. approximate_count).
+    :param sort_column: Столбец сортировки (в том числе столбец присоединённой таблицы).
+    :param id_column: Первичный ключ основной модели запроса.
+    :param cursor: Курсор из KeysetPagination.prev_cursor / next_cursor; некорректный курсор означает первую страницу.
+    :return: flask_sqlalchemy.Pagination или KeysetPagination.
+    """
+    descending = sort_dir == "desc"
+    columns = [sort_column] if sort_column is id_column else [sort_column, id_column]
+
+    if not keyset:
+        order = [column.desc() if descending else column.asc() for column in columns]
+        return query.order_by(*order).paginate(page=page, per_page=per_page, error_out=False)
+
+    total = approximate_count(query, id_column.table.name)
+
+    position = _decode_cursor(cursor, sort_column) if cursor else None
+    backwards = bool(position and position[2])
+    # Назад по курсору — выборка в обратном порядке с последующим разворотом страницы
+    reverse = descending != backwards
+
+    if position:
+        value, last_id = position[0], position[1]
+        after = (lambda column, bound: column < bound) if reverse else (lambda column, bound: column > bound)
+        if sort_column is id_column:
+            query = query.filter(after(id_column, last_id))
+        else:
+            query = query.filter(or_(
+                after(sort_column, value),
+                and_(sort_column == value, after(id_column, last_id))
+            ))
+
+    order = [column.desc() if reverse else column.asc() for column in columns]
+    rows = query.add_columns(sort_column, id_column).order_by(*order).limit(per_page + 1).all()
+    more = len(rows) > per_page
+    rows = rows[:per_page]
+    if backwards:
+        rows.reverse()
+
+    has_prev = more if backwards else position is not None
+    has_next = position is not None if backwards else more
+    items = [row[0] for row in rows]
+    return KeysetPagination(
+        items,
+        page if position else 1,
+        per_page,
+        total,
+        prev_cursor=_encode_cursor(rows[0][-2], rows[0][-1], backwards=True) if rows and has_prev else None,
+        next_cursor=_encode_cursor(rows[-1][-2], rows[-1][-1]) if rows and has_next else None,
+    )
+
+
+def approximate_count(query, table):
+    """
+    Возвращает число строк запроса из кэша справочников: значение хранится до REFERENCE_CACHE_TTL
+    или до изменения таблицы table, ключом служит текст запроса с параметрами.
+    Для запроса ко всей таблице без фильтров на MySQL используется оценка TABLE_ROWS из information_schema вместо COUNT(*).
+    """
+    statement = query.order_by(None).statement
+    froms = statement.get_final_froms()
+    whole_table = statement.whereclause is None and len(froms) == 1 and getattr(froms[0], "name", None) == table
+    compiled = statement.compile(dialect=db.engine.dialect)
+
+    def load():
+        if whole_table and db.engine.dialect.name == "mysql":
+            estimate = db.session.execute(
+                text("SELECT TABLE_ROWS FROM information_schema.TABLES "
+                     "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = :table"),
+                {"table": table}
+            ).scalar()
+            if estimate is not None:
+                return int(estimate)
+        return query.order_by(None).count()
+
+    return reference_cache.get(table, load, key=("count", str(compiled), repr(sorted(compiled.params.items()))))
+
+
+def _encode_cursor(value, row_id, backwards=False):
+    if isinstance(value, datetime):
+        value = {"datetime": value.isoformat()}
+    payload = json.dumps([value, row_id, backwards], ensure_ascii=False, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii")
+
+
+def _decode_cursor(cursor, sort_column):
+    try:
+        value, row_id, backwards = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        if isinstance(value, dict):
+            value = datetime.fromisoformat(value["datetime"])
+        return value, int(row_id), bool(backwards)
+    except (ValueError, TypeError, KeyError):
+        current_app.logger.warning(f"Некорректный курсор пагинации для {sort_column}: {cursor}")
+        return None
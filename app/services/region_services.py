@@ -1,48 +1,47 @@
 from app import db
-from app.models.log_models import Log
 from app.models.region_models import Region
 from app.models.fo_models import Fo
-from sqlalchemy import text
+from sqlalchemy import func
 from sqlalchemy.exc import IntegrityError
-
-def log_to_db(username, action, details=None):
-    """Записывает лог действия пользователя в базу данных."""
-    try:
-        log_entry = Log(username=username, action=action, details=details)
-        db.session.add(log_entry)
-        db.session.commit()
-    except Exception as e:
-        print(f"Ошибка записи лога: {e}")
-
-
-def get_region_list(page, per_page, name_filter=None, sort_by="id", sort_dir="asc"):
-    """Получает список субъектов РФ с пагинацией, фильтрацией и сортировкой."""
+from app.services.log_services import log_to_db, deferred_log
+from app.services.cache_services import reference_cache
+from app.services.grid_services import save_grid_rows, delete_grid_rows
+from app.services.import_services import read_import_rows, upsert_by_name, use_streaming, stream_upsert_by_name
+from app.services.pagination_services import paginate
+from app.services.search_services import contains_filter
+
+def get_region_list(page, per_page, name_filter=None, sort_by="id", sort_dir="asc", keyset=False, cursor=None):
+    """
+    Получает список субъектов РФ с пагинацией, фильтрацией и сортировкой.
+    :param keyset: Режим keyset-пагинации (по курсору) вместо постраничной с OFFSET.
+    :param cursor: Курсор страницы в режиме keyset.
+    """
     query = Region.query
 
     if name_filter:
-        query = query.filter(Region.name.ilike(f"%{name_filter}%"))
+        query = query.filter(contains_filter(Region.name, name_filter))
 
     # Сортировка
     if sort_by == "name":
-        query = query.order_by(Region.name.desc() if sort_dir == "desc" else Region.name.asc())
+        sort_column = Region.name
     elif sort_by == "fo":
-        query = query.join(Fo).order_by(
-            Fo.name.desc() if sort_dir == "desc" else Fo.name.asc()
-        )
+        query = query.join(Fo)
+        sort_column = Fo.name
     else:
-        query = query.order_by(Region.id.desc() if sort_dir == "desc" else Region.id.asc())
+        sort_column = Region.id
 
     # Пагинация
-    pagination = query.paginate(page=page, per_page=per_page, error_out=False)
-
-    return pagination
+    return paginate(query, page, per_page, sort_column, Region.id, sort_dir, keyset, cursor)
 
 
 def get_fos():
-    """Получает список типов энергосистем."""
-    return Fo.query.all()
+    """Получает список ФО (id, name) из кэша справочников."""
+    return reference_cache.get(
+        Fo.__tablename__, lambda: db.session.query(Fo.id, Fo.name).order_by(Fo.id).all()
+    )
 
 
+@deferred_log()
 def update_region(data, user):
     """
     Обновляет запись субъекта РФ в базе данных.
@@ -57,7 +56,6 @@ def update_region(data, user):
     log_to_db(user, "Получены данные для обновления", f"{data}")
 
     for record in data:
-        region_id = record.get("id")
         name = record.get("name")
         fo_id = record.get("fo_id")
 
@@ -65,27 +63,28 @@ def update_region(data, user):
         if not name or not fo_id:
             raise ValueError("Каждая запись должна содержать 'name' и 'fo_id'.")
 
-        if region_id:
-            region = Region.query.get(region_id)
-
-            duplicate = Region.query.filter(Region.name == name, Region.id != region_id).first()
-            if duplicate:
-                raise ValueError(f"Запись с именем '{name}' уже существует.")
-            
-            region.name = name
-            region.id_fo = fo_id
-        else:
-            duplicate = Region.query.filter(Region.name == name, Region.id != region_id).first()
-            if duplicate:
-                raise ValueError(f"Запись с именем '{name}' уже существует.")
-
-            new_region = Region(name=name, id_fo=fo_id)
-            db.session.add(new_region)
-
-    # Сохранение изменений в базе данных
+    # Сохранение изменений: две выборки на всю страницу и пакетная запись только изменённых строк
     try:
+        inserted, updated = save_grid_rows(
+            Region,
+            [
+                {
+                    "id": record.get("id"),
+                    "name": record.get("name"),
+                    "id_fo": record.get("fo_id"),
+                    "version": record.get("version")
+                }
+                for record in data
+            ],
+            ["name", "id_fo"]
+        )
         db.session.commit()
-        log_to_db(user, "Обновление записей списка субъектов РФ", f"Обновлено записей: {len(data)}")
+        if inserted or updated:
+            reference_cache.invalidate(Region.__tablename__)
+        log_to_db(user, "Обновление записей списка субъектов РФ", f"Добавлено записей: {inserted}, обновлено записей: {updated}")
+    except ValueError:
+        db.session.rollback()
+        raise
     except IntegrityError as e:
         db.session.rollback()
         log_to_db(user, "Ошибка обновления списка субъектов РФ", str(e))
@@ -96,9 +95,11 @@ def update_region(data, user):
         raise ValueError(f"Произошла ошибка при обновлении данных: {e}")
 
 
+@deferred_log()
 def add_region(data, user):
     """
     Добавляет запись субъекта РФ в базе данных.
+    Все записи сохраняются одной транзакцией.
     :param data: Список словарей с данными субъектов РФ. Пример:
                  [{"id": 1, "name": "Белгородская область", "fo_id": 2}, ...]
     :param user: Имя пользователя для логирования.
@@ -107,59 +108,60 @@ def add_region(data, user):
     if not isinstance(data, list):
         raise ValueError("Данные должны быть предоставлены в виде списка словарей.")
 
-    for record in data:
-        region_id = record.get("id")
-        name = record.get("name")
-        fo_id = record.get("fo_id")
+    messages = []  # Сообщения журнала, записываемые после успешного сохранения
 
-        # Проверка на наличие необходимых данных
-        if not name or not fo_id:
-            log_to_db(user, "Ошибка валидации", f"Запись: {record}")
-            raise ValueError("Каждая запись должна содержать 'name' и 'fo_id'.")
+    try:
+        for record in data:
+            region_id = record.get("id")
+            name = record.get("name")
+            fo_id = record.get("fo_id")
+
+            # Проверка на наличие необходимых данных
+            if not name or not fo_id:
+                log_to_db(user, "Ошибка валидации", f"Запись: {record}")
+                raise ValueError("Каждая запись должна содержать 'name' и 'fo_id'.")
+
+            if region_id:
+                # Обновление существующей записи
+                region = Region.query.get(region_id)
+                if not region:
+                    log_to_db(user, "Ошибка обновления", f"субъектов РФ с ID {region_id} не существует.")
+                    raise ValueError(f"Запись с ID {region_id} не найдена.")
 
-        if region_id:
-            # Обновление существующей записи
-            region = Region.query.get(region_id)
-            if region:
                 # Проверка на дублирование имени
                 duplicate = Region.query.filter(Region.name == name, Region.id != region_id).first()
                 if duplicate:
                     log_to_db(user, "Ошибка дублирования", f"Имя: {name}, ID: {region_id}")
                     raise ValueError(f"Запись с именем '{name}' уже существует.")
-                
+
                 # Обновление полей записи
                 region.name = name
                 region.id_fo = fo_id
-                
-                try:
-                    # Сохранение изменений в базе данных
-                    db.session.commit()
-                    log_to_db(user, "Успешное обновление", f"Обновлено субъектов РФ ID: {region_id}")
-                except Exception as e:
-                    db.session.rollback()  # Откат транзакции в случае ошибки
-                    log_to_db(user, "Ошибка сохранения", f"Ошибка при обновлении списка субъектов РФ ID: {region_id}, ошибка: {str(e)}")
-                    raise ValueError(f"Ошибка при обновлении записи с ID {region_id}: {str(e)}")
+                messages.append(("Успешное обновление", f"Обновлено субъектов РФ ID: {region_id}"))
             else:
-                log_to_db(user, "Ошибка обновления", f"субъектов РФ с ID {region_id} не существует.")
-                raise ValueError(f"Запись с ID {region_id} не найдена.")
-        else:
-            # Добавление новой записи
-            duplicate = Region.query.filter(Region.name == name).first()
-            if duplicate:
-                log_to_db(user, "Ошибка дублирования", f"Имя: {name}")
-                raise ValueError(f"Запись с именем '{name}' уже существует.")
-
-            new_region = Region(name=name, id_fo=fo_id)  # предполагается, что Region имеет такие атрибуты
-            db.session.add(new_region)
-
-            try:
-                # Сохранение новой записи в базе данных
-                db.session.commit()
-                log_to_db(user, "Успешное добавление", f"Добавлен новый субъект РФ: {name}")
-            except Exception as e:
-                db.session.rollback()  # Откат транзакции в случае ошибки
-                log_to_db(user, "Ошибка сохранения", f"Ошибка при добавлении субъекта РФ: {name}, ошибка: {str(e)}")
-                raise ValueError(f"Ошибка при добавлении новой записи: {str(e)}")
+                # Добавление новой записи
+                duplicate = Region.query.filter(Region.name == name).first()
+                if duplicate:
+                    log_to_db(user, "Ошибка дублирования", f"Имя: {name}")
+                    raise ValueError(f"Запись с именем '{name}' уже существует.")
+
+                db.session.add(Region(name=name, id_fo=fo_id))
+                messages.append(("Успешное добавление", f"Добавлен новый субъект РФ: {name}"))
+    except ValueError:
+        db.session.rollback()
+        raise
+
+    try:
+        # Сохранение всех записей в базе данных
+        db.session.commit()
+        reference_cache.invalidate(Region.__tablename__)
+    except Exception as e:
+        db.session.rollback()  # Откат транзакции в случае ошибки
+        log_to_db(user, "Ошибка сохранения", f"Ошибка при сохранении субъектов РФ: {data}, ошибка: {str(e)}")
+        raise ValueError(f"Ошибка при сохранении записей: {str(e)}")
+
+    for action, details in messages:
+        log_to_db(user, action, details)
 
 def get_total_region_records(name_filter):
     """
@@ -169,75 +171,77 @@ def get_total_region_records(name_filter):
     """
     query = Region.query
     if name_filter:
-        query = query.filter(Region.name.ilike(f"%{name_filter}%"))
+        query = query.filter(contains_filter(Region.name, name_filter))
     return query.count()
 
+@deferred_log()
 def delete_region_list(ids, user):
-    """Удаляет записи субъектов РФ по переданным ID."""
-    log_to_db(user, "Удаление записей", f"Переданы ID для удаления: {ids}")
-    
-    successful_deletes = 0  # Для подсчета успешных удалений
-
-    for region_id in ids:
-        try:
-            region_id = int(region_id)  # Приведение к целому числу
-            region = Region.query.get(region_id)
-            if region:
-                db.session.delete(region)
-                successful_deletes += 1
-                log_to_db(user, "Удаление записи", f"Удалён субъект РФ с ID: {region_id}")
-            else:
-                log_to_db(user, "Ошибка удаления", f"Запись с ID {region_id} не найдена.")
-        except ValueError:
-            log_to_db(user, "Ошибка удаления", f"Некорректный ID: {region_id}")
-
+    """
+    Удаляет записи субъектов РФ по переданным ID одним запросом.
+    :return: Количество удалённых записей.
+    :raises ValueError: Если ID некорректны или удаление не выполнено.
+    """
     try:
+        deleted = delete_grid_rows(Region, ids)
         db.session.commit()
-        log_to_db(user, "Удаление завершено", f"Успешно удалено записей: {successful_deletes}")
+    except ValueError:
+        db.session.rollback()
+        raise
     except Exception as e:
         db.session.rollback()
         log_to_db(user, "Ошибка удаления", str(e))
         raise ValueError("Ошибка при удалении данных.")
 
+    if deleted:
+        reference_cache.invalidate(Region.__tablename__)
+    log_to_db(user, "Удаление записей", f"Удалено записей субъектов РФ: {deleted} из {len(ids)}, ID: {', '.join(map(str, ids))}")
+    return deleted
 
-def import_region_from_excel(file, user):
-    """Импортирует данные списка субъектов РФ из Excel-файла в базу данных."""
-    import pandas as pd
 
+@deferred_log()
+def import_region_from_excel(file, user, delete_missing=False, progress=None):
+    """
+    Импортирует данные субъектов РФ из Excel-файла в базу данных.
+    Записи сопоставляются по наименованию: новые добавляются, изменённые обновляются,
+    неизменённые не затрагиваются и сохраняют свои ID (и ссылки на них). Всё выполняется одной транзакцией;
+    xlsx-файлы больше IMPORT_STREAMING_THRESHOLD читаются и записываются потоково по частям в той же транзакции.
+    :param delete_missing: Удалять ли записи, отсутствующие в файле.
+    :param progress: Функция progress(обработано строк, всего строк) для отчёта о ходе импорта:
+                     при потоковом чтении — после каждой части, иначе — по завершении.
+    :return: Кортеж (количество добавленных, обновлённых, удалённых записей).
+    """
     try:
-        data = pd.read_excel(file)
-
-        if 'name' not in data.columns or 'id_fo' not in data.columns:
-            raise ValueError("Неверный формат файла. Отсутствуют необходимые столбцы.")
-
-        db.session.query(Region).delete()
-        db.session.commit()
-
-        db.session.execute(text("ALTER TABLE region AUTO_INCREMENT = 1"))
-        db.session.commit()
-
-        records = [Region(name=row['name'], id_fo=row['id_fo']) for _, row in data.iterrows()]
-        db.session.bulk_save_objects(records)
-        db.session.commit()
-
-        log_to_db(user, "Импорт завершён", f"Импортировано записей: {len(records)}")
-        return len(records)
+        if use_streaming(file):
+            # Большой файл: потоковое чтение и запись по частям, коммит — после всех частей
+            inserted, updated, deleted = stream_upsert_by_name(Region, file, {"name": str, "id_fo": int}, delete_missing, progress)
+            db.session.commit()
+        else:
+            # Читаем и проверяем только нужные столбцы; повторы имён схлопываются
+            rows = read_import_rows(file, {"name": str, "id_fo": int}, required=["name"], unique=["name"])
+            inserted, updated, deleted = upsert_by_name(Region, rows, ["id_fo"], delete_missing)
+            db.session.commit()
+            if progress:
+                progress(len(rows), len(rows))
+        if inserted or updated or deleted:
+            reference_cache.invalidate(Region.__tablename__)
+
+        log_to_db(user, "Импорт завершён", f"Добавлено: {inserted}, обновлено: {updated}, удалено: {deleted}")
+        return inserted, updated, deleted
     except Exception as e:
+        db.session.rollback()
         log_to_db(user, "Ошибка импорта", str(e))
         raise ValueError(f"Ошибка при импорте данных: {e}")
 
-import pandas as pd
-from io import BytesIO
-
-def export_region_to_excel(user, name_filter=None, sort_by="id", sort_dir="asc"):
-    """Экспортирует данные списка субъектов РФ в Excel и возвращает бинарный поток."""
+from app.services.export_services import stream_query, export_rows
 
-    log_to_db(user, "Начата выгрузка таблицы субъектов РФ из базы данных")
-    log_to_db(user, "Параметры экспорта", f"name_filter={name_filter}, sort_by={sort_by}, sort_dir={sort_dir}")
-    
-    query = Region.query
+def get_region_export_rows(name_filter=None, sort_by="id", sort_dir="asc"):
+    """Возвращает запрос строк экспорта субъектов РФ: (ID, субъект РФ, ФО)."""
+    query = (
+        db.session.query(Region.id, Region.name, func.coalesce(Fo.name, "Не указан"))
+        .outerjoin(Fo, Region.id_fo == Fo.id)
+    )
     if name_filter:
-        query = query.filter(Region.name.ilike(f"%{name_filter}%"))
+        query = query.filter(contains_filter(Region.name, name_filter))
 
     # Сортировка
     if sort_by == "id":
@@ -245,28 +249,32 @@ def export_region_to_excel(user, name_filter=None, sort_by="id", sort_dir="asc")
     elif sort_by == "name":
         query = query.order_by(Region.name.desc() if sort_dir == "desc" else Region.name.asc())
     elif sort_by == "fo":
-        query = query.join(Fo).order_by(
-            Fo.name.desc() if sort_dir == "desc" else Fo.name.asc()
-        )
+        query = query.order_by(Fo.name.desc() if sort_dir == "desc" else Fo.name.asc())
+
+    return query
 
-    region_items = query.all()
-    data = [{
-        "ID": o.id,
-        "Субъект РФ": o.name,
-        "ФО": o.fo.name if o.fo else "Не указан"
-    } for o in region_items]
-
-    log_to_db(user, "Подготовка данных для экспорта таблицы субъектов РФ в Excel", f"Записей для экспорта: {len(data)}")
-
-    # Подготовка данных к записи в Excel
-    df = pd.DataFrame(data)
-    
-    # Создание Excel-файла
-    output = BytesIO()
-    with pd.ExcelWriter(output, engine="xlsxwriter") as writer:
-        df.to_excel(writer, index=False, sheet_name="субъектов РФ")
-
-    # Возврат файла в ответе
-    output.seek(0)
-    log_to_db(user, "Экспорт таблицы субъектов РФ в Excel завершён", f"Экспортировано записей: {len(data)}")
+
+def export_region_to_excel(user, name_filter=None, sort_by="id", sort_dir="asc", export_format="xlsx", progress=None):
+    """
+    Экспортирует данные списка субъектов РФ в Excel, CSV или Parquet.
+    :param export_format: Формат выгрузки: xlsx, csv или parquet.
+    :param progress: Функция progress(выгружено строк, всего строк) для отчёта о ходе выгрузки.
+    :return: Временный файл, генератор частей файла (csv) или None, если данных для экспорта нет.
+    """
+
+    log_to_db(user, "Начата выгрузка таблицы субъектов РФ из базы данных")
+    log_to_db(user, "Параметры экспорта", f"name_filter={name_filter}, sort_by={sort_by}, sort_dir={sort_dir}, format={export_format}")
+
+    # Выгрузка потоково, порциями из серверного курсора
+    output = export_rows(
+        stream_query(get_region_export_rows(name_filter, sort_by, sort_dir)),
+        ["ID", "Субъект РФ", "ФО"],
+        "субъектов РФ",
+        export_format,
+        on_complete=lambda count: log_to_db(user, "Экспорт таблицы субъектов РФ завершён", f"Экспортировано записей: {count}"),
+        progress=progress
+    )
+
+    if output is None:
+        log_to_db(user, "Экспорт завершён", "Нет данных для экспорта.")
     return output
@@ -1,28 +1,36 @@
+import re
+
 from app import db
-from app.models.log_models import Log
 from app.models.oes_models import Oes
 from app.models.res_models import Res, ResRegion
 from app.models.region_models import Region
-from sqlalchemy import text
+from sqlalchemy import text, update
+from sqlalchemy.orm import joinedload
 from sqlalchemy.exc import IntegrityError
-
-def log_to_db(username, action, details=None):
-    """Записывает лог действия пользователя в базу данных."""
-    try:
-        log_entry = Log(username=username, action=action, details=details)
-        db.session.add(log_entry)
-        db.session.commit()
-    except Exception as e:
-        print(f"Ошибка записи лога: {e}")
-
-
-def get_res_list(page, per_page, res_filter=None, oes_filter=None, sort_by="id", sort_dir="asc"):
-    """Получает список субъектов РФ с пагинацией, фильтрацией и сортировкой."""
+from app.services.log_services import log_to_db, deferred_log
+from app.services.cache_services import reference_cache
+from app.services.grid_services import row_version, delete_grid_rows
+from app.services.import_services import (
+    read_import_rows, iter_import_chunks, upsert_by_name, sync_links, use_streaming, stream_upsert_by_name
+)
+from app.services.pagination_services import paginate
+from app.services.search_services import contains_filter
+
+def get_res_list(page, per_page, res_filter=None, oes_filter=None, sort_by="id", sort_dir="asc", with_regions=False,
+                 keyset=False, cursor=None):
+    """
+    Получает список субъектов РФ с пагинацией, фильтрацией и сортировкой.
+    :param with_regions: Если True, ОЭС загружаются вместе со страницей, а каждой записи
+                         присваивается атрибут region_ids одним дополнительным запросом,
+                         так что число запросов не зависит от per_page.
+    :param keyset: Режим keyset-пагинации (по курсору) вместо постраничной с OFFSET.
+    :param cursor: Курсор страницы в режиме keyset.
+    """
     query = Res.query
 
     # Фильтрация по названию региональной энергосистемы
     if res_filter:
-        query = query.filter(Res.name.ilike(f"%{res_filter}%"))
+        query = query.filter(contains_filter(Res.name, res_filter))
 
     # Фильтрация по ОЭС (строго по ID)
     if oes_filter:
@@ -30,20 +38,42 @@ def get_res_list(page, per_page, res_filter=None, oes_filter=None, sort_by="id",
 
     # Сортировка
     if sort_by == "name":
-        query = query.order_by(Res.name.desc() if sort_dir == "desc" else Res.name.asc())
+        sort_column = Res.name
     elif sort_by == "oes":
-        query = query.join(Oes).order_by(
-            Oes.name.desc() if sort_dir == "desc" else Oes.name.asc()
-        )
+        query = query.join(Oes)
+        sort_column = Oes.name
     else:
-        query = query.order_by(Res.id.desc() if sort_dir == "desc" else Res.id.asc())
+        sort_column = Res.id
+
+    if with_regions:
+        query = query.options(joinedload(Res.oes))
 
     # Пагинация
-    pagination = query.paginate(page=page, per_page=per_page, error_out=False)
+    pagination = paginate(query, page, per_page, sort_column, Res.id, sort_dir, keyset, cursor)
+
+    if with_regions:
+        attach_region_ids(pagination.items)
 
     return pagination
 
 
+def attach_region_ids(items):
+    """Присваивает записям региональных энергосистем атрибут region_ids, загружая связи одним запросом."""
+    region_ids = {item.id: [] for item in items}
+
+    if region_ids:
+        links = (
+            db.session.query(ResRegion.id_res, ResRegion.id_region)
+            .filter(ResRegion.id_res.in_(region_ids.keys()))
+            .order_by(ResRegion.id)
+        )
+        for id_res, id_region in links:
+            region_ids[id_res].append(id_region)
+
+    for item in items:
+        item.region_ids = region_ids[item.id]
+
+
 def get_total_with_filter(res_filter, oes_filter):
     """
     Возвращает общее количество записей региональных энергосистем, соответствующих фильтру.
@@ -52,30 +82,62 @@ def get_total_with_filter(res_filter, oes_filter):
     """
     query = Res.query
     if res_filter:
-        query = query.filter(Res.name.ilike(f"%{res_filter}%"))
+        query = query.filter(contains_filter(Res.name, res_filter))
 
     if oes_filter:
-        query = query.join(Res.oes).filter(Oes.name.ilike(f"%{oes_filter}%"))
+        query = query.join(Res.oes).filter(contains_filter(Oes.name, oes_filter))
     
     return query.count()
 
 
 def get_oes():
-    """Получает список типов энергосистем."""
-    return Oes.query.all()
+    """Получает список ОЭС (id, name) из кэша справочников."""
+    return reference_cache.get(
+        Oes.__tablename__, lambda: db.session.query(Oes.id, Oes.name).order_by(Oes.id).all()
+    )
 
 
 def get_regions():
-    """Получает список субъектов."""
-    return Region.query.all()
+    """Получает список субъектов (id, name) из кэша справочников."""
+    return reference_cache.get(
+        Region.__tablename__, lambda: db.session.query(Region.id, Region.name).order_by(Region.id).all()
+    )
 
 
+def get_region_options(prefix="", limit=50):
+    """
+    Возвращает субъекты РФ для окна выбора в строке РЭС из кэша справочников.
+    Подходят субъекты, наименование или одно из слов наименования которых начинается с prefix (без учёта регистра);
+    сначала идут совпадения с началом наименования. При пустом prefix возвращаются все субъекты без ограничения.
+    :return: Список словарей {"id": ID, "name": наименование}, не более limit элементов (при непустом prefix).
+    """
+    prefix = prefix.strip().casefold()
+    if not prefix:
+        limit = None
+    matches = []
+    for region in get_regions():
+        name = region.name.casefold()
+        if name.startswith(prefix):
+            matches.append((0, name, region))
+        elif any(word.startswith(prefix) for word in re.split(r"[\s\-(),.]+", name)):
+            matches.append((1, name, region))
+
+    matches.sort(key=lambda match: match[:2])
+    return [{"id": region.id, "name": region.name} for _, _, region in matches[:limit]]
+
+
+@deferred_log()
 def update_res(data, user):
     """
     Обновляет записи субъектов РФ в базе данных и связанные с ними регионы.
+    Неизменённые записи пропускаются; если токен версии строки ("version") не совпадает
+    с текущим состоянием записи, сохранение отклоняется. Текущие записи и владельцы наименований загружаются
+    один раз, уникальность наименований проверяется в памяти, изменённые записи сохраняются одним пакетным UPDATE.
     :param data: Список словарей с данными для обновления. Пример:
-                 [{"id": 1, "name": "Белгородская область", "oes_id": 2, "regions": [1, 2, 3]}, ...]
+                 [{"id": 1, "name": "Белгородская область", "oes_id": 2, "regions": [1, 2, 3], "version": "..."}, ...]
     :param user: Имя пользователя, инициировавшего обновление.
+    :return: Кортеж (количество добавленных, количество обновлённых записей,
+             ID пропущенных записей, удалённых другим пользователем).
     :raises ValueError: Если обнаружены ошибки в данных или сохранении.
     """
     if not isinstance(data, list):
@@ -84,48 +146,88 @@ def update_res(data, user):
     log_to_db(user, "Получены данные для обновления", f"{data}")
 
     try:
-        for record in data:
+        # Текущее состояние переданных записей (наименование, ОЭС, ID регионов) двумя запросами на страницу
+        ids = [record.get("id") for record in data if record.get("id")]
+        current = {}
+        if ids:
+            current = {
+                row.id: (row.name, row.id_oes, [])
+                for row in db.session.query(Res.id, Res.name, Res.id_oes).filter(Res.id.in_(ids))
+            }
+            for res_id, region_id in db.session.query(ResRegion.id_res, ResRegion.id_region).filter(ResRegion.id_res.in_(ids)):
+                current[res_id][2].append(region_id)
+
+        # Владельцы наименований среди существующих записей одним запросом; уникальность проверяется в памяти
+        names = {record.get("name") for record in data if record.get("name")}
+        owners = {}
+        if names:
+            for name, res_id in db.session.query(Res.name, Res.id).filter(Res.name.in_(names)):
+                owners.setdefault(name, set()).add(res_id)
+
+        links = {}  # ID РЭС -> ID регионов для изменённых записей
+        updates = []
+        new_records = []
+        stale = []  # ID записей, удалённых другим пользователем после вывода страницы
+        for index, record in enumerate(data):
             res_id = record.get("id")
             name = record.get("name")
             oes_id = record.get("oes_id")
             region_ids = record.get("regions", [])  # Список ID регионов
-            print(res_id, name, oes_id,region_ids)
 
             # Проверки на валидность данных
             if not name or oes_id is None:
                 raise ValueError(f"Каждая запись должна содержать 'name' и 'oes_id'. Данные: {record}")
 
-            # Проверка на существующий дубликат
-            duplicate = Res.query.filter(Res.name == name).filter(Res.id != res_id).first()
-            if duplicate:
+            if res_id in current:
+                version = row_version(*current[res_id])
+                if record.get("version") and record["version"] != version:
+                    raise ValueError(f"Запись '{name}' была изменена другим пользователем. Обновите страницу и повторите изменения.")
+
+                # Неизменённые записи не перезаписываются
+                if row_version(name, oes_id, region_ids) == version:
+                    continue
+            elif res_id:
+                # Запись удалена другим пользователем
+                stale.append(res_id)
+                continue
+
+            # Проверка на существующий дубликат, в том числе среди уже обработанных строк
+            owner = res_id or ("new", index)
+            if owners.get(name, set()) - {owner}:
                 raise ValueError(f"Запись с именем '{name}' уже существует.")
+            if res_id:
+                # Прежнее наименование переименованной записи освобождается
+                owners.get(current[res_id][0], set()).discard(res_id)
+            owners.setdefault(name, set()).add(owner)
 
             if res_id:
                 # Обновление существующей записи
-                res = Res.query.get(res_id)
-                if res:
-                    res.name = name
-                    res.id_oes = oes_id
-
-                    # Удаление старых связей с регионами
-                    db.session.query(ResRegion).filter_by(id_res=res.id).delete()
-
-                    # Добавление новых связей с регионами
-                    for region_id in region_ids:
-                        db.session.add(ResRegion(id_res=res.id, id_region=region_id))
+                updates.append({"id": res_id, "name": name, "id_oes": oes_id})
+                links[res_id] = region_ids
             else:
                 # Создание новой записи
-                new_res = Res(name=name, id_oes=oes_id)
-                db.session.add(new_res)
-                db.session.flush()  # Получение ID новой записи
+                new_records.append((Res(name=name, id_oes=oes_id), region_ids))
+
+        if updates:
+            db.session.execute(update(Res), updates)
+        if new_records:
+            db.session.add_all([res for res, _ in new_records])
+            db.session.flush()  # Получение ID новых записей
+            for res, region_ids in new_records:
+                links[res.id] = region_ids
 
-                # Добавление связей с регионами для новой записи
-                for region_id in region_ids:
-                    db.session.add(ResRegion(id_res=new_res.id, id_region=region_id))
+        # Связи с регионами изменённых записей: только разница с текущими, одним DELETE и одним INSERT
+        sync_links(ResRegion, "id_res", "id_region", _link_pairs(links), scope=links)
 
         # Сохранение изменений в базе данных
         db.session.commit()
-        log_to_db(user, "Обновление записей списка субъектов РФ", f"Обновлено записей: {len(data)}")
+        if updates or new_records:
+            reference_cache.invalidate(Res.__tablename__)
+        log_to_db(user, "Обновление записей списка субъектов РФ",
+                  f"Добавлено записей: {len(new_records)}, обновлено записей: {len(updates)}")
+        if stale:
+            log_to_db(user, "Пропущены записи, удалённые другим пользователем", f"ID: {', '.join(map(str, stale))}")
+        return len(new_records), len(updates), stale
     except IntegrityError as e:
         db.session.rollback()
         log_to_db(user, "Ошибка обновления списка субъектов РФ", str(e))
@@ -136,9 +238,11 @@ def update_res(data, user):
         raise ValueError(f"Произошла ошибка при обновлении данных: {e}")
 
 
+@deferred_log()
 def add_res(data, user):
     """
     Добавляет запись субъекта РФ в базе данных.
+    Все записи и их связи с регионами сохраняются одной транзакцией.
     :param data: Список словарей с данными субъектов РФ. Пример:
                  [{"id": 1, "name": "Белгородская область", "oes_id": 2}, ...]
     :param user: Имя пользователя для логирования.
@@ -147,133 +251,128 @@ def add_res(data, user):
     if not isinstance(data, list):
         raise ValueError("Данные должны быть предоставлены в виде списка словарей.")
 
-    for record in data:
-        res_id = record.get("id")
-        name = record.get("name")
-        oes_id = record.get("oes_id")
-        region_ids = record.get("regions", [])
-        print(region_ids)
-
-        # Проверка на наличие необходимых данных
-        if not name or not oes_id or not region_ids:
-            log_to_db(user, "Ошибка валидации", f"Запись: {record}")
-            raise ValueError("Каждая запись должна содержать 'name', 'oes_id' и 'region_ids'.")
-
-        if res_id:
-            # Обновление существующей записи
-            res = Res.query.get(res_id)
-            if res:
+    messages = []  # Сообщения журнала, записываемые после успешного сохранения
+
+    try:
+        links = {}  # ID РЭС -> ID регионов
+        for record in data:
+            res_id = record.get("id")
+            name = record.get("name")
+            oes_id = record.get("oes_id")
+            region_ids = record.get("regions", [])
+
+            # Проверка на наличие необходимых данных
+            if not name or not oes_id or not region_ids:
+                log_to_db(user, "Ошибка валидации", f"Запись: {record}")
+                raise ValueError("Каждая запись должна содержать 'name', 'oes_id' и 'region_ids'.")
+
+            if res_id:
+                # Обновление существующей записи
+                res = Res.query.get(res_id)
+                if not res:
+                    log_to_db(user, "Ошибка обновления", f"субъектов РФ с ID {res_id} не существует.")
+                    raise ValueError(f"Запись с ID {res_id} не найдена.")
+
                 # Проверка на дублирование имени
                 duplicate = Res.query.filter(Res.name == name, Res.id != res_id).first()
                 if duplicate:
                     log_to_db(user, "Ошибка дублирования", f"Имя: {name}, ID: {res_id}")
                     raise ValueError(f"Запись с именем '{name}' уже существует.")
-                
+
                 # Обновление полей записи
                 res.name = name
                 res.id_oes = oes_id
-                
-                # Удаление старых связей с регионами
-                db.session.query(ResRegion).filter_by(id_res=res.id).delete()
-                
-                # Добавление новых связей с регионами
-                for region_id in region_ids:
-                    db.session.add(ResRegion(id_res=res.id, id_region=region_id))
-                
-                try:
-                    # Сохранение изменений в базе данных
-                    db.session.commit()
-                    log_to_db(user, "Успешное обновление", f"Обновлено субъектов РФ ID: {res_id}")
-                except Exception as e:
-                    db.session.rollback()  # Откат транзакции в случае ошибки
-                    log_to_db(user, "Ошибка сохранения", f"Ошибка при обновлении списка субъектов РФ ID: {res_id}, ошибка: {str(e)}")
-                    raise ValueError(f"Ошибка при обновлении записи с ID {res_id}: {str(e)}")
+                messages.append(("Успешное обновление", f"Обновлено субъектов РФ ID: {res_id}"))
             else:
-                log_to_db(user, "Ошибка обновления", f"субъектов РФ с ID {res_id} не существует.")
-                raise ValueError(f"Запись с ID {res_id} не найдена.")
-        else:
-            new_res = Res(name=name, id_oes=oes_id)
-                       
-            db.session.add(new_res)
-
-            try:
-                # Сохранение новой записи в базе данных
-                db.session.commit()
-                
-                # Добавление новых связей с регионами
-                res = Res.query.get(new_res)
-                for region_id in region_ids:
-                    db.session.add(ResRegion(id_res=new_res.id, id_region=region_id))
-                db.session.commit()
-
-                log_to_db(user, "Успешное добавление", f"Добавлен новый субъект РФ: {name}")
-            except Exception as e:
-                db.session.rollback()  # Откат транзакции в случае ошибки
-                log_to_db(user, "Ошибка сохранения", f"Ошибка при добавлении субъекта РФ: {name}, ошибка: {str(e)}")
-                raise ValueError(f"Ошибка при добавлении новой записи: {str(e)}")
+                res = Res(name=name, id_oes=oes_id)
+                db.session.add(res)
+                db.session.flush()  # Получение ID новой записи
+                messages.append(("Успешное добавление", f"Добавлен новый субъект РФ: {name}"))
 
-def delete_res_list(ids, user):
-    """Удаляет записи субъектов РФ по переданным ID."""
-    log_to_db(user, "Удаление записей", f"Переданы ID для удаления: {ids}")
-    print(ids)
+            links[res.id] = region_ids
 
-    successful_deletes = 0  # Для подсчета успешных удалений
+        # Связи с регионами: только разница с текущими, одним DELETE и одним INSERT
+        sync_links(ResRegion, "id_res", "id_region", _link_pairs(links), scope=links)
+    except ValueError:
+        db.session.rollback()
+        raise
 
     try:
-        for res_id in ids:
-            try:
-                res_id = int(res_id)  # Приведение к целому числу
-                res = Res.query.get(res_id)
-                print(res)
-                if res:
-                    db.session.delete(res)
-                    log_to_db(user, "Удаление записи", f"Удалён субъект РФ с ID: {res_id}")
-            except ValueError:
-                log_to_db(user, "Ошибка удаления", f"Некорректный ID: {res_id}")
-                continue  # Пропустить ошибочные значения ID
-
-        # Пытаемся выполнить коммит только после всех удалений
+        # Сохранение всех записей в базе данных
         db.session.commit()
-        log_to_db(user, "Удаление завершено", f"Успешно удалено записей: {successful_deletes}")
+        reference_cache.invalidate(Res.__tablename__)
+    except Exception as e:
+        db.session.rollback()  # Откат транзакции в случае ошибки
+        log_to_db(user, "Ошибка сохранения", f"Ошибка при сохранении субъектов РФ: {data}, ошибка: {str(e)}")
+        raise ValueError(f"Ошибка при сохранении записей: {str(e)}")
+
+    for action, details in messages:
+        log_to_db(user, action, details)
+
+
+def _link_pairs(links):
+    """Разворачивает словарь {ID РЭС: [ID регионов]} в пары (ID РЭС, ID региона)."""
+    return [(res_id, int(region_id)) for res_id, region_ids in links.items() for region_id in region_ids]
+
+
+@deferred_log()
+def delete_res_list(ids, user):
+    """
+    Удаляет записи РЭС по переданным ID одним запросом; связи с регионами предварительно удаляются
+    одним запросом по тому же списку ID в той же транзакции (см. delete_grid_rows).
+    :return: Количество удалённых записей.
+    :raises ValueError: Если ID некорректны или удаление не выполнено.
+    """
+    try:
+        deleted = delete_grid_rows(Res, ids)
+        db.session.commit()
+    except ValueError:
+        db.session.rollback()
+        raise
     except Exception as e:
         # Откат всех изменений при возникновении ошибки
         db.session.rollback()
         log_to_db(user, "Ошибка удаления", str(e))
         raise ValueError("Ошибка при удалении данных.")
 
+    if deleted:
+        reference_cache.invalidate(Res.__tablename__)
+    log_to_db(user, "Удаление записей", f"Удалено записей РЭС: {deleted} из {len(ids)}, ID: {', '.join(map(str, ids))}")
+    return deleted
 
-def import_res_from_excel(file, user):
-    """Импортирует данные списка субъектов РФ из Excel-файла в базу данных."""
-    import pandas as pd
 
+@deferred_log()
+def import_res_from_excel(file, user, progress=None):
+    """
+    Импортирует данные списка РЭС из Excel-файла в базу данных.
+    Новые записи добавляются, изменённые обновляются; xlsx-файлы больше IMPORT_STREAMING_THRESHOLD
+    читаются и записываются потоково по частям в той же транзакции.
+    :param progress: Функция progress(обработано строк, всего строк) для отчёта о ходе импорта:
+                     при потоковом чтении — после каждой части, иначе — по завершении.
+    :return: Кортеж (количество добавленных, количество обновлённых записей).
+    """
     try:
-        # Читаем данные из файла
-        data = pd.read_excel(file)
-
-        # Проверяем наличие необходимых столбцов
-        if 'name' not in data.columns or 'id_oes' not in data.columns:
-            raise ValueError("Неверный формат файла. Отсутствуют необходимые столбцы 'name' или 'id_oes'.")
-
-        # Удаляем лишние пробелы в именах столбцов (на случай, если они есть)
-        data.columns = data.columns.str.strip()
-
-        # Обновляем или добавляем записи
-        for _, row in data.iterrows():
-            record = db.session.query(Res).filter_by(name=row['name']).first()
-            if record:
-                # Обновляем существующую запись
-                record.id_oes = row['id_oes']
-            else:
-                # Создаем новую запись
-                new_record = Res(name=row['name'], id_oes=row['id_oes'])
-                db.session.add(new_record)
+        if use_streaming(file):
+            # Большой файл: потоковое чтение и запись по частям, коммит — после всех частей
+            inserted, updated, _ = stream_upsert_by_name(Res, file, {"name": str, "id_oes": int}, progress=progress)
+            db.session.commit()
+        else:
+            # Читаем и проверяем только нужные столбцы; повторы имён схлопываются
+            rows = read_import_rows(file, {"name": str, "id_oes": int}, required=["name"], unique=["name"])
 
-        # Сохраняем изменения
-        db.session.commit()
+            # Добавляем новые и обновляем изменённые записи пакетными запросами
+            inserted, updated, _ = upsert_by_name(Res, rows, ["id_oes"])
+
+            # Сохраняем изменения
+            db.session.commit()
+            if progress:
+                progress(len(rows), len(rows))
+        if inserted or updated:
+            reference_cache.invalidate(Res.__tablename__)
 
         # Логируем результат
-        log_to_db(user, "Импорт завершён", f"Обработано записей: {len(data)}")
-        return len(data)
+        log_to_db(user, "Импорт завершён", f"Добавлено: {inserted}, обновлено: {updated}")
+        return inserted, updated
 
     except Exception as e:
         # Откат транзакции в случае ошибки
@@ -282,62 +381,129 @@ def import_res_from_excel(file, user):
         raise ValueError(f"Ошибка при импорте данных: {e}")
 
 
-import pandas as pd
-from io import BytesIO
+@deferred_log()
+def import_res_region_from_excel(file, user, delete_missing=False, progress=None):
+    """
+    Импортирует связи РЭС и субъектов РФ (таблица res_region) из Excel-файла
+    (столбцы id_res и id_region; id_res_region не используется).
+    Файл задаёт полный набор связей перечисленных в нём РЭС: отсутствующие в базе связи добавляются,
+    отсутствующие в файле связи этих РЭС удаляются, связи остальных РЭС не затрагиваются.
+    :param delete_missing: Считать файл полным набором связей всей таблицы и удалить связи РЭС, отсутствующих в файле.
+    :param progress: Функция progress(обработано связей, всего связей), вызываемая по завершении импорта.
+    :return: Кортеж (количество добавленных, количество удалённых связей).
+    :raises ValueError: Если файл некорректен или содержит несуществующие ID.
+    """
+    columns = {"id_res": int, "id_region": int}
+    try:
+        if use_streaming(file):
+            # Большой файл читается потоково; в памяти остаётся только множество пар ID
+            pairs = set()
+            for rows, _, _ in iter_import_chunks(file, columns, required=list(columns)):
+                pairs.update(rows)
+        else:
+            pairs = set(read_import_rows(file, columns, required=list(columns)))
+
+        # Проверяем ID по множествам существующих записей, по одному запросу на таблицу
+        res_ids = {row.id for row in db.session.query(Res.id)}
+        region_ids = {region_id for region_id, _ in get_regions()}
+        unknown_res = sorted({res_id for res_id, _ in pairs} - res_ids)
+        unknown_regions = sorted({region_id for _, region_id in pairs} - region_ids)
+        if unknown_res:
+            raise ValueError(f"РЭС с ID {unknown_res[:10]} не найдены.")
+        if unknown_regions:
+            raise ValueError(f"Субъекты РФ с ID {unknown_regions[:10]} не найдены.")
+
+        # Применяем только разницу с текущими связями РЭС из файла (или всей таблицы при delete_missing)
+        scope = None if delete_missing else {res_id for res_id, _ in pairs}
+        inserted, deleted = sync_links(ResRegion, "id_res", "id_region", pairs, scope=scope)
+        db.session.commit()
+        if progress:
+            progress(len(pairs), len(pairs))
+
+        log_to_db(user, "Импорт связей РЭС и субъектов РФ завершён",
+                  f"Связей в файле: {len(pairs)}, добавлено: {inserted}, удалено: {deleted}")
+        return inserted, deleted
+
+    except Exception as e:
+        db.session.rollback()
+        log_to_db(user, "Ошибка импорта связей РЭС и субъектов РФ", str(e))
+        raise ValueError(f"Ошибка при импорте данных: {e}")
+
+
+from sqlalchemy import func
+from app.services.export_services import stream_query, export_rows
+
+# Максимальная длина результата GROUP_CONCAT на MySQL (по умолчанию 1024 байта)
+GROUP_CONCAT_MAX_LEN = 1024 * 1024
 
-def export_res_to_excel(user, res_filter=None, oes_filter=None, sort_by="id", sort_dir="asc"):
-    """Экспортирует данные списка субъектов РФ в Excel и возвращает бинарный поток."""
-    log_to_db(user, "Начата выгрузка таблицы субъектов РФ из базы данных")
-    log_to_db(user, "Параметры экспорта", f"res_filter={res_filter, oes_filter}, sort_by={sort_by}, sort_dir={sort_dir}")
-    
-    query = Res.query
+
+def get_res_export_rows(res_filter=None, oes_filter=None, sort_by="id", sort_dir="asc"):
+    """
+    Возвращает строки экспорта региональных энергосистем одним агрегирующим запросом:
+    (наименование, ОЭС, перечень субъектов РФ через запятую).
+    Перечень собирается в SQL: GROUP_CONCAT на MySQL, group_concat/string_agg на других СУБД.
+    """
+    if db.engine.dialect.name == "mysql":
+        db.session.execute(text(f"SET SESSION group_concat_max_len = {GROUP_CONCAT_MAX_LEN}"))
+
+    query = (
+        db.session.query(Res.name, Oes.name, func.aggregate_strings(Region.name, ", "))
+        .select_from(Res)
+        .outerjoin(Oes, Res.id_oes == Oes.id)
+        .outerjoin(ResRegion, ResRegion.id_res == Res.id)
+        .outerjoin(Region, ResRegion.id_region == Region.id)
+        .group_by(Res.id, Res.name, Oes.name)
+    )
 
     if res_filter:
-        query = query.filter(Res.name.ilike(f"%{res_filter}%"))
+        query = query.filter(contains_filter(Res.name, res_filter))
 
+    # Фильтрация по ОЭС (строго по ID, как на странице списка)
     if oes_filter:
-        query = query.join(Res.oes).filter(Oes.id.ilike(f"%{oes_filter}%"))
+        query = query.filter(Res.id_oes == oes_filter)
 
     # Сортировка
     if sort_by == "name":
         query = query.order_by(Res.name.desc() if sort_dir == "desc" else Res.name.asc())
     elif sort_by == "oes":
-        query = query.join(Oes).order_by(
-            Oes.name.desc() if sort_dir == "desc" else Oes.name.asc()
-        )
+        query = query.order_by(Oes.name.desc() if sort_dir == "desc" else Oes.name.asc())
     else:
         query = query.order_by(Res.id.desc() if sort_dir == "desc" else Res.id.asc())
 
-    # Выполнение запроса
-    res_items = query.all()
-    log_to_db(user, "Получение данных завершено", f"Найдено записей: {len(res_items)}")
-    
-    print(res_items)
-    
-    # Преобразование данных
-    data = [{
-        "Порядковый номер": idx + 1,  # Добавляем порядковый номер (начиная с 1)
-        "Региональная энергосистема": o.name,
-        "ОЭС": o.oes.name if o.oes else "Не указан",
-        "Субъекты РФ": ", ".join([region.region.name for region in o.regions]) if o.regions else "Не указан"
-    } for idx, o in enumerate(res_items)]
+    return query
 
 
-    if not data:
-        log_to_db(user, "Экспорт завершён", "Нет данных для экспорта.")
-        return None
+def export_res_to_excel(user, res_filter=None, oes_filter=None, sort_by="id", sort_dir="asc", export_format="xlsx", progress=None):
+    """
+    Экспортирует данные списка субъектов РФ в Excel, CSV или Parquet.
+    :param export_format: Формат выгрузки: xlsx, csv или parquet.
+    :param progress: Функция progress(выгружено строк, всего строк) для отчёта о ходе выгрузки.
+    :return: Временный файл, генератор частей файла (csv) или None, если данных для экспорта нет.
+    """
+    log_to_db(user, "Начата выгрузка таблицы субъектов РФ из базы данных")
+    log_to_db(user, "Параметры экспорта", f"res_filter={res_filter, oes_filter}, sort_by={sort_by}, sort_dir={sort_dir}, format={export_format}")
 
-    # Подготовка данных к записи в Excel
-    df = pd.DataFrame(data)
-    output = BytesIO()
+    rows = stream_query(get_res_export_rows(res_filter, oes_filter, sort_by, sort_dir))
 
     try:
-        with pd.ExcelWriter(output, engine="xlsxwriter") as writer:
-            df.to_excel(writer, index=False, sheet_name="Региональные энергосистемы")
+        # Строки результата выгружаются по мере чтения курсора, без промежуточного DataFrame
+        output = export_rows(
+            (
+                (idx, name, oes_name or "Не указан", region_names or "Не указан")
+                for idx, (name, oes_name, region_names) in enumerate(rows, start=1)
+            ),
+            ["Порядковый номер", "Региональная энергосистема", "ОЭС", "Субъекты РФ"],
+            "Региональные энергосистемы",
+            export_format,
+            on_complete=lambda count: log_to_db(user, "Экспорт таблицы субъектов РФ завершён", f"Экспортировано записей: {count}"),
+            progress=progress
+        )
+    except ValueError:
+        raise
     except Exception as e:
-        log_to_db(user, "Ошибка создания Excel-файла", str(e))
-        raise ValueError("Ошибка при создании Excel-файла.")
+        log_to_db(user, "Ошибка создания файла экспорта", str(e))
+        raise ValueError("Ошибка при создании файла экспорта.")
 
-    output.seek(0)
-    log_to_db(user, "Экспорт таблицы субъектов РФ в Excel завершён", f"Экспортировано записей: {len(data)}")
+    if output is None:
+        log_to_db(user, "Экспорт завершён", "Нет данных для экспорта.")
     return output
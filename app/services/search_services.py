@@ -0,0 +1,160 @@
+import threading
+import time
+from collections import defaultdict
+
+from sqlalchemy import and_, or_, select
+
+from app import db
+from app.services.cache_services import reference_cache
+
+
+def trigrams(value):
+    """Возвращает множество триграмм строки без учёта регистра."""
+    value = (value or "").lower()
+    return {value[i:i + 3] for i in range(len(value) - 2)}
+
+
+class TrigramIndex:
+    """In-memory триграммный индекс одного текстового столбца: триграмма -> множество ID записей."""
+
+    def __init__(self, version):
+        self.version = version
+        self.built_at = time.monotonic()
+        self.max_id = 0
+        self.rows = 0
+        self.grams = defaultdict(set)
+        self.lock = threading.Lock()
+
+    def add(self, row_id, value):
+        for gram in trigrams(value):
+            self.grams[gram].add(row_id)
+        self.max_id = max(self.max_id, row_id)
+        self.rows += 1
+
+    def candidates(self, text):
+        """ID записей, содержащих все триграммы строки; надмножество записей, содержащих строку."""
+        sets = sorted((self.grams.get(gram, set()) for gram in trigrams(text)), key=len)
+        return set.intersection(*sets) if sets else set()
+
+
+class SearchIndex:
+    """
+    Поиск подстроки в текстовых столбцах (фильтры по наименованию и действию журнала).
+    Индекс только сужает набор строк-кандидатов, а окончательная проверка выполняется тем же ILIKE.
+    - fulltext: MySQL FULLTEXT-индекс с парсером ngram (MATCH ... AGAINST в режиме фразы),
+      если такой индекс объявлен у столбца в модели; результат совпадает с column.ilike('%текст%');
+    - trigram: триграммный индекс в памяти процесса, только по явной настройке SEARCH_BACKEND=trigram;
+      перестраивается при изменении версии таблицы в кэше справочников этого процесса или по истечении
+      REFERENCE_CACHE_TTL, поэтому изменения из других процессов, команд flask и прямых SQL-запросов
+      до перестроения могут не находиться — подходит только для развёртывания в одном процессе;
+    - like: без индекса.
+    auto выбирает fulltext на MySQL и like на остальных СУБД.
+    Короткие строки, строки с символами шаблона LIKE (% и _) и столбцы псевдонимов модели (aliased)
+    всегда ищутся обычным ILIKE.
+    """
+
+    def __init__(self, backend="auto", max_candidates=5000, max_rows=200000, ngram_token_size=2, ttl=300):
+        self.backend = backend
+        self.max_candidates = max_candidates
+        self.max_rows = max_rows
+        self.ngram_token_size = ngram_token_size
+        self.ttl = ttl
+        self._indexes = {}
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        """Читает настройки поиска из конфигурации приложения."""
+        self.backend = app.config.get('SEARCH_BACKEND', self.backend)
+        self.max_candidates = app.config.get('SEARCH_MAX_CANDIDATES', self.max_candidates)
+        self.max_rows = app.config.get('SEARCH_TRIGRAM_MAX_ROWS', self.max_rows)
+        self.ngram_token_size = app.config.get('SEARCH_NGRAM_TOKEN_SIZE', self.ngram_token_size)
+        self.ttl = app.config.get('REFERENCE_CACHE_TTL', self.ttl)
+        app.extensions['search_index'] = self
+
+    def contains(self, column, text, append_only=False):
+        """
+        Возвращает условие «столбец содержит подстроку text» без учёта регистра.
+        :param column: Атрибут модели (например, Res.name); у модели должен быть первичный ключ id.
+        :param append_only: Таблица только пополняется (журнал): триграммный индекс дополняется новыми строками
+                            и не перестраивается по TTL.
+        """
+        like = column.ilike(f"%{text}%")
+        if "%" in text or "_" in text or column.parent.is_aliased_class:
+            return like
+
+        backend = self._backend()
+        if backend == "fulltext" and len(text) >= self.ngram_token_size and '"' not in text and self._has_fulltext(column):
+            # Фраза в режиме BOOLEAN MODE: строки, содержащие все n-граммы подряд
+            return and_(column.match(f'"{text}"'), like)
+
+        if backend == "trigram" and len(text) >= 3:
+            found = self._candidates(column, text, append_only)
+            if found is not None:
+                ids, max_id = found
+                model_id = column.class_.id
+                # Строки, добавленные после построения индекса, проверяются напрямую
+                return and_(or_(model_id.in_(ids), model_id > max_id), like)
+
+        return like
+
+    def invalidate(self, *tables):
+        """Сбрасывает триграммные индексы таблиц (например, после удаления строк журнала)."""
+        with self._lock:
+            for key in [key for key in self._indexes if key[0] in tables]:
+                del self._indexes[key]
+
+    @staticmethod
+    def _has_fulltext(column):
+        return any(
+            index.dialect_options['mysql'].get('prefix') == 'FULLTEXT' and [c.name for c in index.columns] == [column.key]
+            for index in column.class_.__table__.indexes
+        )
+
+    def _backend(self):
+        if self.backend != "auto":
+            return self.backend
+        return "fulltext" if db.engine.dialect.name == "mysql" else "like"
+
+    def _candidates(self, column, text, append_only):
+        """Возвращает (ID кандидатов, максимальный проиндексированный ID) или None, если индекс не помогает."""
+        model = column.class_
+        table = model.__tablename__
+        key = (table, column.key)
+        version = reference_cache.version(table)
+
+        with self._lock:
+            index = self._indexes.get(key)
+            expired = index is None or index.version != version or (
+                not append_only and time.monotonic() - index.built_at > self.ttl
+            )
+            if expired:
+                index = self._indexes[key] = TrigramIndex(version)
+
+        with index.lock:
+            if expired and db.session.query(model.id).count() > self.max_rows:
+                index.rows = self.max_rows + 1
+            if index.rows > self.max_rows:
+                return None
+
+            # Дополнение индекса строками, добавленными после последнего обращения
+            rows = db.session.execute(
+                select(model.id, column).where(model.id > index.max_id).order_by(model.id)
+                .execution_options(yield_per=10000)
+            )
+            for row_id, value in rows:
+                index.add(row_id, value)
+
+            ids = index.candidates(text)
+            max_id = index.max_id
+
+        if len(ids) > self.max_candidates:
+            return None
+        return ids, max_id
+
+
+search_index = SearchIndex()
+
+
+def contains_filter(column, text, append_only=False):
+    """Условие поиска подстроки text в столбце column (см. SearchIndex.contains)."""
+    return search_index.contains(column, text, append_only)
@@ -0,0 +1,81 @@
+"""
+Общие функции замеров производительности.
+Замеры запускаются из корня репозитория как модули, например: python -m benchmarks.export_formats
+По умолчанию используется временная база SQLite; BENCHMARK_DATABASE_URI позволяет замерить на MySQL
+(таблицы справочников и РЭС в этой базе будут очищены).
+"""
+import atexit
+import os
+import tempfile
+import time
+from contextlib import contextmanager
+
+
+def create_benchmark_app(**settings):
+    """
+    Создаёт приложение на отдельной базе данных. Настройки задаются переменными окружения до импорта config.
+    :param settings: Дополнительные параметры конфигурации (например, PASSWORD_WORKERS=4).
+    """
+    database_uri = os.getenv('BENCHMARK_DATABASE_URI')
+    if database_uri is None:
+        database = tempfile.NamedTemporaryFile(suffix=".db", delete=False)
+        database.close()
+        atexit.register(os.unlink, database.name)
+        database_uri = f"sqlite:///{database.name}"
+    os.environ['SQLALCHEMY_DATABASE_URI'] = database_uri
+    os.environ['AUDIT_LOG_ASYNC'] = 'False'
+    os.environ.setdefault('UPLOAD_FOLDER', tempfile.mkdtemp())
+    for name, value in settings.items():
+        os.environ[name] = str(value)
+
+    from app import create_app
+    return create_app()
+
+
+def seed_res(rows, regions_per_res=3):
+    """
+    Заполняет справочники и таблицу РЭС: 8 ФО, 89 субъектов РФ, 7 ОЭС, rows РЭС по regions_per_res субъекта РФ.
+    Существующие данные этих таблиц удаляются.
+    """
+    from sqlalchemy import delete, insert
+
+    from app import db
+    from app.models.fo_models import Fo
+    from app.models.oes_models import Oes, OesType
+    from app.models.region_models import Region
+    from app.models.res_models import Res, ResRegion
+    from app.services.cache_services import reference_cache
+
+    for model in (ResRegion, Res, Oes, OesType, Region, Fo):
+        db.session.execute(delete(model))
+    db.session.execute(insert(OesType), [{"id": 1, "name": "ЕЭС России"}])
+    db.session.execute(insert(Fo), [{"id": i, "name": f"ФО {i}"} for i in range(1, 9)])
+    db.session.execute(insert(Region), [{"id": i, "name": f"Субъект РФ {i}", "id_fo": i % 8 + 1} for i in range(1, 90)])
+    db.session.execute(insert(Oes), [{"id": i, "name": f"ОЭС {i}", "id_oes_type": 1} for i in range(1, 8)])
+    for start in range(1, rows + 1, 10000):
+        ids = range(start, min(start + 10000, rows + 1))
+        db.session.execute(insert(Res), [{"id": i, "name": f"РЭС {i}", "id_oes": i % 7 + 1} for i in ids])
+        db.session.execute(insert(ResRegion), [
+            {"id_res": i, "id_region": (i * regions_per_res + shift) % 89 + 1} for i in ids for shift in range(regions_per_res)
+        ])
+    db.session.commit()
+    reference_cache.clear()
+
+
+@contextmanager
+def timer():
+    """Замеряет время выполнения блока; результат в секундах доступен как элемент [0] после выхода из блока."""
+    elapsed = [0.0]
+    start = time.perf_counter()
+    try:
+        yield elapsed
+    finally:
+        elapsed[0] = time.perf_counter() - start
+
+
+def print_table(headers, rows):
+    """Печатает результаты замеров таблицей с выравниванием по ширине столбцов."""
+    rows = [[str(value) for value in row] for row in rows]
+    widths = [max(len(value) for value in column) for column in zip(headers, *rows)]
+    for row in [headers, ["-" * width for width in widths], *rows]:
+        print("  ".join(value.ljust(width) for value, width in zip(row, widths)))
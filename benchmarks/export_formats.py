@@ -0,0 +1,52 @@
+"""
+Замер выгрузки таблицы РЭС в форматах xlsx, csv и parquet на сгенерированных данных.
+Замеряется полный путь экспорта: агрегирующий запрос, серверный курсор и запись файла.
+
+    python -m benchmarks.export_formats --rows 100000 --repeat 3
+"""
+import argparse
+
+from benchmarks.common import create_benchmark_app, print_table, seed_res, timer
+
+
+def drain(data):
+    """Дочитывает результат экспорта до конца и возвращает размер файла в байтах."""
+    if hasattr(data, "read"):
+        with data:
+            size = 0
+            while chunk := data.read(1024 * 1024):
+                size += len(chunk)
+            return size
+    # CSV выгружается генератором частей файла
+    return sum(len(part) for part in data)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=100000, help="Количество РЭС в сгенерированной таблице.")
+    parser.add_argument("--repeat", type=int, default=3, help="Количество повторов; учитывается лучшее время.")
+    parser.add_argument("--formats", nargs="+", default=["xlsx", "csv", "parquet"], help="Форматы выгрузки.")
+    args = parser.parse_args()
+
+    app = create_benchmark_app()
+    with app.test_request_context():
+        from app.services.res_services import export_res_to_excel
+
+        seed_res(args.rows)
+        results = []
+        for export_format in args.formats:
+            timings = []
+            for _ in range(args.repeat):
+                with timer() as elapsed:
+                    size = drain(export_res_to_excel("benchmark", export_format=export_format))
+                timings.append(elapsed[0])
+            best = min(timings)
+            results.append([
+                export_format, args.rows, f"{best:.2f}", f"{args.rows / best:,.0f}", f"{size / 1024 / 1024:.1f}"
+            ])
+
+    print_table(["Формат", "Строк", "Время, с", "Строк/с", "Размер, МБ"], results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""
+Замер чтения Excel-файлов импорта на таблице РЭС.
+Книга собирается из uploads/res.xlsx: наименования повторяются с порядковым номером до нужного числа строк,
+ОЭС берутся из app/data_initial/oes.xlsx. Сравниваются:
+- read_excel + iterrows — прежнее построчное чтение всего листа;
+- read_import_rows — чтение нужных столбцов без определения типов и векторная нормализация;
+- iter_import_chunks — потоковое чтение частями (для файлов больше IMPORT_STREAMING_THRESHOLD);
+- с --import также полный import_res_from_excel в базу данных.
+
+    python -m benchmarks.ingestion --rows 100000 --repeat 3
+"""
+import argparse
+import os
+import tempfile
+
+import pandas as pd
+
+from benchmarks.common import create_benchmark_app, print_table, timer
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+COLUMNS = {"name": str, "id_oes": int}
+
+
+def build_workbook(rows, path):
+    """Записывает книгу РЭС из rows строк (id, name, id_oes) на основе данных из uploads и app/data_initial."""
+    res = pd.read_excel(os.path.join(ROOT, "uploads", "res.xlsx"))
+    oes_ids = pd.read_excel(os.path.join(ROOT, "app", "data_initial", "oes.xlsx"))["id"].tolist()
+    names = res["name"].tolist()
+    pd.DataFrame({
+        "id": range(1, rows + 1),
+        "name": [f"{names[i % len(names)]} {i // len(names) + 1}" for i in range(rows)],
+        "id_oes": [oes_ids[i % len(oes_ids)] for i in range(rows)],
+    }).to_excel(path, index=False, engine="xlsxwriter")
+
+
+def read_iterrows(path):
+    """Прежний способ: весь лист с определением типов и построчный обход DataFrame."""
+    data = pd.read_excel(path)
+    data.columns = data.columns.str.strip()
+    return [
+        (str(row["name"]).strip(), None if pd.isna(row["id_oes"]) else int(row["id_oes"]))
+        for _, row in data.iterrows()
+    ]
+
+
+def read_chunks(path):
+    from app.services.import_services import iter_import_chunks
+
+    return [row for rows, _, _ in iter_import_chunks(path, COLUMNS, required=["name"], unique=["name"]) for row in rows]
+
+
+def seed_oes():
+    """Загружает типы ОЭС и ОЭС из app/data_initial с исходными ID и очищает таблицу РЭС."""
+    from sqlalchemy import delete, insert
+
+    from app import db
+    from app.models.oes_models import Oes, OesType
+    from app.models.res_models import Res, ResRegion
+
+    for model in (ResRegion, Res, Oes, OesType):
+        db.session.execute(delete(model))
+    for model, filename in ((OesType, "oes_type.xlsx"), (Oes, "oes.xlsx")):
+        data = pd.read_excel(os.path.join(ROOT, "app", "data_initial", filename))
+        db.session.execute(insert(model), data.to_dict("records"))
+    db.session.commit()
+
+
+def clear_res():
+    from sqlalchemy import delete
+
+    from app import db
+    from app.models.res_models import Res, ResRegion
+
+    db.session.execute(delete(ResRegion))
+    db.session.execute(delete(Res))
+    db.session.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=100000, help="Количество строк в книге РЭС.")
+    parser.add_argument("--repeat", type=int, default=3, help="Количество повторов; учитывается лучшее время.")
+    parser.add_argument("--import", dest="with_import", action="store_true",
+                        help="Замерить также полный импорт в базу данных (import_res_from_excel).")
+    args = parser.parse_args()
+
+    app = create_benchmark_app()
+    with app.test_request_context(), tempfile.TemporaryDirectory() as folder:
+        from app.services.import_services import read_import_rows
+        from app.services.res_services import import_res_from_excel
+
+        path = os.path.join(folder, "res.xlsx")
+        build_workbook(args.rows, path)
+
+        stages = [
+            ("read_excel + iterrows", lambda: read_iterrows(path)),
+            ("read_import_rows", lambda: read_import_rows(path, COLUMNS, required=["name"], unique=["name"])),
+            ("iter_import_chunks", lambda: read_chunks(path)),
+        ]
+        if args.with_import:
+            seed_oes()
+            stages.append(("import_res_from_excel", lambda: import_res_from_excel(path, "benchmark")))
+
+        results = []
+        for name, stage in stages:
+            timings = []
+            for _ in range(args.repeat):
+                if name == "import_res_from_excel":
+                    clear_res()
+                with timer() as elapsed:
+                    stage()
+                timings.append(elapsed[0])
+            best = min(timings)
+            results.append([name, args.rows, f"{best:.2f}", f"{args.rows / best:,.0f}"])
+
+    print_table(["Этап", "Строк", "Время, с", "Строк/с"], results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""
+Нагрузочный замер проверки паролей: одновременные вызовы PasswordHasher.verify или запросы POST /auth/login.
+Показывает пропускную способность и число отклонённых проверок при заданных PASSWORD_WORKERS
+и PASSWORD_MAX_PENDING (по умолчанию — из конфигурации и переменных окружения).
+
+    python -m benchmarks.password_hashing --mode verify --clients 64 --requests 256
+    python -m benchmarks.password_hashing --mode login --clients 64 --workers 2 --max-pending 8 --timeout 1
+"""
+import argparse
+import statistics
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.common import create_benchmark_app, print_table, timer
+
+EMAIL = "benchmark@example.com"
+PASSWORD = "benchmark-password"
+OVERLOAD_MESSAGE = "Сервер перегружен"
+
+
+def verify_call(hasher, password_hash):
+    """Одна проверка пароля; возвращает True, если проверка выполнена, и False, если она отклонена."""
+    def call():
+        try:
+            assert hasher.verify(password_hash, PASSWORD)
+            return True
+        except ValueError:
+            return False
+    return call
+
+
+def login_call(app):
+    """Один запрос входа отдельным тестовым клиентом; отклонённым считается ответ с сообщением о перегрузке."""
+    def call():
+        with app.test_client() as client:
+            response = client.post("/auth/login", data={"email": EMAIL, "password": PASSWORD})
+        if response.status_code == 302:
+            return True
+        if OVERLOAD_MESSAGE in response.get_data(as_text=True):
+            return False
+        raise AssertionError(f"Неожиданный ответ на вход: {response.status_code}")
+    return call
+
+
+def create_user(app):
+    """Создаёт пользователя для замера и возвращает хэш его пароля."""
+    from app import db
+    from app.models.auth_models import User
+
+    with app.app_context():
+        User.query.filter_by(email=EMAIL).delete()
+        user = User(username="benchmark", email=EMAIL)
+        user.set_password(PASSWORD)
+        db.session.add(user)
+        db.session.commit()
+        return user.password_hash
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mode", choices=["verify", "login"], default="verify",
+                        help="verify — прямые вызовы PasswordHasher.verify, login — запросы POST /auth/login.")
+    parser.add_argument("--clients", type=int, default=64, help="Количество одновременных клиентов.")
+    parser.add_argument("--requests", type=int, default=None, help="Всего проверок (по умолчанию 4 на клиента).")
+    parser.add_argument("--workers", type=int, help="PASSWORD_WORKERS.")
+    parser.add_argument("--max-pending", type=int, help="PASSWORD_MAX_PENDING.")
+    parser.add_argument("--timeout", type=float, help="PASSWORD_TIMEOUT в секундах.")
+    parser.add_argument("--scheme", choices=["werkzeug", "bcrypt"], help="PASSWORD_HASH_SCHEME.")
+    args = parser.parse_args()
+
+    settings = {
+        name: value for name, value in (
+            ("PASSWORD_WORKERS", args.workers),
+            ("PASSWORD_MAX_PENDING", args.max_pending),
+            ("PASSWORD_TIMEOUT", args.timeout),
+            ("PASSWORD_HASH_SCHEME", args.scheme),
+        ) if value is not None
+    }
+    # Журнал пишется фоновым потоком, как в рабочем режиме, чтобы записи журнала не конкурировали со входами
+    app = create_benchmark_app(AUDIT_LOG_ASYNC=True, **settings)
+    from app.services.auth_services import password_hasher
+
+    password_hash = create_user(app)
+    call = verify_call(password_hasher, password_hash) if args.mode == "verify" else login_call(app)
+    total = args.requests or args.clients * 4
+
+    latencies = []
+    accepted = []
+
+    def measured():
+        with timer() as elapsed:
+            result = call()
+        latencies.append(elapsed[0])
+        accepted.append(result)
+
+    with timer() as elapsed, ThreadPoolExecutor(max_workers=args.clients) as executor:
+        for future in [executor.submit(measured) for _ in range(total)]:
+            future.result()
+    password_hasher.shutdown()
+
+    done = sum(accepted)
+    quantiles = statistics.quantiles(latencies, n=20)
+    print(f"Схема: {password_hasher.scheme} "
+          f"({password_hasher.werkzeug_method if password_hasher.scheme == 'werkzeug' else f'{password_hasher.bcrypt_rounds} раундов'}), "
+          f"PASSWORD_WORKERS={password_hasher.workers}, PASSWORD_MAX_PENDING={password_hasher.max_pending}, "
+          f"PASSWORD_TIMEOUT={password_hasher.timeout}")
+    print_table(
+        ["Режим", "Клиентов", "Запросов", "Выполнено", "Отклонено", "Время, с", "Проверок/с", "p50, с", "p95, с"],
+        [[args.mode, args.clients, total, done, total - done, f"{elapsed[0]:.2f}", f"{done / elapsed[0]:.1f}",
+          f"{statistics.median(latencies):.3f}", f"{quantiles[18]:.3f}"]],
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -11,4 +11,67 @@ class Config:
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     UPLOAD_FOLDER = os.getenv('UPLOAD_FOLDER', 'uploads')
     ALLOWED_EXTENSIONS = set(os.getenv('ALLOWED_EXTENSIONS', '').split(','))
-    DEBUG = os.getenv('DEBUG', 'False').lower() in ['true', '1']
\ No newline at end of file
+    DEBUG = os.getenv('DEBUG', 'False').lower() in ['true', '1']
+
+    # Параметры пакетной записи журнала действий пользователей
+    AUDIT_LOG_ASYNC = os.getenv('AUDIT_LOG_ASYNC', 'True').lower() in ['true', '1']
+    AUDIT_LOG_BATCH_SIZE = int(os.getenv('AUDIT_LOG_BATCH_SIZE', 100))  # Максимум записей в одном INSERT
+    AUDIT_LOG_FLUSH_INTERVAL_MS = int(os.getenv('AUDIT_LOG_FLUSH_INTERVAL_MS', 500))  # Максимальная задержка записи
+    # Политики записи событий по префиксу действия: always, sample:<доля> или coalesce (счётчик за минуту)
+    AUDIT_LOG_POLICIES = os.getenv(
+        'AUDIT_LOG_POLICIES',
+        'Открыта страница=coalesce;'
+        'Попытка входа на страницу авторизации=coalesce;'
+        'Попытка регистрации нового пользователя=coalesce;'
+        'Попытка входа с email=sample:0.1'
+    )
+
+    # Хранение журнала по месяцам: число хранимых месяцев (включая текущий), партиции MySQL на месяцы вперёд,
+    # каталог архивов удалённых месяцев и период просмотра журнала по умолчанию в днях
+    LOG_RETENTION_MONTHS = int(os.getenv('LOG_RETENTION_MONTHS', 12))
+    LOG_PARTITIONS_AHEAD = int(os.getenv('LOG_PARTITIONS_AHEAD', 2))
+    LOG_ARCHIVE_FOLDER = os.getenv('LOG_ARCHIVE_FOLDER', os.path.join(UPLOAD_FOLDER, 'log_archive'))
+    LOG_VIEW_DAYS = int(os.getenv('LOG_VIEW_DAYS', 31))
+
+    # Время жизни кэша справочников (ФО, субъекты РФ, ОЭС, типы ОЭС) в секундах
+    REFERENCE_CACHE_TTL = int(os.getenv('REFERENCE_CACHE_TTL', 300))
+
+    # Параметры потоковой выгрузки в Excel
+    EXPORT_YIELD_PER = int(os.getenv('EXPORT_YIELD_PER', 1000))  # Размер порции строк из серверного курсора
+    EXPORT_SPOOL_MAX_SIZE = int(os.getenv('EXPORT_SPOOL_MAX_SIZE', 8 * 1024 * 1024))  # Порог сброса файла на диск
+
+    # Размер пакета строк в INSERT/DELETE при импорте
+    IMPORT_BATCH_SIZE = int(os.getenv('IMPORT_BATCH_SIZE', 1000))
+    # Потоковый импорт больших xlsx-файлов: порог размера файла в байтах и число строк в одной транзакции
+    IMPORT_STREAMING_THRESHOLD = int(os.getenv('IMPORT_STREAMING_THRESHOLD', 10 * 1024 * 1024))
+    IMPORT_CHUNK_SIZE = int(os.getenv('IMPORT_CHUNK_SIZE', 5000))
+
+    # Фоновые задания импорта и экспорта: число потоков и каталог файлов заданий
+    JOB_WORKERS = int(os.getenv('JOB_WORKERS', 2))
+    JOB_FOLDER = os.getenv('JOB_FOLDER', os.path.join(UPLOAD_FOLDER, 'jobs'))
+    # Срок хранения файлов результатов экспорта в часах; после него файл удаляется, задание остаётся в списке
+    JOB_RETENTION_HOURS = int(os.getenv('JOB_RETENTION_HOURS', 24))
+
+    # Режим пагинации списков по умолчанию: offset (номера страниц, COUNT(*) + OFFSET) или keyset (по курсору)
+    PAGINATION_MODE = os.getenv('PAGINATION_MODE', 'offset')
+
+    # Поиск по наименованиям: auto (FULLTEXT ngram на MySQL, ILIKE на остальных СУБД), fulltext, like или trigram
+    # (индекс в памяти процесса, только для работы в одном процессе); индекс не используется,
+    # если кандидатов больше SEARCH_MAX_CANDIDATES
+    SEARCH_BACKEND = os.getenv('SEARCH_BACKEND', 'auto')
+    SEARCH_MAX_CANDIDATES = int(os.getenv('SEARCH_MAX_CANDIDATES', 5000))
+    SEARCH_TRIGRAM_MAX_ROWS = int(os.getenv('SEARCH_TRIGRAM_MAX_ROWS', 200000))  # Максимум строк таблицы для индекса в памяти
+    SEARCH_NGRAM_TOKEN_SIZE = int(os.getenv('SEARCH_NGRAM_TOKEN_SIZE', 2))  # Значение ngram_token_size сервера MySQL
+
+    # Кэш пользователей для загрузки текущего пользователя: число записей и время жизни в секундах
+    USER_CACHE_SIZE = int(os.getenv('USER_CACHE_SIZE', 1024))
+    USER_CACHE_TTL = int(os.getenv('USER_CACHE_TTL', 60))
+
+    # Хэширование паролей: схема bcrypt или werkzeug и её стоимость; хэши по старой политике пересчитываются при входе
+    PASSWORD_HASH_SCHEME = os.getenv('PASSWORD_HASH_SCHEME', 'werkzeug')
+    PASSWORD_BCRYPT_ROUNDS = int(os.getenv('PASSWORD_BCRYPT_ROUNDS', 12))
+    PASSWORD_WERKZEUG_METHOD = os.getenv('PASSWORD_WERKZEUG_METHOD', 'scrypt')  # Например, scrypt или pbkdf2:sha256:600000
+    # Пул вычисления хэшей: число потоков, максимум ожидающих запросов и время ожидания места в секундах
+    PASSWORD_WORKERS = int(os.getenv('PASSWORD_WORKERS', 4))
+    PASSWORD_MAX_PENDING = int(os.getenv('PASSWORD_MAX_PENDING', 32))
+    PASSWORD_TIMEOUT = float(os.getenv('PASSWORD_TIMEOUT', 10))
@@ -0,0 +1,68 @@
+"""Секционирование журнала по месяцам
+
+Revision ID: be7db5486cb8
+Revises: eed9912609ff
+Create Date: 2026-10-18 14:20:00.000000
+
+Только MySQL: таблица log секционируется RANGE COLUMNS(timestamp) по месяцам, начиная с месяца первой записи.
+Столбец секционирования должен входить в первичный ключ, поэтому ключ становится (id, timestamp);
+FULLTEXT-индекс по действию удаляется — секционированные таблицы его не поддерживают.
+На остальных СУБД журнал по месяцам ведёт команда "flask logs maintain" (см. log_retention_services).
+"""
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'be7db5486cb8'
+down_revision = 'eed9912609ff'
+branch_labels = None
+depends_on = None
+
+
+# Число месяцев вперёд, для которых партиции создаются сразу
+MONTHS_AHEAD = 2
+
+
+def _add_months(month, months):
+    index = month.year * 12 + month.month - 1 + months
+    return month.replace(year=index // 12, month=index % 12 + 1)
+
+
+def _month_start(value):
+    return value.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def upgrade():
+    bind = op.get_bind()
+    if bind.dialect.name != 'mysql':
+        return
+
+    inspector = sa.inspect(bind)
+    if any(index['name'] == 'ft_log_action' for index in inspector.get_indexes('log')):
+        op.drop_index('ft_log_action', table_name='log')
+    if 'timestamp' not in inspector.get_pk_constraint('log')['constrained_columns']:
+        op.execute("ALTER TABLE log DROP PRIMARY KEY, ADD PRIMARY KEY (id, timestamp)")
+
+    current = _month_start(datetime.utcnow())
+    first = bind.execute(sa.text("SELECT MIN(timestamp) FROM log")).scalar()
+    month = _month_start(first) if first else current
+    definitions = []
+    while month <= _add_months(current, MONTHS_AHEAD):
+        definitions.append(f"PARTITION p{month:%Y%m} VALUES LESS THAN ('{_add_months(month, 1):%Y-%m-%d}')")
+        month = _add_months(month, 1)
+    definitions.append("PARTITION pmax VALUES LESS THAN (MAXVALUE)")
+    op.execute(f"ALTER TABLE log PARTITION BY RANGE COLUMNS(timestamp) ({', '.join(definitions)})")
+
+
+def downgrade():
+    bind = op.get_bind()
+    if bind.dialect.name != 'mysql':
+        return
+
+    op.execute("ALTER TABLE log REMOVE PARTITIONING")
+    op.execute("ALTER TABLE log DROP PRIMARY KEY, ADD PRIMARY KEY (id)")
+    op.execute("SET SESSION innodb_ft_enable_stopword = OFF")
+    op.create_index('ft_log_action', 'log', ['action'], mysql_prefix='FULLTEXT', mysql_with_parser='ngram')
@@ -0,0 +1,78 @@
+"""Индексы внешних ключей, журнала и поиска по наименованиям
+
+Revision ID: eed9912609ff
+Revises:
+Create Date: 2026-10-18 11:05:00.000000
+
+Первая миграция накладывается на схему, созданную app/db_scripts/tables.sql или db.create_all(),
+поэтому индекс создаётся только если в таблице ещё нет индекса с тем же именем или с тем же первым столбцом
+(MySQL сам создаёт индексы для внешних ключей).
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'eed9912609ff'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+# Индексы столбцов сортировки и фильтрации списков и журнала: (имя, таблица, столбец)
+INDEXES = [
+    ('ix_log_timestamp', 'log', 'timestamp'),
+    ('ix_log_username', 'log', 'username'),
+    ('ix_res_id_oes', 'res', 'id_oes'),
+    ('ix_res_region_id_res', 'res_region', 'id_res'),
+    ('ix_res_region_id_region', 'res_region', 'id_region'),
+    ('ix_region_id_fo', 'region', 'id_fo'),
+]
+
+# Полнотекстовые индексы ngram для поиска по наименованиям (только MySQL, см. search_services)
+FULLTEXT_INDEXES = [
+    ('ft_fo_name', 'fo', 'name'),
+    ('ft_region_name', 'region', 'name'),
+    ('ft_oes_name', 'oes', 'name'),
+    ('ft_res_name', 'res', 'name'),
+    ('ft_log_action', 'log', 'action'),
+]
+
+
+def _existing_indexes(table):
+    """Возвращает список (имя, столбцы) индексов и ограничений уникальности таблицы."""
+    inspector = sa.inspect(op.get_bind())
+    indexes = [(index['name'], index['column_names']) for index in inspector.get_indexes(table)]
+    indexes += [(constraint['name'], constraint['column_names']) for constraint in inspector.get_unique_constraints(table)]
+    return indexes
+
+
+def upgrade():
+    mysql = op.get_bind().dialect.name == 'mysql'
+
+    for name, table, column in INDEXES:
+        existing = _existing_indexes(table)
+        if any(index_name == name or (columns and columns[0] == column) for index_name, columns in existing):
+            continue
+        op.create_index(name, table, [column])
+
+    # Уникальность связей РЭС и субъектов РФ: сначала удаляются повторяющиеся связи
+    if not any(name == 'uq_res_region' for name, _ in _existing_indexes('res_region')):
+        op.execute(
+            "DELETE FROM res_region WHERE id NOT IN ("
+            "SELECT id FROM (SELECT MIN(id) AS id FROM res_region GROUP BY id_res, id_region) AS keep_links)"
+        )
+        op.create_index('uq_res_region', 'res_region', ['id_res', 'id_region'], unique=True)
+
+    if mysql:
+        # Без стоп-слов, иначе совпадающие с ними n-граммы не попадают в индекс
+        op.execute("SET SESSION innodb_ft_enable_stopword = OFF")
+        for name, table, column in FULLTEXT_INDEXES:
+            if not any(index_name == name for index_name, _ in _existing_indexes(table)):
+                op.create_index(name, table, [column], mysql_prefix='FULLTEXT', mysql_with_parser='ngram')
+
+
+def downgrade():
+    for name, table, _ in FULLTEXT_INDEXES + INDEXES + [('uq_res_region', 'res_region', None)]:
+        if any(index_name == name for index_name, _ in _existing_indexes(table)):
+            op.drop_index(name, table_name=table)
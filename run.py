@@ -1,9 +1,6 @@
 from app import create_app
-# from flask_migrate import Migrate
-# from app import db
 
 app = create_app()
-# migrate = Migrate(app, db)
 
 if __name__ == "__main__":
     app.run(debug=True)
\ No newline at end of file
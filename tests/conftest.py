@@ -0,0 +1,127 @@
+import os
+import re
+import tempfile
+from contextlib import contextmanager
+
+import pytest
+from sqlalchemy import event, insert, text
+
+# Настройки задаются до импорта config: по умолчанию тесты работают с временной базой SQLite,
+# TEST_DATABASE_URI позволяет запустить их на MySQL
+_database = tempfile.NamedTemporaryFile(suffix=".db", delete=False)
+_database.close()
+os.environ['SQLALCHEMY_DATABASE_URI'] = os.getenv('TEST_DATABASE_URI', f"sqlite:///{_database.name}")
+os.environ['AUDIT_LOG_ASYNC'] = 'False'
+os.environ['UPLOAD_FOLDER'] = tempfile.mkdtemp()
+
+from app import create_app, db  # noqa: E402
+from app.models.fo_models import Fo  # noqa: E402
+from app.models.oes_models import Oes, OesType  # noqa: E402
+from app.models.region_models import Region  # noqa: E402
+from app.models.res_models import Res, ResRegion  # noqa: E402
+from app.services.cache_services import reference_cache  # noqa: E402
+
+
+@pytest.fixture(scope="session")
+def app():
+    app = create_app()
+    app.config['TESTING'] = True
+    app.config['WTF_CSRF_ENABLED'] = False
+    with app.app_context():
+        if db.engine.dialect.name == "sqlite":
+            # Фоновые задания пишут ход выполнения, пока открыт курсор выгрузки: в режиме WAL чтение не блокирует запись
+            db.session.execute(text("PRAGMA journal_mode=WAL"))
+            db.session.commit()
+    yield app
+    with app.app_context():
+        db.session.remove()
+        db.drop_all()
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(_database.name + suffix):
+            os.unlink(_database.name + suffix)
+
+
+@pytest.fixture
+def app_context(app):
+    with app.test_request_context():
+        yield
+        db.session.rollback()
+
+
+@pytest.fixture
+def seeded(app_context):
+    """Справочники и РЭС со связями: 8 ФО, 80 субъектов РФ, 10 ОЭС, 200 РЭС по 3 субъекта РФ."""
+    db.session.execute(insert(OesType), [{"id": 1, "name": "ЕЭС России"}])
+    db.session.execute(insert(Fo), [{"id": i, "name": f"ФО {i}"} for i in range(1, 9)])
+    db.session.execute(insert(Region), [{"id": i, "name": f"Субъект {i}", "id_fo": i % 8 + 1} for i in range(1, 81)])
+    db.session.execute(insert(Oes), [{"id": i, "name": f"ОЭС {i}", "id_oes_type": 1} for i in range(1, 11)])
+    db.session.execute(insert(Res), [{"id": i, "name": f"РЭС {i}", "id_oes": i % 10 + 1} for i in range(1, 201)])
+    db.session.execute(insert(ResRegion), [
+        {"id_res": res_id, "id_region": (res_id * 3 + shift) % 80 + 1} for res_id in range(1, 201) for shift in range(3)
+    ])
+    db.session.commit()
+    reference_cache.clear()
+    yield
+    db.session.rollback()
+    for model in (ResRegion, Res, Oes, OesType, Region, Fo):
+        db.session.query(model).delete()
+    db.session.commit()
+    reference_cache.clear()
+
+
+@pytest.fixture
+def legacy_foreign_keys(app_context):
+    """
+    Пересоздаёт таблицы region, res и res_region с внешними ключами без ON DELETE, как в базах,
+    обновлённых миграциями с исходной схемы. После теста восстанавливаются таблицы db.create_all.
+    """
+    if db.engine.dialect.name != "sqlite":
+        pytest.skip("Схема с внешними ключами без ON DELETE воспроизводится только на SQLite")
+    tables = ("region", "res", "res_region")
+    original = {name: _rebuild_sqlite_table(name, lambda sql: re.sub(r" ON DELETE (SET NULL|CASCADE)", "", sql))
+                for name in tables}
+    yield
+    db.session.rollback()
+    for name in tables:
+        _rebuild_sqlite_table(name, lambda sql: original[name])
+
+
+def _rebuild_sqlite_table(name, transform):
+    """Пересоздаёт таблицу SQLite по изменённому transform тексту CREATE TABLE с сохранением данных и индексов."""
+    db.session.remove()
+    raw = db.engine.raw_connection()
+    try:
+        cursor = raw.cursor()
+        sql, = cursor.execute("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ?", (name,)).fetchone()
+        indexes = [row[0] for row in cursor.execute(
+            "SELECT sql FROM sqlite_master WHERE type = 'index' AND tbl_name = ? AND sql IS NOT NULL", (name,)
+        )]
+        # После ALTER TABLE ... RENAME SQLite хранит имя таблицы в кавычках
+        rebuilt = re.sub(rf'^CREATE TABLE "?{name}"?', f"CREATE TABLE {name}_rebuild", transform(sql), count=1)
+        raw.executescript(";\n".join([
+            "PRAGMA foreign_keys=OFF",
+            rebuilt,
+            f"INSERT INTO {name}_rebuild SELECT * FROM {name}",
+            f"DROP TABLE {name}",
+            f"ALTER TABLE {name}_rebuild RENAME TO {name}",
+            *indexes,
+            "PRAGMA foreign_keys=ON",
+        ]))
+    finally:
+        raw.close()
+    return sql
+
+
+@contextmanager
+def count_queries():
+    """Собирает SQL-запросы, выполненные внутри блока, в виде пар (текст запроса, параметры)."""
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append((statement, parameters))
+
+    event.listen(db.engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(db.engine, "before_cursor_execute", before_cursor_execute)
@@ -0,0 +1,13 @@
+from app.services import log_services
+from app.services.log_services import AuditLogWriter
+
+
+def test_init_app_registers_shutdown_hook_once(app, monkeypatch):
+    hooks = []
+    monkeypatch.setattr(log_services.atexit, "register", hooks.append)
+    writer = AuditLogWriter()
+
+    writer.init_app(app)
+    writer.init_app(app)
+
+    assert hooks == [writer.shutdown]
@@ -0,0 +1,68 @@
+import re
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import insert
+
+from app import db
+from app.models.log_models import Log
+from app.services.res_services import get_res_list
+from tests.conftest import count_queries
+
+
+def explain_indexes(statement, parameters):
+    """Возвращает текст плана запроса: EXPLAIN QUERY PLAN на SQLite, имена индексов из EXPLAIN на MySQL."""
+    connection = db.session.connection()
+    dialect = connection.dialect.name
+    if dialect == "sqlite":
+        rows = connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters).all()
+        return " | ".join(row[-1] for row in rows)
+    if dialect == "mysql":
+        rows = connection.exec_driver_sql(f"EXPLAIN {statement}", parameters).mappings().all()
+        return " | ".join(f"{row['table']}:{row['key']}" for row in rows)
+    pytest.skip(f"План запроса не проверяется для {dialect}")
+
+
+def find_query(statements, *fragments):
+    """Первый запрос, текст которого содержит все фрагменты."""
+    for statement, parameters in statements:
+        if all(fragment in statement for fragment in fragments):
+            return statement, parameters
+    raise AssertionError(f"Запрос с {fragments} не выполнялся: {[statement for statement, _ in statements]}")
+
+
+@pytest.fixture
+def logs(app_context):
+    now = datetime.utcnow()
+    db.session.execute(insert(Log), [
+        {"timestamp": now - timedelta(hours=i), "username": f"user{i % 7}", "action": f"Действие {i}"}
+        for i in range(2000)
+    ])
+    db.session.commit()
+    yield
+    db.session.query(Log).delete()
+    db.session.commit()
+
+
+def test_view_logs_ordering_uses_timestamp_index(app, logs):
+    with app.test_client() as client, count_queries() as statements:
+        assert client.get('/log/logs').status_code == 200
+    statement, parameters = find_query(statements, "FROM log", "ORDER BY log.timestamp DESC")
+    assert "ix_log_timestamp" in explain_indexes(statement, parameters)
+
+
+def test_res_list_oes_filter_uses_id_oes_index(seeded):
+    with count_queries() as statements:
+        get_res_list(1, 10, oes_filter=3, with_regions=True)
+    statement, parameters = find_query(statements, "FROM res", "res.id_oes =", "LIMIT")
+    assert "ix_res_id_oes" in explain_indexes(statement, parameters)
+
+
+def test_res_region_lookup_uses_id_res_index(seeded):
+    with count_queries() as statements:
+        get_res_list(1, 10, with_regions=True)
+    statement, parameters = find_query(statements, "FROM res_region", "res_region.id_res IN")
+    plan = explain_indexes(statement, parameters)
+    # Подходит любой индекс с первым столбцом id_res: ix_res_region_id_res или уникальный uq_res_region
+    # (db.create_all на SQLite создаёт его как sqlite_autoindex_res_region_N)
+    assert re.search(r"ix_res_region_id_res|uq_res_region|sqlite_autoindex_res_region_\d+ \(id_res=", plan), plan
@@ -0,0 +1,64 @@
+import os
+from datetime import datetime, timedelta
+
+import pandas as pd
+import pytest
+
+from app import db
+from app.models.job_models import Job
+from app.services.fo_services import import_fo_from_excel
+from app.services.job_services import job_runner, submit_export
+
+
+@pytest.fixture
+def jobs(app_context):
+    yield
+    job_runner.shutdown()
+    db.session.rollback()
+    for path, in db.session.query(Job.file_path).filter(Job.file_path.is_not(None)):
+        job_runner._remove_file(path)
+    db.session.query(Job).delete()
+    db.session.commit()
+
+
+@pytest.mark.parametrize("export_format", ["xlsx", "csv"])
+def test_export_job_reports_progress_and_total(app, seeded, jobs, export_format, monkeypatch):
+    monkeypatch.setitem(app.config, 'EXPORT_YIELD_PER', 50)
+    job_id = submit_export("res", "test", {}, export_format=export_format)
+    job_runner.shutdown()
+
+    db.session.expire_all()
+    job = db.session.get(Job, job_id)
+    assert job.status == 'done', job.result
+    assert (job.progress, job.total) == (200, 200)
+    assert os.path.exists(job.file_path)
+
+
+def test_import_reports_progress_when_not_streamed(seeded, tmp_path):
+    path = tmp_path / "fo.xlsx"
+    pd.DataFrame({"name": [f"ФО {i}" for i in range(1, 13)]}).to_excel(path, index=False)
+    calls = []
+    import_fo_from_excel(str(path), "test", progress=lambda processed, total=None: calls.append((processed, total)))
+    assert calls == [(12, 12)]
+
+
+def test_cleanup_removes_expired_export_files(jobs):
+    os.makedirs(job_runner.folder, exist_ok=True)
+    now = datetime.utcnow()
+    paths = {}
+    for name, finished_at in (("old", now - timedelta(hours=job_runner.retention_hours + 1)), ("new", now)):
+        paths[name] = os.path.join(job_runner.folder, f"job_{name}.csv")
+        open(paths[name], "wb").close()
+        db.session.add(Job(kind='export', target='fo', username='test', status='done',
+                           file_path=paths[name], filename=f"{name}.csv", finished_at=finished_at))
+    orphan = os.path.join(job_runner.folder, "job_orphan.csv")
+    open(orphan, "wb").close()
+    os.utime(orphan, (0, 0))
+    db.session.commit()
+
+    assert job_runner.cleanup() == 2
+
+    assert not os.path.exists(paths["old"]) and not os.path.exists(orphan)
+    assert os.path.exists(paths["new"])
+    db.session.expire_all()
+    assert {job.filename: job.file_path for job in Job.query} == {"old.csv": None, "new.csv": paths["new"]}
@@ -0,0 +1,65 @@
+import pandas as pd
+import pytest
+
+from app import db
+from app.models.oes_models import Oes
+from app.models.region_models import Region
+from app.models.res_models import Res, ResRegion
+from app.services.fo_services import import_fo_from_excel
+from app.services.oes_services import import_oes_from_excel
+from app.services.region_services import import_region_from_excel
+
+
+@pytest.fixture
+def names_file(tmp_path):
+    def write(columns):
+        path = tmp_path / "import.xlsx"
+        pd.DataFrame(columns).to_excel(path, index=False)
+        return str(path)
+    return write
+
+
+def test_fo_import_delete_missing_clears_region_references(seeded, legacy_foreign_keys, names_file):
+    referencing = [region_id for region_id, in db.session.query(Region.id).filter_by(id_fo=1)]
+    assert referencing
+
+    result = import_fo_from_excel(names_file({"name": [f"ФО {i}" for i in range(2, 9)]}), "test", delete_missing=True)
+
+    assert result == (0, 0, 1)
+    assert [region.id_fo for region in Region.query.filter(Region.id.in_(referencing))] == [None] * len(referencing)
+
+
+def test_oes_import_delete_missing_clears_res_references(seeded, legacy_foreign_keys, names_file):
+    file = names_file({"name": [f"ОЭС {i}" for i in range(2, 11)], "id_oes_type": [1] * 9})
+    assert import_oes_from_excel(file, "test", delete_missing=True) == (0, 0, 1)
+    assert db.session.query(Res).filter(Res.id_oes.is_(None)).count() == 20
+
+
+def test_region_import_delete_missing_removes_res_links(seeded, legacy_foreign_keys, names_file):
+    file = names_file({"name": [f"Субъект {i}" for i in range(2, 81)], "id_fo": [i % 8 + 1 for i in range(2, 81)]})
+    assert import_region_from_excel(file, "test", delete_missing=True) == (0, 0, 1)
+    assert db.session.query(ResRegion).filter_by(id_region=1).count() == 0
+
+
+@pytest.fixture
+def streaming(app, monkeypatch):
+    monkeypatch.setitem(app.config, 'IMPORT_STREAMING_THRESHOLD', 0)
+    monkeypatch.setitem(app.config, 'IMPORT_CHUNK_SIZE', 5)
+
+
+def test_streaming_import_failure_rolls_back_earlier_chunks(seeded, streaming, names_file):
+    types = [1] * 12
+    types[9] = "не число"
+    file = names_file({"name": [f"ОЭС новая {i}" for i in range(12)], "id_oes_type": types})
+    before = sorted(name for name, in db.session.query(Oes.name))
+
+    with pytest.raises(ValueError, match="Ошибка при импорте данных"):
+        import_oes_from_excel(file, "test", delete_missing=True)
+
+    assert sorted(name for name, in db.session.query(Oes.name)) == before
+
+
+def test_streaming_import_with_delete_missing(seeded, streaming, names_file):
+    file = names_file({"name": [f"ОЭС {i}" for i in range(1, 10)] + ["ОЭС новая"], "id_oes_type": [1] * 10})
+    assert import_oes_from_excel(file, "test", delete_missing=True) == (1, 0, 1)
+    assert db.session.query(Oes).filter_by(name="ОЭС 10").count() == 0
@@ -0,0 +1,15 @@
+def test_region_options_without_query_returns_all_regions(app, seeded):
+    with app.test_client() as client:
+        data = client.get('/app/res/region_options').get_json()
+    assert len(data["regions"]) == 80
+    assert data["truncated"] is False
+
+
+def test_region_options_reports_truncated_search(app, seeded):
+    with app.test_client() as client:
+        data = client.get('/app/res/region_options?q=Суб').get_json()
+        narrow = client.get('/app/res/region_options?q=Субъект 7').get_json()
+    assert len(data["regions"]) == 50
+    assert data["truncated"] is True
+    assert [region["name"] for region in narrow["regions"]] == ["Субъект 7"] + [f"Субъект {i}" for i in range(70, 80)]
+    assert narrow["truncated"] is False
@@ -0,0 +1,28 @@
+import pytest
+
+from app.services.res_services import get_res_list
+from tests.conftest import count_queries
+
+
+@pytest.mark.parametrize("with_filter", [False, True])
+def test_res_list_query_count_does_not_depend_on_per_page(seeded, with_filter):
+    oes_filter = 3 if with_filter else None
+    counts = {}
+    for per_page in (10, 50, 100):
+        with count_queries() as statements:
+            pagination = get_res_list(1, per_page, oes_filter=oes_filter, with_regions=True)
+            # Обращение к ОЭС и субъектам РФ записей не должно выполнять запросов
+            for res in pagination.items:
+                assert res.oes is not None
+                assert len(res.region_ids) == 3
+        counts[per_page] = len(statements)
+
+    assert len(set(counts.values())) == 1, counts
+    assert counts[10] <= 3, counts
+
+
+def test_res_list_region_ids_match_links(seeded):
+    pagination = get_res_list(1, 20, with_regions=True)
+    for res in pagination.items:
+        expected = sorted(link.id_region for link in res.regions)
+        assert sorted(res.region_ids) == expected
@@ -0,0 +1,38 @@
+import pandas as pd
+import pytest
+
+from app import db
+from app.models.res_models import ResRegion
+from app.services.res_services import import_res_region_from_excel
+
+
+@pytest.fixture
+def links_file(tmp_path):
+    def write(pairs):
+        path = tmp_path / "res-region.xlsx"
+        pd.DataFrame(pairs, columns=["id_res", "id_region"]).to_excel(path, index=False)
+        return str(path)
+    return write
+
+
+def links():
+    return set(db.session.query(ResRegion.id_res, ResRegion.id_region))
+
+
+def test_import_changes_only_links_of_res_in_file(seeded, links_file):
+    before = links()
+    inserted, deleted = import_res_region_from_excel(links_file([(1, 1), (2, 80)]), "test")
+
+    after = links()
+    assert {pair for pair in after if pair[0] in (1, 2)} == {(1, 1), (2, 80)}
+    assert {pair for pair in after if pair[0] not in (1, 2)} == {pair for pair in before if pair[0] not in (1, 2)}
+    assert deleted == len([pair for pair in before if pair[0] in (1, 2)]) - len({(1, 1), (2, 80)} & before)
+    assert inserted == len({(1, 1), (2, 80)} - before)
+
+
+def test_import_with_delete_missing_replaces_whole_table(seeded, links_file):
+    before = links()
+    inserted, deleted = import_res_region_from_excel(links_file([(1, 1), (2, 80)]), "test", delete_missing=True)
+
+    assert links() == {(1, 1), (2, 80)}
+    assert deleted == len(before - {(1, 1), (2, 80)})
@@ -0,0 +1,72 @@
+import pytest
+
+from app import db
+from app.models.log_models import Log
+from app.models.res_models import Res, ResRegion
+from app.services.grid_services import row_version
+from app.services.res_services import update_res
+from tests.conftest import count_queries
+
+
+def grid_rows(ids):
+    """Строки таблицы редактирования РЭС в том виде, в котором их отправляет страница."""
+    rows = []
+    for res in Res.query.filter(Res.id.in_(ids)).order_by(Res.id):
+        region_ids = sorted(link.id_region for link in res.regions)
+        rows.append({
+            "id": res.id, "name": res.name, "oes_id": res.id_oes, "regions": region_ids,
+            "version": row_version(res.name, res.id_oes, region_ids),
+        })
+    return rows
+
+
+def test_update_res_query_count_does_not_depend_on_changed_rows(seeded):
+    counts = {}
+    for changed in (5, 50):
+        rows = grid_rows(range(1, 101))
+        for row in rows[:changed]:
+            row["name"] += " (изм.)"
+        with count_queries() as statements:
+            update_res(rows, "test")
+        counts[changed] = len([statement for statement, _ in statements if "INSERT INTO log" not in statement])
+
+    assert counts[5] == counts[50], counts
+    assert db.session.get(Res, 50).name == "РЭС 50 (изм.)"
+
+
+def test_update_res_rejects_duplicate_names(seeded):
+    rows = grid_rows([1, 2])
+    rows[0]["name"] = "РЭС 3"
+    with pytest.raises(ValueError, match="уже существует"):
+        update_res(rows, "test")
+
+    rows = grid_rows([1]) + [{"id": None, "name": "РЭС новый", "oes_id": 1, "regions": []},
+                             {"id": None, "name": "РЭС новый", "oes_id": 2, "regions": []}]
+    with pytest.raises(ValueError, match="уже существует"):
+        update_res(rows, "test")
+
+
+def test_update_res_allows_name_released_by_rename(seeded):
+    rows = grid_rows([1])
+    rows[0]["name"] = "РЭС 1 (прежний)"
+    rows.append({"id": None, "name": "РЭС 1", "oes_id": 2, "regions": [5, 6]})
+    update_res(rows, "test")
+
+    new_res = Res.query.filter_by(name="РЭС 1").one()
+    assert new_res.id != 1 and db.session.get(Res, 1).name == "РЭС 1 (прежний)"
+    assert sorted(region_id for region_id, in db.session.query(ResRegion.id_region).filter_by(id_res=new_res.id)) == [5, 6]
+
+
+def test_update_res_reports_counts_and_stale_rows(seeded):
+    rows = grid_rows([1, 2, 3])
+    rows[0]["name"] = "РЭС 1 (изм.)"
+    rows.append({"id": None, "name": "РЭС новый", "oes_id": 1, "regions": []})
+    db.session.query(ResRegion).filter_by(id_res=3).delete()
+    db.session.query(Res).filter_by(id=3).delete()
+    db.session.query(Log).filter_by(username="test").delete()
+    db.session.commit()
+
+    assert update_res(rows, "test") == (1, 1, [3])
+    messages = {action: details for action, details in db.session.query(Log.action, Log.details).filter_by(username="test")}
+    assert messages["Обновление записей списка субъектов РФ"] == "Добавлено записей: 1, обновлено записей: 1"
+    assert messages["Пропущены записи, удалённые другим пользователем"] == "ID: 3"
@@ -0,0 +1,22 @@
+from sqlalchemy import text
+
+from app import db
+from app.models.res_models import Res
+from app.services.search_services import contains_filter
+
+
+def matching_ids(condition):
+    return sorted(res_id for res_id, in db.session.query(Res.id).filter(condition))
+
+
+def test_contains_filter_matches_ilike(seeded):
+    for value in ("РЭС 1", "эс 2", "С 19", "нет такого"):
+        assert matching_ids(contains_filter(Res.name, value)) == matching_ids(Res.name.ilike(f"%{value}%"))
+
+
+def test_contains_filter_sees_external_updates(seeded):
+    assert matching_ids(contains_filter(Res.name, "Особ")) == []
+    # Изменение в обход сервисов (другой процесс, команда flask или SQL) без сброса кэшей
+    db.session.execute(text("UPDATE res SET name = 'Особый' WHERE id = 5"))
+    db.session.commit()
+    assert matching_ids(contains_filter(Res.name, "Особ")) == [5]